@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Scripted SMOTE augmentation of the KDD Cup dataset
+Regenerates data_after_smote.csv from a KDD Cup file (plain, .gz or .xz) as
+a bounded-memory batch job:
+
+    1. the label index (label_index.py) gives the row count of every class
+       and seeks to the rows of one class at a time
+    2. each class below the target gets a k-d tree over the distinct rows
+       of (a seeded sample of at most max_base of) its rows, from which the
+       k nearest neighbors of every base row are found in leaf-sized
+       batches; copies of a row are each other's neighbors at distance 0
+    3. synthetic rows (base + gap * (neighbor - base), gap uniform in [0, 1))
+       are generated and appended to the output chunk by chunk
+
+The output holds every original row followed by the synthetic ones, with a
+header and the label in a 'class' column (KDD's trailing '.' dropped).
+Categorical columns (protocol_type, service, flag) of a synthetic row are
+copied from whichever endpoint it is nearer to. The same input, seed and
+chunk size give the same output.
+
+Usage:
+    python augment_smote.py [--dataset kddcup.data_10_percent.csv] [--output data_after_smote.csv]
+                            [--target majority|N] [--classes a,b] [--k 5] [--seed 0]
+"""
+
+import numpy as np
+import pandas as pd
+import argparse
+import io
+import os
+from pathlib import Path
+
+from dataset_io import iter_range_blocks, read_header, open_dataset, find_dataset
+from dataset_cache import detect_kind, KDD_COLUMNS, KIND_KDD, LABEL_COLUMNS
+from label_index import open_index
+from pca_scoring import unique_rows
+
+
+OUTPUT_LABEL = 'class'
+LEAF_SIZE = 64
+
+# Leaves searched before the first radius update (the batch doubles after each one)
+_LEAF_BATCH = 8
+
+
+class KDTree:
+    """
+    k-d tree over the rows of X, split at the median of the widest dimension
+    Leaves hold at most leaf_size rows (more only if they are all identical,
+    so build it over distinct rows, see nearest_neighbors); queries are
+    answered a whole leaf at a time with NumPy.
+    """
+
+    def __init__(self, X, leaf_size=LEAF_SIZE):
+        self.X = np.asarray(X, dtype=np.float64)
+        self.perm = np.arange(len(self.X))
+        leaves = []
+        stack = [(0, len(self.X))]
+        while stack:
+            lo, hi = stack.pop()
+            points = self.X[self.perm[lo:hi]]
+            spread = points.max(axis=0) - points.min(axis=0) if hi > lo else np.zeros(1)
+            if hi - lo <= leaf_size or spread.max() == 0:
+                leaves.append((lo, hi))
+                continue
+            dim = int(np.argmax(spread))
+            mid = (hi - lo) // 2
+            self.perm[lo:hi] = self.perm[lo:hi][np.argpartition(points[:, dim], mid)]
+            stack.append((lo + mid, hi))
+            stack.append((lo, lo + mid))
+        self.leaves = sorted(leaves)
+        self.box_lo = np.array([self.X[self.perm[lo:hi]].min(axis=0) for lo, hi in self.leaves])
+        self.box_hi = np.array([self.X[self.perm[lo:hi]].max(axis=0) for lo, hi in self.leaves])
+        self._sq_norms = np.einsum('ij,ij->i', self.X, self.X)
+
+    def _sq_distances(self, queries, rows):
+        d = self._sq_norms[queries][:, np.newaxis] - 2.0 * (self.X[queries] @ self.X[rows].T) + \
+            self._sq_norms[rows][np.newaxis, :]
+        return np.maximum(d, 0.0)
+
+    def _box_sq_distances(self, Q, leaves):
+        """(queries, leaves) squared distance from every query to the bounding boxes of the given leaves"""
+        lo, hi = self.box_lo[leaves], self.box_hi[leaves]
+        d = np.zeros((len(Q), len(leaves)))
+        for j in range(Q.shape[1]):
+            gap = np.maximum(lo[:, j] - Q[:, j:j + 1], 0) + np.maximum(Q[:, j:j + 1] - hi[:, j], 0)
+            d += gap * gap
+        return d
+
+    def neighbors(self, k):
+        """(n, k) indices of the k nearest other rows of every row, nearest first (exact)"""
+        n = len(self.X)
+        k = min(k, n - 1)
+        result = np.empty((n, k), dtype=np.int64)
+        if k <= 0:
+            return result
+        for leaf, (lo, hi) in enumerate(self.leaves):
+            queries = self.perm[lo:hi]
+            best_d = np.full((len(queries), k), np.inf)
+            best_i = np.zeros((len(queries), k), dtype=np.int64)
+            # Own leaf first: its kth distance bounds which other leaves can hold a nearer row
+            best_d, best_i = self._merge(queries, queries, best_d, best_i)
+            # Other leaves within reach, nearest box first, in growing batches; every
+            # batch shrinks the radius the remaining leaves have to be within
+            gap = np.maximum(self.box_lo - self.box_hi[leaf], 0) + np.maximum(self.box_lo[leaf] - self.box_hi, 0)
+            box_d = np.einsum('ij,ij->i', gap, gap)
+            pending = np.flatnonzero(box_d <= best_d[:, -1].max())
+            pending = pending[pending != leaf]
+            pending = pending[np.argsort(box_d[pending], kind='stable')]
+            # The nearest boxes alone usually tighten the radius enough to drop most others
+            batch, pending = pending[:_LEAF_BATCH], pending[_LEAF_BATCH:]
+            if len(batch):
+                rows = np.concatenate([self.perm[self.leaves[j][0]:self.leaves[j][1]] for j in batch])
+                best_d, best_i = self._merge(queries, rows, best_d, best_i)
+            pending = pending[box_d[pending] <= best_d[:, -1].max()]
+            query_box_d = self._box_sq_distances(self.X[queries], pending)
+            batch_size = 2 * _LEAF_BATCH
+            while len(pending):
+                keep = (query_box_d <= best_d[:, -1:]).any(axis=0)
+                pending, query_box_d = pending[keep], query_box_d[:, keep]
+                batch, pending, query_box_d = pending[:batch_size], pending[batch_size:], query_box_d[:, batch_size:]
+                if len(batch):
+                    rows = np.concatenate([self.perm[self.leaves[j][0]:self.leaves[j][1]] for j in batch])
+                    best_d, best_i = self._merge(queries, rows, best_d, best_i)
+                batch_size *= 2
+            result[queries] = best_i
+        return result
+
+    def _merge(self, queries, rows, best_d, best_i):
+        """Fold the distances from queries to rows into the running k best (a row is not its own neighbor)"""
+        k = best_d.shape[1]
+        d = self._sq_distances(queries, rows)
+        d[queries[:, np.newaxis] == rows[np.newaxis, :]] = np.inf
+        idx = np.broadcast_to(rows, d.shape)
+        if d.shape[1] > k:
+            part = np.argpartition(d, k - 1, axis=1)[:, :k]
+            d, idx = np.take_along_axis(d, part, axis=1), np.take_along_axis(idx, part, axis=1)
+        all_d = np.concatenate([best_d, d], axis=1)
+        all_i = np.concatenate([best_i, idx], axis=1)
+        order = np.lexsort((all_i, all_d), axis=1)[:, :k]
+        return np.take_along_axis(all_d, order, axis=1), np.take_along_axis(all_i, order, axis=1)
+
+
+def nearest_neighbors(X, k, leaf_size=LEAF_SIZE):
+    """
+    (n, k) indices of the k nearest other rows of every row of X, nearest first (exact)
+    Identical rows are one point of the k-d tree: the copies of a row come
+    first (distance 0, lowest index first), then the copies of the nearest
+    distinct rows, so duplicated classes cost no more than their distinct rows.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    n = len(X)
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.empty((n, max(k, 0)), dtype=np.int64)
+    unique, inverse, counts = unique_rows(X)
+    members = np.argsort(inverse, kind='stable')
+    starts = np.r_[0, np.cumsum(counts)]
+    near = KDTree(unique, leaf_size).neighbors(k)
+
+    # The first k + 1 copies of the distinct row itself and of each of its
+    # neighbors, in that order; the first k + 1 of them are the candidates
+    # (one may be the querying row itself)
+    groups = np.hstack([np.arange(len(unique))[:, np.newaxis], near])
+    copy = np.arange(k + 1)
+    valid = copy < counts[groups][:, :, np.newaxis]
+    expanded = members[np.minimum(starts[groups][:, :, np.newaxis] + copy, n - 1)]
+    expanded, valid = expanded.reshape(len(unique), -1), valid.reshape(len(unique), -1)
+    first = np.argsort(~valid, axis=1, kind='stable')[:, :k + 1]
+    rows = np.take_along_axis(expanded, first, axis=1)[inverse]
+    # Drop the row itself (or the farthest candidate when it is not among them)
+    not_self = rows != np.arange(n)[:, np.newaxis]
+    not_self[not_self.all(axis=1), -1] = False
+    return rows[not_self].reshape(n, k)
+
+
+def _read_frame(block, columns, kind):
+    """A block of CSV lines as a DataFrame in the output layout (label last, in 'class')"""
+    if kind == KIND_KDD:
+        df = pd.read_csv(io.BytesIO(block), header=None, names=columns, keep_default_na=False,
+                         float_precision='round_trip')
+    else:
+        df = pd.read_csv(io.BytesIO(block), header=None, names=columns, float_precision='round_trip')
+    label = next(name for name in columns if name in LABEL_COLUMNS)
+    df[label] = df[label].astype(str).str.strip().str.rstrip('.')
+    return df.rename(columns={label: OUTPUT_LABEL})
+
+
+def _input_layout(dataset_path):
+    """(column names, byte offset of the first data line, kind)"""
+    kind = detect_kind(dataset_path)
+    if kind == KIND_KDD:
+        return KDD_COLUMNS, 0, kind
+    columns, start = read_header(dataset_path)
+    if not any(name in LABEL_COLUMNS for name in columns):
+        raise ValueError(f"{dataset_path} has no label column ({', '.join(LABEL_COLUMNS)})")
+    return columns, start, kind
+
+
+def class_targets(counts, target='majority', classes=None):
+    """{label: synthetic rows to generate} bringing every selected class up to target rows"""
+    goal = max(counts.values()) if target == 'majority' else int(target)
+    selected = counts if classes is None else {label: counts[label] for label in classes}
+    return {label: goal - count for label, count in selected.items() if count < goal}
+
+
+def synthesize(X, neighbors, n_samples, rng):
+    """
+    n_samples SMOTE rows interpolated between random rows of X and one of their neighbors
+    Returns (synthetic rows, base indices, neighbor indices, gaps)
+    """
+    base = rng.integers(0, len(X), n_samples)
+    if neighbors.shape[1] == 0:
+        # A single row has no neighbor: repeat it
+        return X[base], base, base, np.zeros(n_samples)
+    other = neighbors[base, rng.integers(0, neighbors.shape[1], n_samples)]
+    gap = rng.random(n_samples)
+    return X[base] + gap[:, np.newaxis] * (X[other] - X[base]), base, other, gap
+
+
+def augment(dataset_path, output_path, target='majority', classes=None, k=5, max_base=200000,
+            chunk_size=65536, seed=0, block_bytes=64 << 20):
+    """
+    Write the rows of dataset_path plus SMOTE rows for every class below target to output_path
+
+    Args:
+        target: rows per class after augmentation, 'majority' for the largest class's count
+        classes: labels to augment (default: every class below target)
+        k: neighbors per base row
+        max_base: at most this many rows of a class (a seeded sample) are interpolated
+        chunk_size: synthetic rows generated and written at a time
+
+    Returns:
+        {label: synthetic rows written}
+    """
+    columns, start, kind = _input_layout(dataset_path)
+    index = open_index(dataset_path)
+    if index is None:
+        raise ValueError(f"Cannot index the labels of {dataset_path}")
+    counts = {label.rstrip('.'): count for label, count in index.counts().items()}
+    plan = class_targets(counts, target, classes)
+
+    output_path = Path(output_path)
+    # Keeps the compression suffix: data_after_smote.csv.gz -> data_after_smote.csv.tmp.gz
+    tmp_path = output_path.with_name(output_path.stem + '.tmp' + output_path.suffix)
+    written = {}
+    with open_dataset(tmp_path, 'w') as out:
+        print(f"Copying {sum(counts.values())} rows of {dataset_path}...")
+        layout = None
+        for block in iter_range_blocks(dataset_path, start, None, block_bytes):
+            df = _read_frame(block, columns, kind)
+            df.to_csv(out, header=layout is None, index=False)
+            layout = list(df.columns)
+
+        for c, (label, n_synthetic) in enumerate(sorted(plan.items())):
+            rng = np.random.default_rng([seed, c])
+            base_offsets = index.sample(label, max_base, seed + c)
+            base = _read_frame(''.join(index.read_lines(base_offsets)).encode(), columns, kind)
+            numeric = [name for name in layout if name != OUTPUT_LABEL and pd.api.types.is_numeric_dtype(base[name])]
+            categorical = [name for name in layout if name != OUTPUT_LABEL and name not in numeric]
+            X = base[numeric].to_numpy(dtype=np.float64)
+            print(f"  {label}: {counts[label]} rows, {len(X)} base rows, +{n_synthetic} synthetic")
+            neighbors = nearest_neighbors(X, k)
+
+            for done in range(0, n_synthetic, chunk_size):
+                n = min(chunk_size, n_synthetic - done)
+                rows, origin, other, gap = synthesize(X, neighbors, n, rng)
+                chunk = pd.DataFrame(rows, columns=numeric)
+                nearer = np.where(gap < 0.5, origin, other)
+                for name in categorical:
+                    chunk[name] = base[name].to_numpy()[nearer]
+                chunk[OUTPUT_LABEL] = label
+                chunk[layout].to_csv(out, header=False, index=False)
+            written[label] = n_synthetic
+    os.replace(tmp_path, output_path)
+    return written
+
+
+def main():
+    base_dir = Path(__file__).parent.parent
+
+    parser = argparse.ArgumentParser(description="SMOTE augmentation of the KDD Cup dataset (chunked, seeded)")
+    parser.add_argument('--dataset', default=find_dataset(base_dir / "dataset" / "kddcup.data_10_percent.csv"))
+    parser.add_argument('--output', default=str(base_dir / "dataset" / "data_after_smote.csv"),
+                        help="Augmented CSV (.gz / .xz to compress it)")
+    parser.add_argument('--target', default='majority',
+                        help="Rows per class after augmentation: 'majority' or a count")
+    parser.add_argument('--classes', default=None, help="Comma-separated labels to augment (default: all below target)")
+    parser.add_argument('--k', type=int, default=5, help="Nearest neighbors per base row")
+    parser.add_argument('--max-base', type=int, default=200000,
+                        help="Rows of a class interpolated at most (a seeded sample beyond that)")
+    parser.add_argument('--chunk-size', type=int, default=65536)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    classes = [label.strip().rstrip('.') for label in args.classes.split(',')] if args.classes else None
+    written = augment(args.dataset, args.output, args.target, classes, args.k, args.max_base,
+                      args.chunk_size, args.seed)
+    print(f"✓ Wrote {args.output} (+{sum(written.values())} synthetic rows over {len(written)} classes)")
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
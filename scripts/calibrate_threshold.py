@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Attack threshold calibration over a labeled KDD Cup dataset
+Scores the dataset once with the batch scorer, then derives the ROC/PR
+curves of the major and minor scores and the best (major, minor)
+threshold pair for a target false-positive rate from sorted scores and
+cumulative counts (O(n log n), no rescoring per candidate threshold).
+The chosen pair is written into the model (JSON and compiled artifact)
+and the SystemVerilog coefficient package.
+"""
+
+import numpy as np
+import argparse
+import json
+from pathlib import Path
+
+from pca_scoring import (score_fixed_batch, fixed_point_convert_array, comparison_scores,
+                         compare_threshold, get_profile, model_thresholds)
+from model_artifact import load_model, write_model_artifact, artifact_path_for
+from kdd_encoding import get_encoding, encoding_lookup
+from generate_golden_reference import (open_dataset_cache, preprocess_kdd_columns, preprocess_kdd_sample,
+                                       load_dataset)
+from export_pca_to_verilog import export_to_verilog_params
+from dataset_io import find_dataset
+
+
+def load_labeled_features(dataset_path, model, max_samples=None, use_cache=True):
+    """
+    Preprocessed float features and attack labels (1 = attack) of a KDD Cup CSV
+    Features are built exactly like generate_golden_reference.py builds them
+    """
+    cache = open_dataset_cache(dataset_path, use_cache, build=max_samples is None)
+    if cache is not None:
+        features = preprocess_kdd_columns(cache, 0, max_samples, get_encoding(model))
+        labels = cache.decode('label', 0, len(features))
+    else:
+        samples = load_dataset(dataset_path, max_samples)
+        lookup = encoding_lookup(get_encoding(model))
+        features = np.array([preprocess_kdd_sample(sample, lookup) for sample in samples]).reshape(-1, 28)
+        labels = np.array([sample[41] if len(sample) > 41 else '' for sample in samples], dtype=object)
+    distinct, inverse = np.unique(labels.astype(str), return_inverse=True)
+    is_attack = np.array([label.strip().rstrip('.') != 'normal' for label in distinct], dtype=np.int64)
+    return features, is_attack[inverse.ravel()]
+
+
+def score_curve(scores, labels):
+    """
+    ROC and PR curve of 'score > threshold' for integer scores
+    One point per distinct score value, from the strictest threshold down
+
+    Returns:
+        dictionary of threshold, fpr, tpr, precision arrays and the ROC AUC
+    """
+    order = np.argsort(-scores, kind='stable')
+    sorted_scores = scores[order]
+    tp = np.cumsum(labels[order])
+    fp = np.arange(1, len(scores) + 1) - tp
+    # Last position of each run of equal scores: flagging that value flags the whole run
+    last = np.r_[np.flatnonzero(np.diff(sorted_scores)), len(scores) - 1]
+    n_attack = max(int(labels.sum()), 1)
+    n_normal = max(len(labels) - int(labels.sum()), 1)
+
+    threshold = np.r_[sorted_scores[0], sorted_scores[last] - 1]
+    tp = np.r_[0, tp[last]]
+    fp = np.r_[0, fp[last]]
+    fpr = fp / n_normal
+    tpr = tp / n_attack
+    precision = np.where(tp + fp > 0, tp / np.maximum(tp + fp, 1), 1.0)
+    return {
+        'threshold': threshold,
+        'fpr': fpr,
+        'tpr': tpr,
+        'precision': precision,
+        'auc': float(np.trapezoid(tpr, fpr)),
+    }
+
+
+def _kth_remaining(tree, k):
+    """Position of the k-th (1-based) element still present in a Fenwick tree of 0/1 counts"""
+    pos = 0
+    step = 1 << (len(tree) - 1).bit_length()
+    while step:
+        nxt = pos + step
+        if nxt < len(tree) and tree[nxt] < k:
+            pos = nxt
+            k -= tree[nxt]
+        step >>= 1
+    return pos  # 0-based position in the ordering
+
+
+def best_threshold_pair(major, minor, labels, target_fpr):
+    """
+    Best (major, minor) thresholds for 'major > Tm or minor > Tn' at a target FPR
+
+    Only thresholds at a normal sample's major score can be optimal (lowering
+    Tm between two of them only gains attacks). Candidate j flags the j
+    normals with the largest major scores; Tn is then the loosest minor
+    threshold that keeps the total false positives within budget, found with
+    a Fenwick tree over the normals' minor ranks. Along the candidates Tm
+    falls and Tn rises, so the attacks caught by the minor score alone form
+    nested sets and are counted for all candidates with two searchsorted
+    calls and one cumulative sum.
+
+    Returns:
+        (major_threshold, minor_threshold, frontier) with the candidate
+        thresholds, false positive budget use and true positives in frontier
+    """
+    normal = labels == 0
+    major_n, minor_n = major[normal], minor[normal]
+    major_a, minor_a = major[~normal], minor[~normal]
+    n_normal = len(major_n)
+    if n_normal == 0 or len(major_a) == 0:
+        raise ValueError("Calibration needs both normal and attack samples")
+    budget = int(np.floor(target_fpr * n_normal))
+
+    by_major = np.argsort(-major_n, kind='stable')
+    major_desc = major_n[by_major]
+    by_minor = np.argsort(-minor_n, kind='stable')
+    minor_desc = minor_n[by_minor]
+    minor_rank = np.empty(n_normal, dtype=np.int64)
+    minor_rank[by_minor] = np.arange(n_normal)
+
+    # Fenwick tree (1-based) with every normal present
+    index = np.arange(n_normal + 1)
+    tree = (index & -index).tolist()
+
+    major_thresholds = []
+    minor_thresholds = []
+    flagged_by_major = []
+    for j in range(min(budget, n_normal) + 1):
+        if j > 0:
+            # Flag the normal with the j-th largest major score
+            i = int(minor_rank[by_major[j - 1]]) + 1
+            while i <= n_normal:
+                tree[i] -= 1
+                i += i & -i
+        if j < n_normal and j > 0 and major_desc[j - 1] == major_desc[j]:
+            continue  # No threshold flags exactly j normals
+        tm = major_desc[j] if j < n_normal else major.min() - 1
+        allowed = budget - j
+        if allowed >= n_normal - j:
+            tn = minor.min() - 1  # Every remaining normal may be flagged
+        else:
+            tn = minor_desc[_kth_remaining(tree, allowed + 1)]
+        major_thresholds.append(tm)
+        minor_thresholds.append(tn)
+        flagged_by_major.append(j)
+    major_thresholds = np.array(major_thresholds, dtype=np.int64)
+    minor_thresholds = np.array(minor_thresholds, dtype=np.int64)
+
+    # Attacks caught by the major score
+    caught_major = len(major_a) - np.searchsorted(np.sort(major_a), major_thresholds, side='right')
+    # Attacks caught only by the minor score: attack a counts for candidates
+    # c <= min(last c with Tm_c >= major_a, last c with Tn_c < minor_a)
+    last_major = np.searchsorted(-major_thresholds, -major_a, side='right') - 1
+    last_minor = np.searchsorted(minor_thresholds, minor_a, side='left') - 1
+    last = np.minimum(last_major, last_minor)
+    counts = np.bincount(last[last >= 0], minlength=len(major_thresholds))
+    caught_minor = np.cumsum(counts[::-1])[::-1]
+    true_positives = caught_major + caught_minor
+
+    best = int(np.argmax(true_positives))
+    frontier = {
+        'major_threshold': major_thresholds,
+        'minor_threshold': minor_thresholds,
+        'flagged_by_major': np.array(flagged_by_major, dtype=np.int64),
+        'true_positives': true_positives,
+    }
+    return int(major_thresholds[best]), int(minor_thresholds[best]), frontier
+
+
+def calibrate(features, labels, model, profile='pca_detector', target_fpr=0.01):
+    """
+    Score once and calibrate the thresholds
+
+    Returns:
+        (thresholds dictionary for the model, curves dictionary)
+    """
+    p = get_profile(profile)
+    frac_bits = model['config']['frac_bits']
+    features_fixed = fixed_point_convert_array(features, frac_bits)
+    major, minor, _ = score_fixed_batch(features_fixed, model, profile, dedup=True)
+    major = comparison_scores(major, p['compare'])
+    minor = comparison_scores(minor, p['compare'])
+
+    curves = {'major': score_curve(major, labels), 'minor': score_curve(minor, labels)}
+    major_threshold, minor_threshold, frontier = best_threshold_pair(major, minor, labels, target_fpr)
+    # The RTL threshold registers are unsigned
+    major_threshold = int(np.clip(major_threshold, 0, 2**31 - 1))
+    minor_threshold = int(np.clip(minor_threshold, 0, 2**31 - 1))
+    curves['pair'] = frontier
+
+    attack = compare_threshold(major, minor, (major_threshold, minor_threshold), 'signed').astype(bool)
+    n_attack = int(labels.sum())
+    n_normal = len(labels) - n_attack
+    tp = int(np.sum(attack & (labels == 1)))
+    fp = int(np.sum(attack & (labels == 0)))
+    thresholds = {
+        'major': major_threshold,
+        'minor': minor_threshold,
+        'profile': profile if isinstance(profile, str) else 'custom',
+        'target_fpr': target_fpr,
+        'fpr': fp / max(n_normal, 1),
+        'tpr': tp / max(n_attack, 1),
+        'precision': tp / max(tp + fp, 1),
+        'num_samples': len(labels),
+    }
+    return thresholds, curves
+
+
+def save_curves(curves, path):
+    """Write the ROC/PR curves and the pair frontier as one npz file"""
+    arrays = {}
+    for name, curve in curves.items():
+        for key, values in curve.items():
+            arrays[f'{name}_{key}'] = np.asarray(values)
+    np.savez(path, **arrays)
+
+
+def main():
+    base_dir = Path(__file__).parent.parent
+
+    parser = argparse.ArgumentParser(description="Calibrate the attack thresholds on a labeled dataset")
+    parser.add_argument('--dataset', default=find_dataset(base_dir / "dataset" / "kddcup.data_10_percent.csv"))
+    parser.add_argument('--model', default=str(base_dir / "model" / "pca_coeffs.json"))
+    parser.add_argument('--sv-output', default=str(base_dir / "src" / "pca_coeffs_pkg.sv"))
+    parser.add_argument('--curves', default=str(base_dir / "model" / "threshold_calibration.npz"))
+    parser.add_argument('--profile', default='pca_detector', help="Scoring profile (see pca_scoring.PROFILES)")
+    parser.add_argument('--target-fpr', type=float, default=0.01)
+    parser.add_argument('--max-samples', type=int, default=None)
+    parser.add_argument('--dry-run', action='store_true', help="Report only, do not update the model or SV package")
+    parser.add_argument('--no-cache', action='store_true')
+    args = parser.parse_args()
+
+    print(f"Loading PCA model from {args.model}...")
+    model = load_model(args.model)
+    before = model_thresholds(model)
+
+    print(f"Loading labeled dataset from {args.dataset}...")
+    features, labels = load_labeled_features(args.dataset, model, args.max_samples, not args.no_cache)
+    print(f"Samples: {len(labels)} (normal {int(np.sum(labels == 0))}, attack {int(labels.sum())})")
+
+    print(f"Scoring with profile '{args.profile}' and calibrating for FPR <= {args.target_fpr}...")
+    thresholds, curves = calibrate(features, labels, model, args.profile, args.target_fpr)
+    save_curves(curves, args.curves)
+
+    print(f"\nROC AUC: major {curves['major']['auc']:.4f}, minor {curves['minor']['auc']:.4f}")
+    print(f"Previous thresholds: major {before[0]}, minor {before[1]}")
+    print(f"Calibrated thresholds: major {thresholds['major']}, minor {thresholds['minor']}")
+    print(f"  FPR {thresholds['fpr']:.4f}, TPR {thresholds['tpr']:.4f}, precision {thresholds['precision']:.4f}")
+    print(f"Curves saved to {args.curves}")
+
+    if args.dry_run:
+        return
+
+    model_path = Path(args.model)
+    if model_path.suffix == '.json':
+        with open(model_path, 'r') as f:
+            model_json = json.load(f)
+        model_json['thresholds_fixed'] = thresholds
+        with open(model_path, 'w') as f:
+            json.dump(model_json, f, indent=2)
+        artifact_path = artifact_path_for(model_path)
+        write_model_artifact(model_json, artifact_path)
+        print(f"Updated {model_path} and {artifact_path}")
+    else:
+        model['thresholds_fixed'] = thresholds
+        write_model_artifact(model, model_path)
+        print(f"Updated {model_path}")
+    export_to_verilog_params(str(model_path), args.sv_output)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,17 +4,16 @@ Compare Verilog simulation results with Python golden reference
 Verifies hardware implementation correctness
 """
 
-import json
 import re
 from pathlib import Path
 from typing import List, Dict, Tuple
 
+from golden_store import load_golden, resolve_golden_path
+
 
 def load_golden_reference(json_path: str) -> Dict:
-    """Load golden reference from JSON file"""
-    with open(json_path, 'r') as f:
-        golden = json.load(f)
-    return golden
+    """Load golden reference from a JSON file or golden store"""
+    return load_golden(json_path)
 
 
 def parse_simulation_log(log_path: str) -> List[Dict]:
@@ -234,7 +233,7 @@ def generate_comparison_report(sim_results: List[Dict], golden_ref: Dict,
 def main():
     # Paths
     base_dir = Path(__file__).parent.parent
-    golden_path = base_dir / "model" / "golden_reference.json"
+    golden_path = resolve_golden_path(base_dir / "model" / "golden_reference.json")
     
     # Try both possible log locations
     sim_log_path1 = base_dir / "output" / "logs" / "sim_report.txt"
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Typed columnar cache of the KDD Cup / SMOTE CSV files
+The CSV is parsed once; numeric columns are stored as int32/float64,
+categorical columns and labels as small-int codes into a vocabulary.
+Loaders memory-map the cache instead of re-parsing the text on every run,
+and the cache is rebuilt when the SHA-256 of the source file changes.
+
+File layout:
+    8 bytes   magic b'NIDSDC01'
+    8 bytes   header length (little-endian uint64)
+    header    UTF-8 JSON: version, kind, source {path, size, mtime_ns, sha256},
+              num_rows, columns {name: kind/dtype/shape/offset[/vocabulary]}
+    data      column arrays, each 64-byte aligned; offsets are relative to
+              the first aligned byte after the header
+
+Usage:
+    python dataset_cache.py <dataset.csv> [dataset.cache]
+"""
+
+import numpy as np
+import pandas as pd
+import csv
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from pathlib import Path
+
+from dataset_io import open_dataset
+
+
+MAGIC = b'NIDSDC01'
+CACHE_VERSION = 1
+ALIGN = 64
+
+# kddcup.data_10_percent.csv has no header row
+KDD_COLUMNS = [
+    'duration', 'protocol_type', 'service', 'flag',
+    'src_bytes', 'dst_bytes', 'land', 'wrong_fragment', 'urgent',
+    'hot', 'num_failed_logins', 'logged_in', 'num_compromised',
+    'root_shell', 'su_attempted', 'num_root', 'num_file_creations',
+    'num_shells', 'num_access_files', 'num_outbound_cmds',
+    'is_host_login', 'is_guest_login', 'count', 'srv_count',
+    'serror_rate', 'srv_serror_rate', 'rerror_rate', 'srv_rerror_rate',
+    'same_srv_rate', 'diff_srv_rate', 'srv_diff_host_rate',
+    'dst_host_count', 'dst_host_srv_count', 'dst_host_same_srv_rate',
+    'dst_host_diff_srv_rate', 'dst_host_same_src_port_rate',
+    'dst_host_srv_diff_host_rate', 'dst_host_serror_rate',
+    'dst_host_srv_serror_rate', 'dst_host_rerror_rate',
+    'dst_host_srv_rerror_rate', 'label'
+]
+KDD_CATEGORICAL = ('protocol_type', 'service', 'flag')
+
+# Cache kinds
+KIND_KDD = 'kdd'    # Raw KDD Cup rows, no header
+KIND_CSV = 'csv'    # CSV with a header row (data_after_smote.csv)
+
+LABEL_COLUMNS = ('label', 'class')
+
+
+def _align(pos):
+    return (pos + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _is_number(text):
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
+
+
+def detect_kind(csv_path):
+    """KIND_KDD for headerless KDD Cup rows, KIND_CSV for files with a header"""
+    with open_dataset(csv_path, 'r') as f:
+        first = next(csv.reader(f), [])
+    if len(first) == len(KDD_COLUMNS) and _is_number(first[0]) and not _is_number(first[1]):
+        return KIND_KDD
+    return KIND_CSV
+
+
+def file_sha256(path, block_bytes=16 << 20):
+    """SHA-256 of a file's contents"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_bytes), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def cache_path_for(csv_path):
+    """Cache file that sits next to a dataset CSV (name.csv -> name.csv.cache, so .gz/.xz copies get their own)"""
+    return Path(str(csv_path) + '.cache')
+
+
+def _code_dtype(vocabulary_size):
+    """Smallest signed integer type for codes 0..vocabulary_size-1 plus -1 (missing)"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if vocabulary_size <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _encode_columns(df, kind):
+    """Convert a DataFrame into {name: (column kind, array, vocabulary)}"""
+    encoded = {}
+    for name in df.columns:
+        values = df[name]
+        is_label = name in LABEL_COLUMNS
+        if not is_label and not (kind == KIND_KDD and name in KDD_CATEGORICAL) and \
+                pd.api.types.is_numeric_dtype(values):
+            if pd.api.types.is_integer_dtype(values) and len(values) and \
+                    values.min() >= -2**31 and values.max() < 2**31:
+                encoded[name] = ('numeric', values.to_numpy(dtype=np.int32), None)
+            else:
+                encoded[name] = ('numeric', values.to_numpy(dtype=np.float64), None)
+            continue
+        if kind == KIND_KDD and name not in KDD_CATEGORICAL and not is_label:
+            raise ValueError(f"column '{name}' is not numeric")
+        codes, vocabulary = pd.factorize(values.astype(object), sort=True)
+        vocabulary = [str(v) for v in vocabulary]
+        encoded[name] = ('label' if is_label else 'categorical',
+                         codes.astype(_code_dtype(len(vocabulary))), vocabulary)
+    return encoded
+
+
+def build_cache(csv_path, cache_path=None):
+    """
+    Parse a dataset CSV once and write its typed cache
+    Floats are parsed with round-trip precision, so every value equals
+    Python's float() of the text. Raises ValueError for files that do not
+    fit the typed layout (e.g. malformed KDD rows).
+    """
+    csv_path = Path(csv_path)
+    cache_path = Path(cache_path or cache_path_for(csv_path))
+    kind = detect_kind(csv_path)
+    stat = os.stat(csv_path)
+    sha256 = file_sha256(csv_path)
+
+    try:
+        if kind == KIND_KDD:
+            df = pd.read_csv(csv_path, header=None, names=KDD_COLUMNS, keep_default_na=False,
+                             float_precision='round_trip', low_memory=False)
+        else:
+            df = pd.read_csv(csv_path, float_precision='round_trip', low_memory=False)
+    except pd.errors.ParserError as e:
+        raise ValueError(f"{csv_path} cannot be cached: {e}")
+    encoded = _encode_columns(df, kind)
+
+    columns = {}
+    offset = 0
+    for name, (column_kind, values, vocabulary) in encoded.items():
+        columns[name] = {'kind': column_kind, 'dtype': values.dtype.str, 'shape': list(values.shape), 'offset': offset}
+        if vocabulary is not None:
+            columns[name]['vocabulary'] = vocabulary
+        offset = _align(offset + values.nbytes)
+    header = json.dumps({
+        'version': CACHE_VERSION,
+        'kind': kind,
+        'source': {
+            'path': str(csv_path.resolve()),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': sha256
+        },
+        'num_rows': len(df),
+        'columns': columns
+    }).encode('utf-8')
+
+    data_start = _align(16 + len(header))
+    tmp_path = str(cache_path) + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<Q', len(header)) + header)
+        for name, (_, values, _) in encoded.items():
+            f.write(b'\0' * (data_start + columns[name]['offset'] - f.tell()))
+            f.write(np.ascontiguousarray(values).tobytes())
+    os.replace(tmp_path, cache_path)
+    return cache_path
+
+
+class DatasetCache:
+    """Memory-mapped read-only view of a dataset cache"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:8] != MAGIC:
+            raise ValueError(f"{self.path} is not a dataset cache")
+        header_len = struct.unpack('<Q', self._mm[8:16])[0]
+        header = json.loads(self._mm[16:16 + header_len].decode('utf-8'))
+        if header['version'] != CACHE_VERSION:
+            raise ValueError(f"{self.path}: unsupported cache version {header['version']}")
+        data_start = _align(16 + header_len)
+
+        self.kind = header['kind']
+        self.source = header['source']
+        self.num_rows = header['num_rows']
+        self.column_names = list(header['columns'])
+        self.column_kinds = {name: col['kind'] for name, col in header['columns'].items()}
+        self.vocabularies = {name: col['vocabulary'] for name, col in header['columns'].items()
+                             if 'vocabulary' in col}
+        self.columns = {}
+        for name, col in header['columns'].items():
+            dtype = np.dtype(col['dtype'])
+            count = int(np.prod(col['shape']))
+            if count == 0:
+                self.columns[name] = np.empty(col['shape'], dtype=dtype)
+            else:
+                self.columns[name] = np.frombuffer(self._mm, dtype=dtype, count=count,
+                                                   offset=data_start + col['offset']).reshape(col['shape'])
+
+    def __len__(self):
+        return self.num_rows
+
+    def numeric_columns(self):
+        """Names of the numeric columns, in file order"""
+        return [name for name in self.column_names if self.column_kinds[name] == 'numeric']
+
+    def label_column(self):
+        """Name of the label column (None if the file has no labels)"""
+        for name in self.column_names:
+            if self.column_kinds[name] == 'label':
+                return name
+        return None
+
+    def numeric(self, names, start=0, stop=None):
+        """Rows [start, stop) of numeric columns as an (n, len(names)) float64 matrix"""
+        stop = self.num_rows if stop is None else min(stop, self.num_rows)
+        out = np.empty((max(stop - start, 0), len(names)), dtype=np.float64)
+        for j, name in enumerate(names):
+            out[:, j] = self.columns[name][start:stop]
+        return out
+
+    def decode(self, name, start=0, stop=None):
+        """Rows [start, stop) of a categorical/label column as strings ('' if missing)"""
+        vocabulary = np.array(self.vocabularies[name] + [''], dtype=object)
+        return vocabulary[self.columns[name][start:stop]]
+
+    def close(self):
+        self.columns = {}
+        self._mm.close()
+
+
+def is_current(cache_path, csv_path):
+    """
+    True if the cache at cache_path was built from the current csv_path
+    Size and mtime are checked first; a touched but unchanged file is
+    recognised by its SHA-256
+    """
+    try:
+        with open(cache_path, 'rb') as f:
+            if f.read(8) != MAGIC:
+                return False
+            header_len = struct.unpack('<Q', f.read(8))[0]
+            header = json.loads(f.read(header_len).decode('utf-8'))
+    except (OSError, ValueError, struct.error):
+        return False
+    if header.get('version') != CACHE_VERSION:
+        return False
+    source = header['source']
+    stat = os.stat(csv_path)
+    if stat.st_size != source['size']:
+        return False
+    return stat.st_mtime_ns == source['mtime_ns'] or file_sha256(csv_path) == source['sha256']
+
+
+def open_cache(csv_path, build=True):
+    """
+    Memory-map the cache of csv_path, (re)building it when missing or stale
+    Returns None when no usable cache exists, so callers can fall back to
+    parsing the CSV
+    """
+    cache_path = cache_path_for(csv_path)
+    if not is_current(cache_path, csv_path):
+        if not build:
+            return None
+        print(f"Building typed cache {cache_path}...")
+        try:
+            build_cache(csv_path, cache_path)
+        except (OSError, ValueError) as e:
+            print(f"Warning: cannot cache {csv_path} ({e}), parsing the CSV instead")
+            return None
+    return DatasetCache(cache_path)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python dataset_cache.py <dataset.csv> [dataset.cache]")
+        return 1
+
+    csv_path = Path(sys.argv[1])
+    cache_path = Path(sys.argv[2]) if len(sys.argv) > 2 else cache_path_for(csv_path)
+    build_cache(csv_path, cache_path)
+    cache = DatasetCache(cache_path)
+    print(f"✓ Cached {len(cache)} rows of {csv_path} -> {cache_path}")
+    print(f"  Kind: {cache.kind}, source sha256 {cache.source['sha256'][:16]}...")
+    for name in cache.column_names:
+        if name in cache.vocabularies:
+            print(f"  {name}: {cache.column_kinds[name]}, {len(cache.vocabularies[name])} values")
+    cache.close()
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
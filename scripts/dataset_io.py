@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Shared dataset I/O helpers
+Line-aligned byte-range splitting of large CSV files so several processes
+can read disjoint parts of the same file
+
+Dataset files may be gzip (.gz) or xz (.xz) compressed. Offsets then refer
+to the decompressed stream, and blocks are decompressed in a worker thread
+a bounded number of blocks ahead of the consumer, so decompression overlaps
+with parsing and scoring. A compressed stream cannot be split without
+decompressing its prefix, so it is always read as a single shard.
+"""
+
+import csv
+import gzip
+import lzma
+import os
+import queue
+import threading
+from pathlib import Path
+
+
+COMPRESSED_SUFFIXES = ('.gz', '.xz')
+
+# Decompressed blocks buffered ahead of the consumer
+PREFETCH_BLOCKS = 4
+
+
+def is_compressed(dataset_path):
+    return Path(dataset_path).suffix.lower() in COMPRESSED_SUFFIXES
+
+
+def find_dataset(dataset_path):
+    """dataset_path, or its .gz / .xz variant when only a compressed copy exists"""
+    if not os.path.exists(dataset_path):
+        for suffix in COMPRESSED_SUFFIXES:
+            if os.path.exists(str(dataset_path) + suffix):
+                return str(dataset_path) + suffix
+    return str(dataset_path)
+
+
+def open_dataset(dataset_path, mode='rb'):
+    """Open a dataset file, (de)compressing .gz / .xz files on the fly"""
+    suffix = Path(dataset_path).suffix.lower()
+    if suffix in COMPRESSED_SUFFIXES and 'b' not in mode:
+        mode = mode.replace('t', '') + 't'  # gzip/lzma default to binary
+    if suffix == '.gz':
+        return gzip.open(dataset_path, mode)
+    if suffix == '.xz':
+        return lzma.open(dataset_path, mode)
+    return open(dataset_path, mode)
+
+
+def prefetch(iterable, depth=PREFETCH_BLOCKS):
+    """
+    Yield the items of iterable, produced in a worker thread at most depth items ahead
+    zlib and lzma release the GIL while decompressing, so the producer runs
+    alongside the consumer. Producer exceptions are re-raised in the consumer.
+    """
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((True, item)):
+                    break
+            else:
+                put((True, done))
+        except Exception as e:
+            put((False, e))
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+
+    worker = threading.Thread(target=produce, daemon=True)
+    worker.start()
+    try:
+        while True:
+            ok, item = items.get()
+            if not ok:
+                raise item
+            if item is done:
+                return
+            yield item
+    finally:
+        # The consumer stopped early (or failed): release the producer
+        stop.set()
+        worker.join()
+
+
+def compute_shard_ranges(dataset_path, num_shards, start=0):
+    """
+    Split a file into num_shards byte ranges that start and end on line boundaries
+    start skips a prefix (e.g. a header line). Compressed files are one range
+    (start, None), None meaning the end of the stream.
+    """
+    if is_compressed(dataset_path):
+        return [(start, None)]
+    size = os.path.getsize(dataset_path)
+    boundaries = [start]
+    with open(dataset_path, 'rb') as f:
+        for k in range(1, num_shards):
+            pos = start + (size - start) * k // num_shards
+            if pos <= boundaries[-1]:
+                continue
+            f.seek(pos - 1)
+            f.readline()  # Advance to the start of the next line
+            if boundaries[-1] < f.tell() < size:
+                boundaries.append(f.tell())
+    boundaries.append(size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def iter_range_lines(dataset_path, start, end=None):
+    """Yield the decoded lines that start inside [start, end) (end=None: to the end of the file)"""
+    if is_compressed(dataset_path) and end is None:
+        for block in iter_range_blocks(dataset_path, start, end):
+            yield from block.decode().splitlines(keepends=True)
+        return
+    with open_dataset(dataset_path, 'rb') as f:
+        f.seek(start)
+        pos = start
+        for line in f:
+            if end is not None and pos >= end:
+                break
+            pos += len(line)
+            yield line.decode()
+
+
+def iter_range_rows(dataset_path, start, end=None):
+    """Yield non-empty CSV rows of the lines that start inside [start, end)"""
+    for row in csv.reader(iter_range_lines(dataset_path, start, end)):
+        if len(row) > 0:
+            yield row
+
+
+def iter_range_blocks(dataset_path, start, end=None, block_bytes=64 << 20):
+    """
+    Yield raw byte blocks of roughly block_bytes covering [start, end) (end=None: to the end of the file)
+    Every block ends on a line boundary, so it can be handed to a CSV parser.
+    Compressed files are decompressed in a worker thread (see prefetch).
+    """
+    blocks = _iter_blocks(dataset_path, start, end, block_bytes)
+    return prefetch(blocks) if is_compressed(dataset_path) else blocks
+
+
+def _iter_blocks(dataset_path, start, end, block_bytes):
+    with open_dataset(dataset_path, 'rb') as f:
+        f.seek(start)
+        remaining = None if end is None else end - start
+        carry = b''
+        while remaining is None or remaining > 0:
+            data = f.read(block_bytes if remaining is None else min(block_bytes, remaining))
+            if not data:
+                break
+            if remaining is not None:
+                remaining -= len(data)
+            data = carry + data
+            cut = data.rfind(b'\n') + 1 if remaining is None or remaining > 0 else len(data)
+            if cut > 0:
+                yield data[:cut]
+            carry = data[cut:]
+        if carry:
+            yield carry
+
+
+def read_header(dataset_path):
+    """First line of a CSV file as (column names, byte offset of the first data line)"""
+    with open_dataset(dataset_path, 'rb') as f:
+        line = f.readline()
+    return next(csv.reader([line.decode()])), len(line)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Bulk offline evaluation of the fixed-point detector on a labeled dataset
+Attack flags come from pca_scoring.detect_two_tier: a float prescreen with
+exact fixed-point rescoring of the samples near the thresholds or at risk
+of 32-bit wrap, so the flags are those of the bit-exact path. The rescoring
+(or, with --early-exit, every sample) goes through detect_early_exit, which
+skips the reconstruction/SPE stage for samples over the minor threshold.
+Profiles that shift the accumulated projection sum instead of every product
+are scored by the exact path directly: their exact kernel is already one
+integer matrix product, cheaper than the prescreen and its error bounds.
+With --ensemble, further models are scored alongside --model in one pass
+(pca_scoring.score_ensemble_batch) and their votes combined.
+"""
+
+import numpy as np
+import argparse
+import time
+from pathlib import Path
+
+from pca_scoring import (detect_two_tier, detect_early_exit, score_fixed_batch, score_ensemble_batch,
+                         fixed_point_convert_array, get_profile)
+from model_artifact import load_model
+from calibrate_threshold import load_labeled_features
+from dataset_io import find_dataset
+
+
+def prescreen_pays(profile):
+    """True if the float prescreen of detect_two_tier is cheaper than the profile's exact kernel"""
+    return get_profile(profile)['projection_shift'] == 'product'
+
+
+def detection_summary(attack, labels):
+    """Confusion counts and rates of attack flags against labels (1 = attack)"""
+    attack = attack.astype(bool)
+    tp = int(np.sum(attack & (labels == 1)))
+    fp = int(np.sum(attack & (labels == 0)))
+    fn = int(np.sum(~attack & (labels == 1)))
+    tn = int(np.sum(~attack & (labels == 0)))
+    return {
+        'tp': tp, 'fp': fp, 'fn': fn, 'tn': tn,
+        'tpr': tp / max(tp + fn, 1),
+        'fpr': fp / max(fp + tn, 1),
+        'precision': tp / max(tp + fp, 1),
+        'accuracy': (tp + tn) / max(len(labels), 1),
+    }
+
+
+def _print_summary(name, summary):
+    print(f"{name}: TP {summary['tp']}, FP {summary['fp']}, FN {summary['fn']}, TN {summary['tn']}, "
+          f"TPR {summary['tpr']:.4f}, FPR {summary['fpr']:.4f}, precision {summary['precision']:.4f}")
+
+
+def evaluate_ensemble(features_fixed, labels, models, names, profile, combine):
+    """Score an ensemble in one pass and print each model's and the combined detection summary"""
+    start = time.perf_counter()
+    _, _, attack, combined = score_ensemble_batch(features_fixed, models, profile, combine, dedup=True)
+    elapsed = time.perf_counter() - start
+
+    print(f"\nEnsemble of {len(models)} models, profile '{profile}': {elapsed:.2f}s")
+    for j, name in enumerate(names):
+        _print_summary(f"  [{j}] {name}", detection_summary(attack[:, j], labels))
+    _print_summary(f"  Combined ({combine})", detection_summary(combined, labels))
+    return 0
+
+
+def main():
+    base_dir = Path(__file__).parent.parent
+
+    parser = argparse.ArgumentParser(description="Evaluate the fixed-point detector on a labeled dataset")
+    parser.add_argument('--dataset', default=find_dataset(base_dir / "dataset" / "kddcup.data_10_percent.csv"))
+    parser.add_argument('--model', default=str(base_dir / "model" / "pca_coeffs.json"))
+    parser.add_argument('--profile', default='pca_detector', help="Scoring profile (see pca_scoring.PROFILES)")
+    parser.add_argument('--margin', type=float, default=0.0,
+                        help="Extra prescreen guard band as a fraction of the thresholds")
+    parser.add_argument('--exact', action='store_true', help="Score every sample with the exact path only")
+    parser.add_argument('--early-exit', action='store_true',
+                        help="No float prescreen: exact minor score first, SPE only below the minor threshold")
+    parser.add_argument('--verify', action='store_true', help="Also run the exact path and compare the flags")
+    parser.add_argument('--ensemble', nargs='+', default=None, metavar='MODEL',
+                        help="Further models scored together with --model")
+    parser.add_argument('--combine', default='any',
+                        help="Ensemble decision: any, all, majority or a minimum vote count")
+    parser.add_argument('--max-samples', type=int, default=None)
+    parser.add_argument('--no-cache', action='store_true')
+    args = parser.parse_args()
+
+    print(f"Loading PCA model from {args.model}...")
+    model = load_model(args.model)
+
+    print(f"Loading labeled dataset from {args.dataset}...")
+    features, labels = load_labeled_features(args.dataset, model, args.max_samples, not args.no_cache)
+    features_fixed = fixed_point_convert_array(features, model['config']['frac_bits'])
+    print(f"Samples: {len(labels)} (normal {int(np.sum(labels == 0))}, attack {int(labels.sum())})")
+
+    if args.ensemble:
+        return evaluate_ensemble(features_fixed, labels, [model] + [load_model(path) for path in args.ensemble],
+                                 [args.model] + args.ensemble, args.profile, args.combine)
+
+    start = time.perf_counter()
+    if args.exact or (not args.early_exit and not prescreen_pays(args.profile)):
+        _, _, attack = score_fixed_batch(features_fixed, model, args.profile, dedup=True)
+        detail = "exact path for every sample" + ("" if args.exact else " (no per-product shifts to prescreen)")
+    elif args.early_exit:
+        attack, early_exit = detect_early_exit(features_fixed, model, args.profile, dedup=True)
+        detail = f"minor-score early exit for {int(early_exit.sum())} samples ({early_exit.mean():.2%})"
+    else:
+        attack, rescored = detect_two_tier(features_fixed, model, args.profile, margin=args.margin, dedup=True)
+        detail = f"exact path for {int(rescored.sum())} samples ({rescored.mean():.2%})"
+    elapsed = time.perf_counter() - start
+
+    summary = detection_summary(attack, labels)
+    print(f"\nProfile '{args.profile}': {elapsed:.2f}s, {detail}")
+    print(f"  TP {summary['tp']}, FP {summary['fp']}, FN {summary['fn']}, TN {summary['tn']}")
+    print(f"  TPR {summary['tpr']:.4f}, FPR {summary['fpr']:.4f}, precision {summary['precision']:.4f}, "
+          f"accuracy {summary['accuracy']:.4f}")
+
+    if args.verify and not args.exact:
+        start = time.perf_counter()
+        _, _, exact = score_fixed_batch(features_fixed, model, args.profile, dedup=True)
+        elapsed = time.perf_counter() - start
+        mismatches = int(np.sum(exact != attack))
+        print(f"Exact path: {elapsed:.2f}s, {mismatches} flag mismatches")
+        if mismatches:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
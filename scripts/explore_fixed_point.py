@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Fixed-point format design-space explorer for pca_detector.sv
+Runs the bit-exact datapath with configurable per-stage register widths
+(input, centered, projection, reconstruction/residual and score
+accumulators) over a dataset, counts the samples whose values wrap or
+saturate at each stage and the detection disagreements against the
+floating point model, and recommends the narrowest safe width per stage.
+
+With all widths at 32 and 'wrap' overflow the datapath is the
+'pca_detector' profile of pca_scoring, i.e. the current RTL.
+"""
+
+import numpy as np
+import argparse
+import csv
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from pca_scoring import (score_float_batch, compare_threshold, model_thresholds, unique_rows, _model_arrays)
+from model_artifact import load_model
+from fixed_point import fit, quantize, multiply_accumulate, sum_of_squares
+from calibrate_threshold import load_labeled_features
+from dataset_io import find_dataset
+
+
+STAGES = ('input', 'centered', 'projection', 'reconstruction', 'score')
+BASELINE_BITS = 32
+
+# Cyclone V variable-precision DSP multiplier modes (signed operand widths)
+DSP_MODES = ((18, 18), (27, 27))
+
+
+def _row_events(mask):
+    return mask.reshape(len(mask), -1).any(axis=1)
+
+
+def _mac(a, b, frac_bits, bits, overflow):
+    """
+    a @ b.T with every product shifted by frac_bits and accumulated in a bits-wide register
+    Returns (accumulator, per-row event mask)
+    """
+    events = np.zeros(a.shape[0], dtype=bool)
+    acc = multiply_accumulate(a, b, frac_bits, 'product', bits, bits, overflow, events)
+    return acc, events
+
+
+def score_fixed_stages(features_float, model, widths, overflow='wrap'):
+    """
+    Bit-exact scores with per-stage register widths
+
+    Args:
+        features_float: (n_samples, N_FEATURES) float features
+        model: PCA model dictionary
+        widths: {stage: bits} for every entry of STAGES
+        overflow: 'wrap' (two's complement) or 'saturate'
+
+    Returns:
+        (major_scores, minor_scores, {stage: per-sample event mask})
+    """
+    frac_bits = model['config']['frac_bits']
+    mean_fixed, components, q = _model_arrays(model)
+    events = {}
+
+    features_fixed, outside = fit(quantize(features_float, frac_bits), widths['input'], overflow)
+    events['input'] = _row_events(outside)
+
+    centered, outside = fit(features_fixed - mean_fixed, widths['centered'], overflow)
+    events['centered'] = _row_events(outside)
+
+    proj, events['projection'] = _mac(centered, components, frac_bits, widths['projection'], overflow)
+    major_proj = proj[:, :q]
+    minor_proj = proj[:, q:]
+
+    recon, recon_events = _mac(major_proj, components[:q].T, frac_bits, widths['reconstruction'], overflow)
+    residual, outside = fit(centered - recon, widths['reconstruction'], overflow)
+    events['reconstruction'] = recon_events | _row_events(outside)
+
+    major, major_events = _sum_of_squares(residual, frac_bits, widths['score'], overflow)
+    minor, minor_events = _sum_of_squares(minor_proj, frac_bits, widths['score'], overflow)
+    events['score'] = major_events | minor_events
+    return major, minor, events
+
+
+def _sum_of_squares(a, frac_bits, bits, overflow):
+    """Row-wise sum of (a * a) >> frac_bits in a bits-wide accumulator"""
+    events = np.zeros(a.shape[0], dtype=bool)
+    acc = sum_of_squares(a, frac_bits, 'product', bits, bits, overflow, events)
+    return acc, events
+
+
+# Widths the int64 model can evaluate exactly: squared projection and
+# residual values must stay below 2^63
+MAX_BITS = {'input': 32, 'centered': 32, 'projection': 32, 'reconstruction': 32, 'score': 56}
+
+
+def _parse_widths(text):
+    """'16:32' (range), '16:32:4' (range with step) or '16,24,32'"""
+    if ':' in text:
+        parts = [int(v) for v in text.split(':')]
+        return list(range(parts[0], parts[1] + 1, parts[2] if len(parts) > 2 else 1))
+    return [int(v) for v in text.split(',') if v.strip()]
+
+
+# Worker state, set once per process by _init_worker
+_DATA = {}
+
+
+def _init_worker(features, counts, model, float_attack):
+    _DATA.update({'features': features, 'counts': counts, 'model': model, 'float_attack': float_attack})
+
+
+def _evaluate(task):
+    """Worker: score the dataset with one width configuration"""
+    widths, overflow = task
+    features, counts, model = _DATA['features'], _DATA['counts'], _DATA['model']
+    float_attack = _DATA['float_attack']
+
+    major, minor, events = score_fixed_stages(features, model, widths, overflow)
+    thresholds = model_thresholds(model)
+    # The threshold registers share the score width
+    threshold_fits = max(thresholds) < (1 << (widths['score'] - 1))
+    attack = compare_threshold(major, minor, thresholds, 'abs_wrap').astype(bool)
+
+    result = {'overflow': overflow, 'threshold_fits': threshold_fits}
+    result.update({f'{stage}_bits': widths[stage] for stage in STAGES})
+    result.update({f'{stage}_events': int(counts[events[stage]].sum()) for stage in STAGES})
+    result['extra_alerts'] = int(counts[attack & ~float_attack].sum())
+    result['missed_alerts'] = int(counts[~attack & float_attack].sum())
+    result['disagreements'] = result['extra_alerts'] + result['missed_alerts']
+    return result
+
+
+def _widths_of(result):
+    return {stage: result[f'{stage}_bits'] for stage in STAGES}
+
+
+def is_safe(result, reference, max_disagreements=0):
+    """
+    A configuration is safe when no stage overflows on more samples than in
+    the widest configuration, the thresholds fit the score registers, and it
+    disagrees with float on at most max_disagreements more samples
+    """
+    return (result['threshold_fits'] and
+            all(result[f'{stage}_events'] <= reference[f'{stage}_events'] for stage in STAGES) and
+            result['disagreements'] <= reference['disagreements'] + max_disagreements)
+
+
+def _run(pool, tasks):
+    return list(pool.map(_evaluate, tasks))
+
+
+def recommend(pool, candidates, overflow, max_disagreements=0):
+    """
+    Narrowest safe width per stage for one overflow mode
+
+    Each stage is swept on its own with the other stages at their widest
+    candidate; a stage's width is the narrowest one that is safe together
+    with every wider candidate. The combined configuration is then checked,
+    and stages that overflow more than in the widest configuration are
+    widened one candidate at a time until it is safe.
+
+    Returns:
+        (recommended result, reference result, every evaluated result)
+    """
+    widest = {stage: max(candidates[stage]) for stage in STAGES}
+    reference = _run(pool, [(widest, overflow)])[0]
+    evaluated = [reference]
+
+    tasks = []
+    for stage in STAGES:
+        for bits in sorted(candidates[stage]):
+            if bits != widest[stage]:
+                tasks.append((dict(widest, **{stage: bits}), overflow))
+    results = _run(pool, tasks)
+    evaluated += results
+
+    chosen = dict(widest)
+    for stage in STAGES:
+        by_bits = {r[f'{stage}_bits']: r for r in results
+                   if _widths_of(r) == dict(widest, **{stage: r[f'{stage}_bits']})}
+        by_bits[widest[stage]] = reference
+        for bits in sorted(by_bits, reverse=True):
+            if not is_safe(by_bits[bits], reference, max_disagreements):
+                break
+            chosen[stage] = bits
+
+    while True:
+        result = _run(pool, [(chosen, overflow)])[0]
+        evaluated.append(result)
+        if is_safe(result, reference, max_disagreements):
+            return result, reference, evaluated
+        grow = [stage for stage in STAGES if result[f'{stage}_events'] > reference[f'{stage}_events']]
+        if not result['threshold_fits']:
+            grow.append('score')
+        if not grow:
+            grow = [stage for stage in STAGES if chosen[stage] < widest[stage]]
+        for stage in set(grow):
+            wider = [bits for bits in sorted(candidates[stage]) if bits > chosen[stage]]
+            chosen[stage] = wider[0] if wider else widest[stage]
+
+
+def multiplier_widths(model, widths):
+    """Signed operand widths of every multiplier for a width configuration"""
+    _, components, _ = _model_arrays(model)
+    coeff_bits = int(np.max(np.abs(components))).bit_length() + 1
+    return {
+        'projection (centered x coeff)': (widths['centered'], coeff_bits),
+        'reconstruction (projection x coeff)': (widths['projection'], coeff_bits),
+        'major score (residual^2)': (widths['reconstruction'], widths['reconstruction']),
+        'minor score (projection^2)': (widths['projection'], widths['projection']),
+    }
+
+
+def dsp_mode(a_bits, b_bits):
+    """Smallest DSP multiplier mode that holds both operands"""
+    for a, b in DSP_MODES:
+        if max(a_bits, b_bits) <= a and min(a_bits, b_bits) <= b:
+            return f'{a}x{b}'
+    return 'multi-DSP'
+
+
+def save_table(results, path):
+    columns = ['overflow'] + [f'{stage}_bits' for stage in STAGES] + [f'{stage}_events' for stage in STAGES] + \
+              ['threshold_fits', 'extra_alerts', 'missed_alerts', 'disagreements']
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        for row in results:
+            writer.writerow({name: row[name] for name in columns})
+
+
+def print_result(name, result, total):
+    widths = ', '.join(f"{stage} {result[f'{stage}_bits']}" for stage in STAGES)
+    events = ', '.join(f"{stage} {result[f'{stage}_events']}" for stage in STAGES)
+    print(f"  {name}: {widths}")
+    print(f"    Overflow events (samples): {events}")
+    print(f"    Disagreements with float: {result['disagreements']} ({result['disagreements'] / total:.4%}; "
+          f"{result['extra_alerts']} extra, {result['missed_alerts']} missed)")
+
+
+def main():
+    base_dir = Path(__file__).parent.parent
+
+    parser = argparse.ArgumentParser(description="Explore per-stage fixed-point widths of the PCA datapath")
+    parser.add_argument('--dataset', default=find_dataset(base_dir / "dataset" / "kddcup.data_10_percent.csv"))
+    parser.add_argument('--model', default=str(base_dir / "model" / "pca_coeffs.json"))
+    parser.add_argument('--output', default=str(base_dir / "model" / "fixed_point_explore.csv"))
+    for stage in STAGES:
+        parser.add_argument(f'--{stage}-bits', default=f"16:{MAX_BITS[stage] if stage == 'score' else 32}",
+                            help="Candidate widths: 'lo:hi[:step]' or a comma-separated list")
+    parser.add_argument('--overflow', default='wrap,saturate', help="Overflow modes to explore")
+    parser.add_argument('--grid', action='store_true', help="Evaluate the full Cartesian grid as well")
+    parser.add_argument('--max-disagreements', type=int, default=0,
+                        help="Extra float disagreements allowed over the widest configuration")
+    parser.add_argument('--max-samples', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--no-cache', action='store_true')
+    args = parser.parse_args()
+
+    candidates = {stage: _parse_widths(getattr(args, f'{stage}_bits')) for stage in STAGES}
+    for stage in STAGES:
+        if not candidates[stage] or min(candidates[stage]) < 2 or max(candidates[stage]) > MAX_BITS[stage]:
+            parser.error(f"--{stage}-bits must lie in 2..{MAX_BITS[stage]}")
+    modes = [m for m in args.overflow.split(',') if m]
+    workers = args.workers or os.cpu_count() or 1
+
+    print(f"Loading PCA model from {args.model}...")
+    model = load_model(args.model)
+    frac_bits = model['config']['frac_bits']
+
+    print(f"Loading dataset from {args.dataset}...")
+    features, _ = load_labeled_features(args.dataset, model, args.max_samples, not args.no_cache)
+    features, _, counts = unique_rows(features)
+    total = int(counts.sum())
+    print(f"Samples: {total} ({len(features)} distinct)")
+
+    major_f, minor_f = score_float_batch(features, model)
+    major_t, minor_t = model_thresholds(model)
+    float_attack = (major_f > major_t / (1 << frac_bits)) | (minor_f > minor_t / (1 << frac_bits))
+
+    results = []
+    summary = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(features, counts, model, float_attack)) as pool:
+        rtl = _run(pool, [({stage: 32 for stage in STAGES}, 'wrap')])[0]
+        results.append(rtl)
+        for overflow in modes:
+            print(f"Sweeping stage widths with '{overflow}' overflow...")
+            best, reference, evaluated = recommend(pool, candidates, overflow, args.max_disagreements)
+            results += evaluated
+            summary[overflow] = (best, reference)
+        if args.grid:
+            grid = [(dict(zip(STAGES, combo)), overflow) for overflow in modes
+                    for combo in itertools.product(*(candidates[stage] for stage in STAGES))]
+            print(f"Evaluating the full grid ({len(grid)} configurations)...")
+            results += list(pool.map(_evaluate, grid, chunksize=max(len(grid) // (workers * 4), 1)))
+
+    print("\nCurrent datapath (all stages 32-bit, wrapping):")
+    print_result('RTL', rtl, total)
+    for overflow, (best, reference) in summary.items():
+        print(f"\n'{overflow}' overflow:")
+        print_result('Widest', reference, total)
+        print_result('Recommended', best, total)
+        saved = sum(32 - best[f'{stage}_bits'] for stage in STAGES if stage != 'score')
+        print(f"    Register bits saved vs 32-bit stages: {saved} (score accumulator {best['score_bits']} bits)")
+        for name, (a_bits, b_bits) in multiplier_widths(model, _widths_of(best)).items():
+            print(f"    {name}: {a_bits} x {b_bits} bits -> {dsp_mode(a_bits, b_bits)}")
+
+    save_table(results, args.output)
+    print(f"\nAll evaluated configurations saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
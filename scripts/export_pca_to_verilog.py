@@ -4,17 +4,32 @@ Export PCA coefficients to Verilog-readable format
 Can be used standalone or as part of the main pipeline
 """
 
-import json
 import sys
 from pathlib import Path
 
+from model_artifact import load_model
+from pca_scoring import model_thresholds, sparse_coefficients, ensemble_layout, votes_needed
+
+
+def _literal(value, width):
+    """Signed sized literal (the sign goes before the size: -32'sd5)"""
+    value = int(value)
+    return f"{width}'sd{value}" if value >= 0 else f"-{width}'sd{-value}"
+
+
+def _table(values, width=None):
+    """Ascending-index table literal, padded with a 0 entry when empty (SV has no zero-size arrays)"""
+    values = [int(v) for v in values] or [0]
+    if width is None:
+        return ", ".join(str(v) for v in values)
+    return ", ".join(_literal(v, width) for v in values)
+
 
 def export_to_verilog_params(json_path: str, output_path: str):
     """
     Convert PCA coefficients JSON to Verilog parameter file
     """
-    with open(json_path, 'r') as f:
-        coeffs = json.load(f)
+    coeffs = load_model(json_path)
     
     config = coeffs['config']
     n_features = config['n_features']
@@ -27,6 +42,9 @@ def export_to_verilog_params(json_path: str, output_path: str):
     verilog_code = f"""// PCA Coefficients Package
 // Auto-generated from {json_path}
 
+`ifndef PCA_COEFFS_PKG_SV
+`define PCA_COEFFS_PKG_SV
+
 package pca_coeffs_pkg;
 
     parameter N_FEATURES = {n_features};
@@ -41,7 +59,7 @@ package pca_coeffs_pkg;
     
     # Add mean values
     for i, val in enumerate(coeffs['mean_fixed']):
-        verilog_code += f"        {total_bits}'sd{val}"
+        verilog_code += f"        {_literal(val, total_bits)}"
         if i < n_features - 1:
             verilog_code += ","
         verilog_code += f"  // Feature {i}\n"
@@ -55,7 +73,7 @@ package pca_coeffs_pkg;
     for i, row in enumerate(coeffs['major_components_fixed']):
         verilog_code += "        '{\n"
         for j, val in enumerate(row):
-            verilog_code += f"            {total_bits}'sd{val}"
+            verilog_code += f"            {_literal(val, total_bits)}"
             if j < len(row) - 1:
                 verilog_code += ","
             verilog_code += "\n"
@@ -73,7 +91,7 @@ package pca_coeffs_pkg;
     for i, row in enumerate(coeffs['minor_components_fixed']):
         verilog_code += "        '{\n"
         for j, val in enumerate(row):
-            verilog_code += f"            {total_bits}'sd{val}"
+            verilog_code += f"            {_literal(val, total_bits)}"
             if j < len(row) - 1:
                 verilog_code += ","
             verilog_code += "\n"
@@ -83,7 +101,33 @@ package pca_coeffs_pkg;
         verilog_code += f"  // Minor component {i}\n"
     
     verilog_code += "    };\n\n"
-    verilog_code += "endpackage\n"
+    
+    # Add attack thresholds (calibrated ones stored with the model, if any)
+    major_threshold, minor_threshold = model_thresholds(coeffs)
+    verilog_code += "    // Attack thresholds (fixed-point): a score above either one flags an attack\n"
+    verilog_code += f"    parameter logic [DATA_WIDTH-1:0] MAJOR_THRESHOLD = {total_bits}'d{major_threshold};\n"
+    verilog_code += f"    parameter logic [DATA_WIDTH-1:0] MINOR_THRESHOLD = {total_bits}'d{minor_threshold};\n\n"
+    # Sparse datapath tables for pca_detector_sparse.sv (pruned by prune_pca.py,
+    # otherwise every nonzero coefficient and every feature)
+    features, rows, cols, values = sparse_coefficients(coeffs)
+    mean_fixed = coeffs['mean_fixed']
+    verilog_code += "    // Sparse datapath (pca_detector_sparse.sv): active features and kept coefficients\n"
+    verilog_code += "    // PRUNED selects pca_detector_sparse in top_pipeline (the golden models score pruned models sparsely)\n"
+    verilog_code += f"    parameter bit PRUNED = 1'b{1 if coeffs.get('sparse') else 0};\n"
+    verilog_code += "    // COEFF_ROW: stacked component (major 0..Q-1, minor Q..Q+R-1), COEFF_COL: active feature position\n"
+    verilog_code += f"    parameter N_ACTIVE = {len(features)};\n"
+    verilog_code += f"    parameter ACTIVE_TABLE_SIZE = {max(len(features), 1)};\n"
+    verilog_code += f"    parameter NNZ = {len(values)};\n"
+    verilog_code += f"    parameter COEFF_TABLE_SIZE = {max(len(values), 1)};\n"
+    verilog_code += f"    parameter int ACTIVE_FEATURES [0:ACTIVE_TABLE_SIZE-1] = '{{{_table(features)}}};\n"
+    verilog_code += (f"    parameter logic signed [DATA_WIDTH-1:0] ACTIVE_MEAN [0:ACTIVE_TABLE_SIZE-1] = "
+                     f"'{{{_table([mean_fixed[f] for f in features], total_bits)}}};\n")
+    verilog_code += f"    parameter int COEFF_ROW [0:COEFF_TABLE_SIZE-1] = '{{{_table(rows)}}};\n"
+    verilog_code += f"    parameter int COEFF_COL [0:COEFF_TABLE_SIZE-1] = '{{{_table(cols)}}};\n"
+    verilog_code += (f"    parameter logic signed [DATA_WIDTH-1:0] COEFF_VALUE [0:COEFF_TABLE_SIZE-1] = "
+                     f"'{{{_table(values, total_bits)}}};\n\n")
+    verilog_code += "endpackage\n\n"
+    verilog_code += "`endif // PCA_COEFFS_PKG_SV\n"
     
     with open(output_path, 'w') as f:
         f.write(verilog_code)
@@ -91,9 +135,94 @@ package pca_coeffs_pkg;
     print(f"Exported to {output_path}")
 
 
+def _matrix(rows, width):
+    """Nested array literal, one line per row"""
+    return ",\n".join(f"        '{{{_table(row, width)}}}" for row in rows)
+
+
+def export_ensemble_to_verilog(model_paths, output_path, combine='any'):
+    """
+    Export several models as one pca_ensemble_pkg (layout of pca_scoring.ensemble_layout)
+    Models sharing a mean share one MEANS row; COMPONENTS stacks every
+    model's major then minor rows, starting at MODEL_OFFSET
+    """
+    models = [load_model(path) for path in model_paths]
+    layout = ensemble_layout(models)
+    total_bits = models[0]['config']['total_bits']
+    n_models = len(models)
+
+    sources = "\n".join(f"//   model {j}: {path}" for j, path in enumerate(model_paths))
+    verilog_code = f"""// PCA Ensemble Coefficients Package
+// Auto-generated from
+{sources}
+
+`ifndef PCA_ENSEMBLE_PKG_SV
+`define PCA_ENSEMBLE_PKG_SV
+
+package pca_ensemble_pkg;
+
+    parameter N_FEATURES = {models[0]['config']['n_features']};
+    parameter N_MODELS = {n_models};
+    parameter N_MEANS = {len(layout['means'])};
+    parameter N_COMPONENTS = {len(layout['components'])};
+    parameter DATA_WIDTH = {total_bits};
+    parameter FRAC_BITS = {layout['frac_bits']};
+
+    // Models voting 'attack' needed for the combined decision ({combine})
+    parameter ENSEMBLE_VOTES = {votes_needed(n_models, combine)};
+
+    // Distinct mean vectors (fixed-point), centered once each
+    parameter logic signed [DATA_WIDTH-1:0] MEANS [0:N_MEANS-1][0:N_FEATURES-1] = '{{
+{_matrix(layout['means'], total_bits)}
+    }};
+
+    // Per model: mean row, first stacked component row, Q and R
+    parameter int MODEL_MEAN [0:N_MODELS-1] = '{{{_table(layout['mean_index'])}}};
+    parameter int MODEL_OFFSET [0:N_MODELS-1] = '{{{_table(layout['offsets'])}}};
+    parameter int MODEL_Q [0:N_MODELS-1] = '{{{_table(layout['q'])}}};
+    parameter int MODEL_R [0:N_MODELS-1] = '{{{_table(layout['r'])}}};
+
+    // Features scored by each model (0: pruned from the model's major score)
+    parameter logic MODEL_ACTIVE [0:N_MODELS-1][0:N_FEATURES-1] = '{{
+{_matrix(layout['active'].astype(int), None)}
+    }};
+
+    // Stacked components of all models, grouped by mean (pruned coefficients are 0)
+    parameter logic signed [DATA_WIDTH-1:0] COMPONENTS [0:N_COMPONENTS-1][0:N_FEATURES-1] = '{{
+{_matrix(layout['components'], total_bits)}
+    }};
+
+    // Attack thresholds (fixed-point) per model
+    parameter logic [DATA_WIDTH-1:0] MAJOR_THRESHOLDS [0:N_MODELS-1] = '{{{_table(layout['thresholds'][0])}}};
+    parameter logic [DATA_WIDTH-1:0] MINOR_THRESHOLDS [0:N_MODELS-1] = '{{{_table(layout['thresholds'][1])}}};
+
+endpackage
+
+`endif // PCA_ENSEMBLE_PKG_SV
+"""
+    with open(output_path, 'w') as f:
+        f.write(verilog_code)
+
+    print(f"Exported {n_models}-model ensemble to {output_path}")
+
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--ensemble':
+        if len(sys.argv) < 4:
+            print("Usage: python export_pca_to_verilog.py --ensemble <output.sv> <model.json>... [--combine MODE]")
+            sys.exit(1)
+        args = sys.argv[2:]
+        combine = 'any'
+        if '--combine' in args:
+            i = args.index('--combine')
+            combine = args[i + 1]
+            args = args[:i] + args[i + 2:]
+        export_ensemble_to_verilog(args[1:], args[0], combine)
+        sys.exit(0)
+
     if len(sys.argv) < 2:
         print("Usage: python export_pca_to_verilog.py <pca_coeffs.json> [output.sv]")
+        print("       python export_pca_to_verilog.py --ensemble <output.sv> <model.json>... [--combine MODE]")
         sys.exit(1)
     
     json_path = sys.argv[1]
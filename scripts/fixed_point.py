@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Vectorized Q-format fixed-point arithmetic
+Q(m, n) values are stored as raw int64 integers scaled by 2^n, in a
+register of m + n bits (the sign bit counts towards m, so Q24.8 is the
+32-bit signed format of pca_detector.sv). Conversion, wrapping and
+saturation are whole-array operations, and FixedArray counts the elements
+that did not fit its format.
+
+Overflow modes:
+    'wrap'      - two's complement wrap, like a Verilog register
+    'saturate'  - clamp to the format's range
+
+Rounding modes of float -> fixed conversion:
+    'nearest'   - round half to even, like Python's round()
+    'half_up'   - round half towards +inf
+    'floor'     - towards -inf, like an arithmetic right shift
+    'truncate'  - towards zero
+"""
+
+import numpy as np
+
+
+OVERFLOW_MODES = ('wrap', 'saturate')
+ROUNDING_MODES = ('nearest', 'half_up', 'floor', 'truncate')
+
+# Scaled floats beyond this are clamped before the int64 cast
+_INT64_LIMIT = 2.0**62
+
+
+class QFormat:
+    """Q(int_bits, frac_bits) format, signed by default"""
+
+    def __init__(self, int_bits=24, frac_bits=8, signed=True):
+        if int_bits + frac_bits < 1 or int_bits + frac_bits > 63:
+            raise ValueError(f"Unsupported Q format width {int_bits + frac_bits}")
+        self.int_bits = int(int_bits)
+        self.frac_bits = int(frac_bits)
+        self.signed = bool(signed)
+
+    @classmethod
+    def parse(cls, text):
+        """'Q24.8' or 'UQ16.16'"""
+        signed = not text.upper().startswith('U')
+        int_bits, frac_bits = text.upper().lstrip('U').lstrip('Q').split('.')
+        return cls(int(int_bits), int(frac_bits), signed)
+
+    @classmethod
+    def of_width(cls, bits, frac_bits=8, signed=True):
+        """Format of a bits-wide register with frac_bits fractional bits"""
+        return cls(bits - frac_bits, frac_bits, signed)
+
+    @property
+    def bits(self):
+        return self.int_bits + self.frac_bits
+
+    @property
+    def min_raw(self):
+        return -(1 << (self.bits - 1)) if self.signed else 0
+
+    @property
+    def max_raw(self):
+        return (1 << (self.bits - 1)) - 1 if self.signed else (1 << self.bits) - 1
+
+    @property
+    def scale(self):
+        return 1 << self.frac_bits
+
+    def __eq__(self, other):
+        return isinstance(other, QFormat) and (self.int_bits, self.frac_bits, self.signed) == \
+            (other.int_bits, other.frac_bits, other.signed)
+
+    def __hash__(self):
+        return hash((self.int_bits, self.frac_bits, self.signed))
+
+    def __repr__(self):
+        return f"{'' if self.signed else 'U'}Q{self.int_bits}.{self.frac_bits}"
+
+
+Q24_8 = QFormat(24, 8)
+
+
+def _format(fmt):
+    """A QFormat from a QFormat or a signed register width in bits"""
+    return fmt if isinstance(fmt, QFormat) else QFormat.of_width(fmt, 0)
+
+
+def wrap(values, bits=32):
+    """Wrap int64 values to a signed bits-wide register, keeping int64 dtype"""
+    if bits == 32:
+        return values.astype(np.int32).astype(np.int64)
+    lo = -(1 << (bits - 1))
+    return ((values - lo) & ((1 << bits) - 1)) + lo
+
+
+def fit(values, fmt, overflow='wrap'):
+    """
+    Fit int64 raw values into a format (or a signed register width in bits)
+    Returns (fitted values, mask of values that did not fit)
+    """
+    fmt = _format(fmt)
+    values = np.asarray(values, dtype=np.int64)
+    outside = (values < fmt.min_raw) | (values > fmt.max_raw)
+    if overflow == 'saturate':
+        return np.clip(values, fmt.min_raw, fmt.max_raw), outside
+    if overflow == 'wrap':
+        if fmt.signed:
+            return wrap(values, fmt.bits), outside
+        return values & ((1 << fmt.bits) - 1), outside
+    raise ValueError(f"Unknown overflow mode '{overflow}'")
+
+
+def quantize(values, frac_bits=8, rounding='nearest'):
+    """Floats scaled by 2^frac_bits and rounded to int64 (clamped to +-2^62 first)"""
+    scaled = np.asarray(values, dtype=np.float64) * (1 << frac_bits)
+    if rounding == 'nearest':
+        scaled = np.round(scaled)
+    elif rounding == 'half_up':
+        scaled = np.floor(scaled + 0.5)
+    elif rounding == 'floor':
+        scaled = np.floor(scaled)
+    elif rounding == 'truncate':
+        scaled = np.trunc(scaled)
+    else:
+        raise ValueError(f"Unknown rounding mode '{rounding}'")
+    return np.clip(scaled, -_INT64_LIMIT, _INT64_LIMIT).astype(np.int64)
+
+
+def _row_events(mask):
+    return mask.reshape(len(mask), -1).any(axis=1)
+
+
+def multiply_accumulate(a, b, frac_bits, shift='product', product_bits=None, acc_bits=None, overflow='wrap',
+                        events=None):
+    """
+    Fixed-point a @ b.T: (n, K) x (M, K) int64 -> (n, M) int64
+
+    Args:
+        shift: 'product' shifts every product by frac_bits before accumulating,
+            'accumulate' sums the full-precision products and shifts once
+        product_bits: register width the shifted products are fitted to (None: unbounded)
+        acc_bits: accumulator width (None: unbounded); saturating accumulators
+            clip after every addition, wrapping ones only need the final value
+        overflow: 'wrap' or 'saturate'
+        events: optional (n,) bool array, set for rows with a value that did not fit
+    """
+    if shift == 'accumulate':
+        acc = (a @ b.T) >> frac_bits
+    else:
+        acc = np.zeros((a.shape[0], b.shape[0]), dtype=np.int64)
+        for k in range(a.shape[1]):
+            prod = (a[:, k:k + 1] * b[:, k]) >> frac_bits
+            if product_bits is not None:
+                prod, outside = fit(prod, product_bits, overflow)
+                if events is not None:
+                    events |= _row_events(outside)
+            acc += prod
+            if acc_bits is not None and overflow == 'saturate':
+                acc, outside = fit(acc, acc_bits, overflow)
+                if events is not None:
+                    events |= _row_events(outside)
+    if acc_bits is not None and (overflow == 'wrap' or shift == 'accumulate'):
+        acc, outside = fit(acc, acc_bits, overflow)
+        if events is not None:
+            events |= _row_events(outside)
+    return acc
+
+
+def sum_of_squares(a, frac_bits, shift='product', product_bits=None, acc_bits=None, overflow='wrap', events=None):
+    """Fixed-point row-wise sum of squares of an (n, K) int64 array (see multiply_accumulate)"""
+    if shift == 'accumulate':
+        acc = (a * a).sum(axis=1) >> frac_bits
+    elif acc_bits is None or overflow == 'wrap':
+        # No per-step clipping: fit all products at once
+        prod = (a * a) >> frac_bits
+        if product_bits is not None:
+            prod, outside = fit(prod, product_bits, overflow)
+            if events is not None:
+                events |= _row_events(outside)
+        acc = prod.sum(axis=1)
+    else:
+        acc = np.zeros(a.shape[0], dtype=np.int64)
+        for k in range(a.shape[1]):
+            prod = (a[:, k] * a[:, k]) >> frac_bits
+            if product_bits is not None:
+                prod, outside = fit(prod, product_bits, overflow)
+                if events is not None:
+                    events |= outside
+            acc += prod
+            if acc_bits is not None and overflow == 'saturate':
+                acc, outside = fit(acc, acc_bits, overflow)
+                if events is not None:
+                    events |= outside
+    if acc_bits is not None and (overflow == 'wrap' or shift == 'accumulate'):
+        acc, outside = fit(acc, acc_bits, overflow)
+        if events is not None:
+            events |= outside
+    return acc
+
+
+class FixedArray:
+    """
+    NumPy-backed array of Q-format values
+    raw holds the int64 integers; overflows counts the elements that did not
+    fit the format when the array was built (inherited through arithmetic)
+    """
+
+    def __init__(self, raw, fmt=Q24_8, overflow='wrap', overflows=0):
+        if overflow not in OVERFLOW_MODES:
+            raise ValueError(f"Unknown overflow mode '{overflow}'")
+        self.fmt = fmt
+        self.overflow = overflow
+        self.raw, outside = fit(raw, fmt, overflow)
+        self.overflows = int(overflows) + int(outside.sum())
+
+    @classmethod
+    def from_float(cls, values, fmt=Q24_8, rounding='nearest', overflow='wrap'):
+        return cls(quantize(values, fmt.frac_bits, rounding), fmt, overflow)
+
+    def to_float(self):
+        return self.raw / self.fmt.scale
+
+    def tolist(self):
+        return self.raw.tolist()
+
+    def astype(self, fmt, overflow=None):
+        """Change format: fractional bits are shifted (floor when narrowing), then fitted"""
+        shift = fmt.frac_bits - self.fmt.frac_bits
+        raw = self.raw << shift if shift >= 0 else self.raw >> -shift
+        return FixedArray(raw, fmt, overflow or self.overflow, self.overflows)
+
+    @property
+    def shape(self):
+        return self.raw.shape
+
+    def __len__(self):
+        return len(self.raw)
+
+    def __getitem__(self, index):
+        return FixedArray(self.raw[index], self.fmt, self.overflow)
+
+    def __array__(self, dtype=None, copy=None):
+        return self.raw if dtype is None else self.raw.astype(dtype)
+
+    def _operand(self, other):
+        if isinstance(other, FixedArray):
+            if other.fmt.frac_bits != self.fmt.frac_bits:
+                raise ValueError(f"Mismatched formats {self.fmt} and {other.fmt}")
+            return other.raw, other.overflows
+        return quantize(other, self.fmt.frac_bits), 0
+
+    def __add__(self, other):
+        raw, overflows = self._operand(other)
+        return FixedArray(self.raw + raw, self.fmt, self.overflow, self.overflows + overflows)
+
+    def __sub__(self, other):
+        raw, overflows = self._operand(other)
+        return FixedArray(self.raw - raw, self.fmt, self.overflow, self.overflows + overflows)
+
+    def __neg__(self):
+        return FixedArray(-self.raw, self.fmt, self.overflow, self.overflows)
+
+    def __mul__(self, other):
+        """Element-wise product, shifted back to this format"""
+        raw, overflows = self._operand(other)
+        return FixedArray((self.raw * raw) >> self.fmt.frac_bits, self.fmt, self.overflow,
+                          self.overflows + overflows)
+
+    def mac(self, other, shift='product', out_fmt=None):
+        """
+        self @ other.T with products and accumulator in out_fmt (default: this format)
+        Rows with a product or sum outside out_fmt add to overflows
+        """
+        out_fmt = out_fmt or self.fmt
+        raw, overflows = self._operand(other)
+        events = np.zeros(len(self.raw), dtype=bool)
+        acc = multiply_accumulate(np.atleast_2d(self.raw), np.atleast_2d(raw), self.fmt.frac_bits, shift,
+                                  out_fmt.bits, out_fmt.bits, self.overflow, events)
+        return FixedArray(acc, out_fmt, self.overflow, self.overflows + overflows + int(events.sum()))
+
+    def __repr__(self):
+        return f"FixedArray({self.fmt}, {self.overflow}, shape={self.raw.shape}, overflows={self.overflows})"
+
+
+def to_fixed(values, frac_bits=8, bits=32, overflow='wrap', rounding='nearest'):
+    """Float array -> FixedArray of a signed bits-wide register with frac_bits fractional bits"""
+    return FixedArray.from_float(values, QFormat.of_width(bits, frac_bits), rounding, overflow)
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Bulk differential fuzzing of the PCA detector models
+Generates feature vectors in vectorized batches and runs them through the
+float model, the fixed-point kernel of every semantics profile and the
+other backends (sparse kernel, early-exit and two-tier detection, per-stage
+32-bit wrap model). Reports the fixed-vs-float score divergence
+distribution, wrap events and flipped decisions per generator, and any
+disagreement between backends that must be bit-identical.
+
+Generators:
+    dataset   - dataset vectors with multiplicative jitter and shuffled features
+    boundary  - dataset vectors rescaled around the mean so the float score
+                lands near a threshold
+    overflow  - log-uniform magnitudes up to and past the Q24.8 range, plus
+                single-feature spikes
+
+Batches run in a process pool; only histograms and counters come back, so
+runs of 10^7 vectors need little memory.
+"""
+
+import numpy as np
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from pca_scoring import (PROFILES, score_fixed_batch, score_float_batch, score_sparse_batch, detect_early_exit,
+                         detect_two_tier, fixed_point_convert_array, model_thresholds, _model_arrays)
+from model_artifact import load_model
+from calibrate_threshold import load_labeled_features
+from explore_fixed_point import score_fixed_stages, STAGES
+from dataset_io import find_dataset
+
+
+GENERATORS = ('dataset', 'boundary', 'overflow')
+BACKENDS = ('profiles', 'sparse', 'early_exit', 'two_tier', 'stages')
+EXACT_PROFILE = 'pca_detector'
+
+# log10 relative error histogram: one bin for exact matches, then 0.25-decade bins
+ERROR_EDGES = np.arange(-12.0, 6.01, 0.25)
+MAX_FAILURES = 1000
+
+
+def generate_batch(kind, rng, n, base, model):
+    """n float feature vectors from one generator"""
+    mean, _, _ = _model_arrays(model, fixed=False)
+    frac_bits = model['config']['frac_bits']
+    n_features = len(mean)
+    rows = base[rng.integers(0, len(base), n)]
+
+    if kind == 'dataset':
+        jitter = np.exp(rng.normal(0.0, 0.5, (n, n_features)))
+        features = rows * jitter
+        # Swap one random feature pair per vector
+        a = rng.integers(0, n_features, n)
+        b = rng.integers(0, n_features, n)
+        idx = np.arange(n)
+        features[idx, a], features[idx, b] = features[idx, b], features[idx, a].copy()
+        return features
+
+    if kind == 'boundary':
+        centered = rows - mean
+        major, minor = score_float_batch(rows, model)
+        major_t, minor_t = (t / (1 << frac_bits) for t in model_thresholds(model))
+        # Aim at one of the two thresholds; scores scale with the square of the factor
+        use_major = rng.random(n) < 0.5
+        score = np.where(use_major, major, minor)
+        target = np.where(use_major, major_t, minor_t)
+        factor = np.sqrt(target / np.maximum(score, 1e-12)) * (1.0 + rng.normal(0.0, 0.01, n))
+        return mean + centered * factor[:, np.newaxis]
+
+    if kind == 'overflow':
+        limit = 2.0**31 / (1 << frac_bits)
+        magnitude = np.exp(rng.uniform(0.0, np.log(limit * 4.0), (n, n_features)))
+        features = magnitude * rng.choice([-1.0, 1.0], (n, n_features))
+        # A quarter of the vectors are dataset rows with one feature at the edge of the range
+        spikes = rng.random(n) < 0.25
+        features[spikes] = rows[spikes]
+        cols = rng.integers(0, n_features, int(spikes.sum()))
+        features[np.flatnonzero(spikes), cols] = limit * rng.uniform(0.9, 1.1, int(spikes.sum()))
+        return features
+
+    raise ValueError(f"Unknown generator '{kind}'")
+
+
+def _relative_error_histogram(fixed, reference, frac_bits):
+    """Counts of |fixed - reference| / max(|reference|, 1 LSB) on ERROR_EDGES (exact matches first)"""
+    fixed = fixed.astype(np.float64) / (1 << frac_bits)
+    error = np.abs(fixed - reference) / np.maximum(np.abs(reference), 1.0 / (1 << frac_bits))
+    exact = error == 0
+    log_error = np.log10(error[~exact])
+    bins = np.clip(np.searchsorted(ERROR_EDGES, log_error), 0, len(ERROR_EDGES))
+    return np.r_[exact.sum(), np.bincount(bins, minlength=len(ERROR_EDGES) + 1)]
+
+
+# Worker state, set once per process by _init_worker
+_DATA = {}
+
+
+def _init_worker(model_path, dataset_path, max_samples, seed):
+    model = load_model(model_path)
+    base = None
+    if dataset_path:
+        try:
+            base, _ = load_labeled_features(dataset_path, model, max_samples)
+        except OSError:
+            base = None
+    if base is None or len(base) == 0:
+        # No dataset: Gaussian vectors around the model mean
+        mean, _, _ = _model_arrays(model, fixed=False)
+        base = mean + np.random.default_rng(seed).normal(0.0, 1.0, (4096, len(mean)))
+    _DATA.update({'model': model, 'base': base, 'seed': seed})
+
+
+def _run_batch(task):
+    """Worker: generate one batch, run every backend and return its counters"""
+    batch, kind, n, backends, profiles = task
+    model = _DATA['model']
+    frac_bits = model['config']['frac_bits']
+    rng = np.random.default_rng([_DATA['seed'], batch, GENERATORS.index(kind)])
+    features = generate_batch(kind, rng, n, _DATA['base'], model)
+    features_fixed = fixed_point_convert_array(features, frac_bits)
+
+    major_t, minor_t = model_thresholds(model)
+    major_f, minor_f = score_float_batch(features, model)
+    float_attack = (major_f > major_t / (1 << frac_bits)) | (minor_f > minor_t / (1 << frac_bits))
+
+    stats = {'vectors': n, 'float_attack': int(float_attack.sum())}
+    failures = []
+    exact = None
+    if 'profiles' in backends:
+        for profile in profiles:
+            major, minor, attack = score_fixed_batch(features_fixed, model, profile)
+            attack = attack.astype(bool)
+            if profile == EXACT_PROFILE:
+                exact = (major, minor, attack)
+            stats[f'{profile}.extra_alerts'] = int(np.sum(attack & ~float_attack))
+            stats[f'{profile}.missed_alerts'] = int(np.sum(~attack & float_attack))
+            stats[f'{profile}.wrapped'] = int(np.sum((major < 0) | (minor < 0)))
+            stats[f'{profile}.major_error'] = _relative_error_histogram(major, major_f, frac_bits)
+            stats[f'{profile}.minor_error'] = _relative_error_histogram(minor, minor_f, frac_bits)
+    if exact is None and {'sparse', 'early_exit', 'two_tier'} & set(backends):
+        major, minor, attack = score_fixed_batch(features_fixed, model, EXACT_PROFILE)
+        exact = (major, minor, attack.astype(bool))
+
+    # Backends that must agree bit for bit with the exact kernel
+    checks = {}
+    if 'sparse' in backends:
+        major, minor, attack = score_sparse_batch(features_fixed, model, EXACT_PROFILE)
+        checks['sparse'] = (major != exact[0]) | (minor != exact[1]) | (attack.astype(bool) != exact[2])
+    if 'early_exit' in backends:
+        attack, _ = detect_early_exit(features_fixed, model, EXACT_PROFILE)
+        checks['early_exit'] = attack.astype(bool) != exact[2]
+    if 'two_tier' in backends:
+        attack, rescored = detect_two_tier(features_fixed, model, EXACT_PROFILE)
+        checks['two_tier'] = attack.astype(bool) != exact[2]
+        stats['two_tier.rescored'] = int(rescored.sum())
+    for name, mismatch in checks.items():
+        stats[f'{name}.mismatches'] = int(mismatch.sum())
+        for i in np.flatnonzero(mismatch)[:MAX_FAILURES]:
+            failures.append((name, features[i]))
+
+    if 'stages' in backends:
+        _, _, events = score_fixed_stages(features, model, {stage: 32 for stage in STAGES}, 'wrap')
+        for stage in STAGES:
+            stats[f'stages.{stage}'] = int(events[stage].sum())
+    return kind, stats, failures
+
+
+def merge_stats(total, stats):
+    for key, value in stats.items():
+        total[key] = total[key] + value if key in total else value
+    return total
+
+
+def error_percentiles(histogram, quantiles=(0.5, 0.99, 0.999, 1.0)):
+    """Upper bin edges of the relative error histogram at the given quantiles"""
+    cumulative = np.cumsum(histogram) / max(histogram.sum(), 1)
+    edges = np.r_[0.0, 10.0 ** ERROR_EDGES, np.inf]
+    return [edges[min(int(np.searchsorted(cumulative, q)), len(edges) - 1)] for q in quantiles]
+
+
+def print_report(totals, profiles, elapsed):
+    vectors = sum(stats['vectors'] for stats in totals.values())
+    print(f"\n{vectors} vectors in {elapsed:.1f}s ({vectors / max(elapsed, 1e-9):,.0f} vectors/s)")
+    for kind, stats in totals.items():
+        n = stats['vectors']
+        print(f"\n[{kind}] {n} vectors, float attacks {stats['float_attack'] / n:.2%}")
+        for profile in profiles:
+            if f'{profile}.wrapped' not in stats:
+                continue
+            flips = stats[f'{profile}.extra_alerts'] + stats[f'{profile}.missed_alerts']
+            print(f"  {profile:18s} flips {flips:>9} ({flips / n:.4%}: {stats[f'{profile}.extra_alerts']} extra, "
+                  f"{stats[f'{profile}.missed_alerts']} missed), wrapped scores {stats[f'{profile}.wrapped'] / n:.4%}")
+            for score in ('major', 'minor'):
+                p50, p99, p999, worst = error_percentiles(stats[f'{profile}.{score}_error'])
+                print(f"    {score} rel. error vs float: p50 <= {p50:.1e}, p99 <= {p99:.1e}, "
+                      f"p99.9 <= {p999:.1e}, max <= {worst:.1e}")
+        if 'stages.input' in stats:
+            events = ', '.join(f"{stage} {stats[f'stages.{stage}'] / n:.2%}" for stage in STAGES)
+            print(f"  32-bit wrap events by stage: {events}")
+        for name in ('sparse', 'early_exit', 'two_tier'):
+            if f'{name}.mismatches' in stats:
+                extra = ''
+                if name == 'two_tier':
+                    extra = f" (exact rescoring for {stats['two_tier.rescored'] / n:.2%})"
+                print(f"  {name:18s} mismatches vs {EXACT_PROFILE}: {stats[f'{name}.mismatches']}{extra}")
+
+
+def fuzz(model_path, dataset_path, n_vectors, generators, backends, profiles, batch_size=65536, workers=None,
+         seed=0, max_samples=None):
+    """Run the fuzzer; returns ({generator: merged counters}, failing vectors, seconds)"""
+    workers = workers or os.cpu_count() or 1
+    tasks = []
+    per_generator = -(-n_vectors // len(generators))
+    for kind in generators:
+        for batch, start in enumerate(range(0, per_generator, batch_size)):
+            tasks.append((batch, kind, min(batch_size, per_generator - start), backends, profiles))
+
+    totals = {kind: {} for kind in generators}
+    failures = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model_path, dataset_path, max_samples, seed)) as pool:
+        for k, (kind, stats, batch_failures) in enumerate(pool.map(_run_batch, tasks)):
+            merge_stats(totals[kind], stats)
+            failures.extend(batch_failures[:MAX_FAILURES - len(failures)])
+            if (k + 1) % max(len(tasks) // 10, 1) == 0:
+                print(f"  {k + 1}/{len(tasks)} batches")
+    return totals, failures, time.perf_counter() - start
+
+
+def main():
+    base_dir = Path(__file__).parent.parent
+
+    parser = argparse.ArgumentParser(description="Differential fuzzing of the float, fixed-point and other backends")
+    parser.add_argument('--model', default=str(base_dir / "model" / "pca_coeffs.json"))
+    parser.add_argument('--dataset', default=find_dataset(base_dir / "dataset" / "kddcup.data_10_percent.csv"),
+                        help="Seed vectors for the generators (Gaussian around the mean if unavailable)")
+    parser.add_argument('--vectors', type=int, default=1_000_000)
+    parser.add_argument('--generators', default=','.join(GENERATORS))
+    parser.add_argument('--backends', default=','.join(BACKENDS))
+    parser.add_argument('--profiles', default=','.join(PROFILES))
+    parser.add_argument('--batch-size', type=int, default=65536)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-samples', type=int, default=None, help="Dataset rows used as seed vectors")
+    parser.add_argument('--failures', default=str(base_dir / "output" / "fuzz_failures.npz"),
+                        help="Where to save vectors on which exact backends disagree")
+    args = parser.parse_args()
+
+    generators = [g for g in args.generators.split(',') if g]
+    backends = [b for b in args.backends.split(',') if b]
+    profiles = [p for p in args.profiles.split(',') if p]
+    for name in generators:
+        if name not in GENERATORS:
+            parser.error(f"Unknown generator '{name}'")
+    for name in backends:
+        if name not in BACKENDS:
+            parser.error(f"Unknown backend '{name}'")
+    dataset = args.dataset if Path(args.dataset).exists() else None
+
+    print(f"Fuzzing {args.vectors} vectors ({', '.join(generators)}) through {', '.join(backends)}...")
+    totals, failures, elapsed = fuzz(args.model, dataset, args.vectors, generators, backends, profiles,
+                                     args.batch_size, args.workers, args.seed, args.max_samples)
+    print_report(totals, profiles, elapsed)
+
+    if failures:
+        Path(args.failures).parent.mkdir(parents=True, exist_ok=True)
+        np.savez(args.failures, backend=np.array([name for name, _ in failures]),
+                 features=np.array([features for _, features in failures]))
+        print(f"\n✗ {len(failures)} disagreeing vectors saved to {args.failures}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -4,11 +4,14 @@ Generate comparison report between Python golden reference and Verilog simulatio
 Validates that hardware matches software implementation
 """
 
-import json
 import subprocess
 from pathlib import Path
 from datetime import datetime
 
+from golden_store import load_golden, resolve_golden_path
+from model_artifact import load_model
+from pca_scoring import model_thresholds
+
 
 def run_simulation(test_indices, base_dir):
     """
@@ -55,13 +58,15 @@ def run_simulation(test_indices, base_dir):
     return sim_results
 
 
-def generate_report(golden_data, sim_results, output_path, selected_tests):
+def generate_report(golden_data, sim_results, output_path, selected_tests, model):
     """
     Generate detailed comparison report
+    model supplies the MAJOR/MINOR thresholds the hardware was built with
     """
     
     test_cases = golden_data['test_cases']
     config = golden_data['config']
+    major_threshold, minor_threshold = model_thresholds(model, config['frac_bits'])
     
     report = []
     report.append("="*80)
@@ -75,7 +80,8 @@ def generate_report(golden_data, sim_results, output_path, selected_tests):
     report.append(f"  - Minor Components: {config['n_minor_components']}")
     report.append(f"  - Data Width: {config['total_bits']} bits")
     report.append(f"  - Fractional Bits: {config['frac_bits']} bits (Q24.8 format)")
-    report.append(f"  - Threshold: 100 << {config['frac_bits']} = {100 << config['frac_bits']}")
+    report.append(f"  - Thresholds: major {major_threshold}, minor {minor_threshold}"
+                  f"{' (calibrated)' if model.get('thresholds_fixed') else ' (default)'}")
     report.append("="*80)
     report.append("")
     
@@ -179,13 +185,13 @@ def generate_report(golden_data, sim_results, output_path, selected_tests):
 
 def main():
     base_dir = Path(__file__).parent.parent
-    golden_path = base_dir / 'model' / 'diverse_test_golden.json'
+    golden_path = resolve_golden_path(base_dir / 'model' / 'diverse_test_golden.json')
+    model_path = base_dir / 'model' / 'pca_coeffs.json'
     output_path = base_dir / 'output' / 'logs' / 'verification_report.txt'
     
     # Check ALL test cases for comprehensive verification
     # Load golden to determine total test count
-    with open(golden_path, 'r') as f:
-        golden_data_temp = json.load(f)
+    golden_data_temp = load_golden(golden_path)
     n_tests = len(golden_data_temp['test_cases'])
     selected_tests = list(range(n_tests))  # All tests
     
@@ -196,9 +202,9 @@ def main():
     
     # Load golden reference
     print(f"Loading golden reference from {golden_path}...")
-    with open(golden_path, 'r') as f:
-        golden_data = json.load(f)
+    golden_data = load_golden(golden_path)
     print(f"✓ Loaded {len(golden_data['test_cases'])} test cases")
+    model = load_model(model_path)
     print()
     
     # Run simulation
@@ -209,7 +215,7 @@ def main():
     # Generate report
     print(f"Generating comparison report...")
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    matches, total = generate_report(golden_data, sim_results, output_path, selected_tests)
+    matches, total = generate_report(golden_data, sim_results, output_path, selected_tests, model)
     
     print()
     print("="*80)
@@ -7,18 +7,17 @@ Tests: zeros, max values, random, boundary, real normal/attack traffic
 import numpy as np
 import json
 import csv
+import argparse
 from pathlib import Path
 
-
-def fixed_point_convert(value, frac_bits=8):
-    """Convert floating point to fixed-point Q24.8"""
-    result = int(round(value * (1 << frac_bits)))
-    # Clamp to 32-bit signed range
-    if result > 2147483647:
-        result = 2147483647
-    elif result < -2147483648:
-        result = -2147483648
-    return result
+from pca_scoring import score_fixed_batch, fixed_point_convert_array
+from model_artifact import load_model
+from golden_store import columns_from_json, write_golden_store, store_path_for
+from dataset_cache import KDD_COLUMNS, KIND_KDD, open_cache
+from result_cache import ResultCache, score_fixed_cached, default_cache_dir
+from fixed_point import to_fixed
+from sampling import sample_by_label
+from label_index import labeled_rows, read_lines_at
 
 
 def fixed_point_to_float(value, frac_bits=8):
@@ -27,157 +26,118 @@ def fixed_point_to_float(value, frac_bits=8):
 
 
 def load_pca_model(json_path):
-    """Load PCA model"""
-    with open(json_path, 'r') as f:
-        return json.load(f)
+    """Load PCA model (compiled artifact next to the JSON when it is up to date)"""
+    return load_model(json_path)
 
 
-def pca_detection_fixed(features, model):
+def pca_detection_fixed(features, model, profile='diverse_testbench'):
     """
     PCA anomaly detection using fixed-point arithmetic (matching hardware)
+    Single-sample wrapper around pca_detection_fixed_batch
     """
-    mean = model['mean']
-    major_comps = model['major_components']
-    minor_comps = model['minor_components']
-    
-    # Convert to fixed-point
-    features_fp = [fixed_point_convert(f) for f in features]
-    mean_fp = [fixed_point_convert(m) for m in mean]
-    major_fp = [[fixed_point_convert(c) for c in comp] for comp in major_comps]
-    minor_fp = [[fixed_point_convert(c) for c in comp] for comp in minor_comps]
-    
-    # Center features
-    centered = [features_fp[i] - mean_fp[i] for i in range(len(features))]
-    
-    # Project onto major components (using int64 to prevent overflow)
-    major_proj = []
-    for comp in major_fp:
-        proj = np.int64(0)
-        for i in range(len(centered)):
-            proj += np.int64(centered[i]) * np.int64(comp[i])
-        # Shift to get fixed-point result (Q24.8 * Q24.8 = Q48.16, shift by 8)
-        proj = int(proj >> 8)
-        # Wrap to 32-bit signed (modulo 2^32, like hardware)
-        if proj < 0:
-            proj = int((proj % (2**32)) - 2**32)
-        else:
-            proj = int(proj % (2**32))
-            if proj >= 2**31:
-                proj -= 2**32
-        major_proj.append(proj)
-    
-    # Project onto minor components
-    minor_proj = []
-    for comp in minor_fp:
-        proj = np.int64(0)
-        for i in range(len(centered)):
-            proj += np.int64(centered[i]) * np.int64(comp[i])
-        proj = int(proj >> 8)
-        # Wrap to 32-bit signed (modulo 2^32, like hardware)
-        if proj < 0:
-            proj = int((proj % (2**32)) - 2**32)
-        else:
-            proj = int(proj % (2**32))
-            if proj >= 2**31:
-                proj -= 2**32
-        minor_proj.append(proj)
-    
-    # Reconstruct from major components
-    reconstructed = [0] * len(features)
-    for comp_idx, proj_val in enumerate(major_proj):
-        for feat_idx in range(len(features)):
-            # Q24.8 * Q24.8 = Q48.16, shift by 8
-            recon_contrib = (np.int64(proj_val) * np.int64(major_fp[comp_idx][feat_idx])) >> 8
-            reconstructed[feat_idx] += int(recon_contrib)
-    
-    # SPE (major reconstruction error)
-    major_score = np.int64(0)
-    for i in range(len(centered)):
-        residual = centered[i] - reconstructed[i]
-        major_score += np.int64(residual) * np.int64(residual)
-    major_score = int(major_score >> 8)
-    # Wrap to 32-bit signed (modulo 2^32, like hardware)
-    if major_score < 0:
-        major_score = int((major_score % (2**32)) - 2**32)
-    else:
-        major_score = int(major_score % (2**32))
-        if major_score >= 2**31:
-            major_score -= 2**32
-    
-    # Minor subspace score
-    minor_score = np.int64(0)
-    for proj in minor_proj:
-        minor_score += np.int64(proj) * np.int64(proj)
-    minor_score = int(minor_score >> 8)
-    # Wrap to 32-bit signed (modulo 2^32, like hardware)
-    if minor_score < 0:
-        minor_score = int((minor_score % (2**32)) - 2**32)
+    attack, major, minor = pca_detection_fixed_batch([features], model, profile)
+    return int(attack[0]), int(major[0]), int(minor[0])
+
+
+def pca_detection_fixed_batch(features, model, profile='diverse_testbench', cache=None):
+    """
+    Vectorized PCA anomaly detection over float feature vectors
+    Features saturate to Q24.8; see pca_scoring.PROFILES
+    for the arithmetic of each RTL revision. With a result_cache.ResultCache,
+    only vectors it does not hold yet are scored
+
+    Returns:
+        (attack_detected, major_scores, minor_scores) arrays
+    """
+    frac_bits = model['config']['frac_bits']
+    features_fp = fixed_point_convert_array(features, frac_bits, saturate=True)
+    if cache is not None:
+        major, minor, attack = score_fixed_cached(features_fp, model, profile, cache)
     else:
-        minor_score = int(minor_score % (2**32))
-        if minor_score >= 2**31:
-            minor_score -= 2**32
-    
-    # Attack detection (threshold = 100 << 8 = 25600 in fixed-point)
-    # Use absolute value to handle overflow cases with negative scores
-    threshold_fp = 100 << 8
-    major_abs = abs(major_score)
-    minor_abs = abs(minor_score)
-    attack_detected = 1 if (major_abs > threshold_fp or minor_abs > threshold_fp) else 0
-    
-    return attack_detected, major_score, minor_score
+        major, minor, attack = score_fixed_batch(features_fp, model, profile, frac_bits)
+    return attack, major, minor
 
 
-def load_real_dataset(csv_path, n_samples=20, normal_only=False):
+def load_real_dataset(csv_path, n_samples=20, normal_only=False, seed=0, per_label=None):
     """Load real samples from KDD Cup dataset
     
     Args:
         csv_path: Path to dataset CSV
-        n_samples: Number of samples to load
+        n_samples: Number of samples to load (a label-stratified random sample of the file)
         normal_only: If True, only load 'normal' traffic (not attacks)
+        seed: Sampling seed
+        per_label: If set, load up to this many samples of every label instead of n_samples
+    
+    The rows are drawn by sampling.sample_by_label over the label of every
+    row, so the typed cache, the label index and a plain scan of the CSV
+    all give the same samples for the same seed. A typed cache is only read
+    if it already exists (building one parses the whole file); otherwise the
+    label index seeks straight to the sampled rows.
     """
+    keep_labels = {'normal'} if normal_only else None
+    cache = open_cache(csv_path, build=False)
+    if cache is not None and cache.kind == KIND_KDD:
+        labels = np.array([label.strip().rstrip('.') for label in cache.vocabularies['label']], dtype=object)
+        row_labels = labels[cache.columns['label']]
+        rows = sample_by_label(row_labels, n_samples, seed, keep_labels, per_label)
+        return _load_real_dataset_cached(cache, rows, row_labels)
+    
     samples = []
-    with open(csv_path, 'r') as f:
-        reader = csv.reader(f)
-        for i, row in enumerate(reader):
-            if len(samples) >= n_samples:
-                break
-            if len(row) >= 42:  # Need label column
-                # Check label (last column before comma) - filter for normal traffic if requested
-                label = row[41].strip().rstrip('.')
-                if normal_only and label != 'normal':
-                    continue
+    offsets, labels = labeled_rows(csv_path)
+    labels = np.array([label.strip().rstrip('.') for label in labels], dtype=object)
+    rows = sample_by_label(labels, n_samples, seed, keep_labels, per_label)
+    lines = read_lines_at(csv_path, offsets[rows])
+    reader = csv.reader(lines)
+    for i, row in enumerate(reader):
+        if len(row) >= 42:  # Need label column
+            # Check label (last column before comma) - filter for normal traffic if requested
+            label = row[41].strip().rstrip('.')
+            if normal_only and label != 'normal':
+                continue
+            
+            # Extract numeric features
+            try:
+                features = []
+                # Duration
+                features.append(float(row[0]))
+                # Protocol type (skip - categorical)
+                # Service (skip - categorical)
+                # Flag (skip - categorical)
+                # src_bytes, dst_bytes, land, wrong_fragment, urgent
+                for idx in [4, 5, 6, 7, 8]:
+                    features.append(float(row[idx]))
+                # Hot, num_failed_logins, logged_in, num_compromised
+                for idx in [9, 10, 11, 12]:
+                    features.append(float(row[idx]))
+                # Root_shell through dst_host_srv_rerror_rate (indices 13-40)
+                for idx in range(13, 41):
+                    features.append(float(row[idx]))
                 
-                # Extract numeric features
-                try:
-                    features = []
-                    # Duration
-                    features.append(float(row[0]))
-                    # Protocol type (skip - categorical)
-                    # Service (skip - categorical)
-                    # Flag (skip - categorical)
-                    # src_bytes, dst_bytes, land, wrong_fragment, urgent
-                    for idx in [4, 5, 6, 7, 8]:
-                        features.append(float(row[idx]))
-                    # Hot, num_failed_logins, logged_in, num_compromised
-                    for idx in [9, 10, 11, 12]:
-                        features.append(float(row[idx]))
-                    # Root_shell through dst_host_srv_rerror_rate (indices 13-40)
-                    for idx in range(13, 41):
-                        features.append(float(row[idx]))
-                    
-                    # Limit to 28 features
-                    if len(features) >= 28:
-                        features = features[:28]
-                        samples.append({
-                            'features': features,
-                            'label': label,
-                            'is_normal': (label == 'normal')
-                        })
-                except (ValueError, IndexError):
-                    continue
+                # Limit to 28 features
+                if len(features) >= 28:
+                    features = features[:28]
+                    samples.append({
+                        'features': features,
+                        'label': label,
+                        'is_normal': (label == 'normal')
+                    })
+            except (ValueError, IndexError):
+                continue
     return samples
 
 
+def _load_real_dataset_cached(cache, rows, row_labels):
+    """The load_real_dataset samples at the given rows of a memory-mapped KDD dataset cache"""
+    # Duration, then src_bytes through dst_host_srv_rerror_rate, limited to 28 features
+    feature_columns = ([KDD_COLUMNS[0]] + KDD_COLUMNS[4:41])[:28]
+    features = np.column_stack([cache.columns[name][rows].astype(np.float64) for name in feature_columns])
+    return [{
+        'features': features[k].tolist(),
+        'label': row_labels[row],
+        'is_normal': (row_labels[row] == 'normal')
+    } for k, row in enumerate(rows)]
+
+
 def generate_test_cases(model):
     """Generate diverse test cases"""
     n_features = model['config']['n_features']
@@ -369,6 +329,15 @@ def main():
     model_path = base_dir / 'model' / 'pca_coeffs.json'
     dataset_path = base_dir / 'dataset' / 'kddcup.data_10_percent.csv'
     output_path = base_dir / 'model' / 'diverse_test_golden.json'
+    store_path = store_path_for(output_path)
+    
+    parser = argparse.ArgumentParser(description="Generate diverse test cases for NIDS testbench")
+    parser.add_argument('--no-json', action='store_true',
+                        help="Only write the golden store (diverse_test_golden.bin), skip the JSON export")
+    parser.add_argument('--result-cache', default=str(default_cache_dir()),
+                        help="Persistent result cache directory (see result_cache.py)")
+    parser.add_argument('--no-result-cache', action='store_true', help="Score every test from scratch")
+    args = parser.parse_args()
     
     print("Loading PCA model...")
     model = load_pca_model(model_path)
@@ -428,15 +397,25 @@ def main():
     # Run PCA detection on all test cases
     print(f"\nProcessing {len(test_cases)} test cases...")
     results = []
+    cache = None if args.no_result_cache else ResultCache(args.result_cache, model, 'diverse_testbench')
+    attacks, major_scores, minor_scores = pca_detection_fixed_batch(
+        [test['features'] for test in test_cases], model, cache=cache)
+    if cache is not None:
+        cache.save()
+        print(f"Result cache: {cache.hits} reused, {cache.misses} scored")
+    features_fp = to_fixed([test['features'] for test in test_cases], overflow='saturate')
+    if features_fp.overflows:
+        print(f"Saturated {features_fp.overflows} feature values to Q24.8")
     
     for i, test in enumerate(test_cases):
-        features = test['features']
-        attack, major_score, minor_score = pca_detection_fixed(features, model)
+        attack = int(attacks[i])
+        major_score = int(major_scores[i])
+        minor_score = int(minor_scores[i])
         
         result = {
             'test_id': i,
             'name': test['name'],
-            'features_fp': [fixed_point_convert(f) for f in features],
+            'features_fp': features_fp.raw[i].tolist(),
             'expected_attack': test.get('expected_attack', -1),
             'actual_attack': attack,
             'major_score': major_score,
@@ -457,10 +436,14 @@ def main():
         'test_cases': results
     }
     
-    with open(output_path, 'w') as f:
-        json.dump(output, f, indent=2)
+    if not args.no_json:
+        with open(output_path, 'w') as f:
+            json.dump(output, f, indent=2)
+        print(f"\n✓ Saved {len(results)} test cases to {output_path}")
     
-    print(f"\n✓ Saved {len(results)} test cases to {output_path}")
+    layout, columns, names = columns_from_json(output)
+    write_golden_store(store_path, layout, model['config'], columns, names)
+    print(f"✓ Saved golden store to {store_path}")
     
     # Summary
     if any(r.get('expected_attack', -1) != -1 for r in results):
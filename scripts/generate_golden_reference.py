@@ -6,13 +6,20 @@ Reads dataset and PCA model, outputs expected results for hardware verification
 
 import numpy as np
 import json
-import csv
+import os
+import shutil
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
-
-def fixed_point_convert(value, frac_bits=8):
-    """Convert floating point to fixed-point integer"""
-    return int(round(value * (1 << frac_bits)))
+from pca_scoring import score_fixed_batch, score_float_batch, fixed_point_convert_array, unique_rows
+from model_artifact import load_model, model_checksum
+from dataset_io import compute_shard_ranges, iter_range_rows, find_dataset
+from dataset_cache import DatasetCache, KDD_COLUMNS, KIND_KDD, open_cache, cache_path_for
+from kdd_encoding import CATEGORICAL_COLUMNS, get_encoding, encoding_lookup, encode_vocabulary
+from golden_store import GoldenStore, GoldenStoreWriter, write_golden_store, store_path_for, LAYOUT_GOLDEN
+from result_cache import ResultCache, score_fixed_cached, score_float_cached, default_cache_dir
 
 
 def fixed_point_to_float(value, frac_bits=8):
@@ -21,30 +28,45 @@ def fixed_point_to_float(value, frac_bits=8):
 
 
 def load_pca_model(json_path):
-    """Load PCA coefficients from JSON"""
-    with open(json_path, 'r') as f:
-        model = json.load(f)
-    return model
+    """Load PCA coefficients (compiled artifact next to the JSON when it is up to date)"""
+    return load_model(json_path)
 
 
 def load_dataset(csv_path, max_samples=200):
-    """Load KDD Cup dataset"""
+    """Load KDD Cup dataset (max_samples=None loads every row)"""
     samples = []
-    with open(csv_path, 'r') as f:
-        reader = csv.reader(f)
-        for i, row in enumerate(reader):
-            if i >= max_samples:
-                break
-            if len(row) > 0:
-                samples.append(row)
+    for i, row in enumerate(iter_range_rows(csv_path, 0)):
+        if max_samples is not None and i >= max_samples:
+            break
+        samples.append(row)
     return samples
 
 
-def preprocess_kdd_sample(sample):
+def iter_dataset_chunks(csv_path, chunk_size=65536, max_samples=None):
+    """
+    Yield lists of at most chunk_size rows from the KDD Cup CSV without loading the whole file
+    (.gz / .xz files are decompressed in a worker thread while the chunks are scored)
+    """
+    chunk = []
+    for i, row in enumerate(iter_range_rows(csv_path, 0)):
+        if max_samples is not None and i >= max_samples:
+            break
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def preprocess_kdd_sample(sample, lookup=None):
     """
     Preprocess KDD Cup sample to extract numeric features
     KDD Cup has 41 features, we select 28 numeric ones
+    lookup comes from kdd_encoding.encoding_lookup (default: current vocabulary)
     """
+    if lookup is None:
+        lookup = encoding_lookup(get_encoding())
     # Feature indices to extract (adjust based on your feature selection)
     # This is a simplified version - adjust based on your actual preprocessing
     numeric_features = []
@@ -53,15 +75,10 @@ def preprocess_kdd_sample(sample):
         # Duration
         numeric_features.append(float(sample[0]))
         
-        # Protocol type (encoded: tcp=0, udp=1, icmp=2)
-        protocol_map = {'tcp': 0, 'udp': 1, 'icmp': 2}
-        numeric_features.append(protocol_map.get(sample[1], 0))
-        
-        # Service (simplified - use hash or encoding)
-        numeric_features.append(hash(sample[2]) % 256)
-        
-        # Flag (simplified)
-        numeric_features.append(hash(sample[3]) % 256)
+        # Protocol type, service and flag (vocabulary codes, tcp=0, udp=1, icmp=2)
+        for k, name in enumerate(CATEGORICAL_COLUMNS, start=1):
+            codes, default = lookup[name]
+            numeric_features.append(codes.get(sample[k], default))
         
         # src_bytes
         numeric_features.append(float(sample[4]))
@@ -147,6 +164,38 @@ def preprocess_kdd_sample(sample):
     return np.array(numeric_features)
 
 
+def preprocess_kdd_columns(cache, start=0, stop=None, encoding=None):
+    """
+    Vectorized preprocess_kdd_sample over rows [start, stop) of a KDD dataset cache
+    Each categorical column is one gather through a table that maps the
+    cache's codes to the model's vocabulary codes
+    """
+    encoding = encoding or get_encoding()
+    stop = len(cache) if stop is None else min(stop, len(cache))
+    features = np.empty((max(stop - start, 0), 28))
+    features[:, 0] = cache.columns['duration'][start:stop]
+    for j, name in enumerate(CATEGORICAL_COLUMNS, start=1):
+        table = encode_vocabulary(cache.vocabularies[name], name, encoding)
+        features[:, j] = table[cache.columns[name][start:stop]]
+    features[:, 4:] = cache.numeric(KDD_COLUMNS[4:28], start, stop)
+    return features
+
+
+def open_dataset_cache(dataset_path, use_cache=True, build=True):
+    """
+    Typed cache of a KDD Cup CSV (None if disabled or the file cannot be cached)
+    build=False only reads an existing cache: building parses the whole CSV
+    in memory, which bounded-memory and small-sample callers must not do
+    """
+    if not use_cache:
+        return None
+    cache = open_cache(dataset_path, build=build)
+    if cache is not None and cache.kind != KIND_KDD:
+        cache.close()
+        return None
+    return cache
+
+
 def pca_detection_float(features, model):
     """
     PCA-based anomaly detection using floating point (golden reference)
@@ -178,131 +227,190 @@ def pca_detection_float(features, model):
     return major_score, minor_score, major_proj, minor_proj
 
 
+def pca_detection_fixed_batch(features_fixed, model, frac_bits=8, profile='golden_reference'):
+    """
+    Vectorized PCA anomaly detection using fixed-point arithmetic (matches hardware)
+    See pca_scoring.PROFILES for the arithmetic of each RTL revision
+
+    Returns:
+        (major_scores, minor_scores, attack_detected) as int32/int32/uint8 arrays
+    """
+    return score_fixed_batch(features_fixed, model, profile, frac_bits)
+
+
 def pca_detection_fixed(features_fixed, model, frac_bits=8):
     """
     PCA-based anomaly detection using fixed-point arithmetic (matches hardware)
-    Uses int64 to avoid overflow, then truncates to int32 for final results
+    Single-sample wrapper around pca_detection_fixed_batch
     """
-    mean_fixed = np.array(model['mean_fixed'], dtype=np.int64)
-    major_comp_fixed = np.array(model['major_components_fixed'], dtype=np.int64)
-    minor_comp_fixed = np.array(model['minor_components_fixed'], dtype=np.int64)
-    
-    Q = len(major_comp_fixed)
-    R = len(minor_comp_fixed)
-    N = len(features_fixed)
+    major, minor, attack = pca_detection_fixed_batch([features_fixed], model, frac_bits)
+    return int(major[0]), int(minor[0]), int(attack[0])
+
+
+def open_result_caches(cache_dir, model):
+    """(fixed-point, float) result caches of a model, or None when cache_dir is None"""
+    if cache_dir is None:
+        return None
+    return ResultCache(cache_dir, model, 'golden_reference'), ResultCache(cache_dir, model, 'float')
+
+
+def save_result_caches(caches):
+    """Write the new entries of open_result_caches() caches and report the reuse"""
+    if caches is None:
+        return
+    for cache in caches:
+        cache.save()
+    fixed = caches[0]
+    print(f"  Result cache: {fixed.hits} reused, {fixed.misses} scored ({fixed.path.parent})")
+
+
+def score_features(features_float, model, dedup=True, caches=None):
+    """
+    Score a block of preprocessed float feature vectors
+    Returns golden result columns (golden_store layout) as arrays
+
+    With dedup, identical vectors (KDD'99 is dominated by repeated flood
+    records) are scored once and the results are fanned back out, which
+    gives the same columns as scoring every copy. caches (see
+    open_result_caches) reuses the results of vectors scored before with
+    the same model
+    """
+    config = model['config']
+    frac_bits = config['frac_bits']
+    features_float = np.asarray(features_float, dtype=np.float64).reshape(-1, config['n_features'])
     
-    features_fixed = np.array(features_fixed, dtype=np.int64)
+    if dedup:
+        unique, inverse, _ = unique_rows(features_float)
+        if len(unique) < len(features_float):
+            columns = score_features(unique, model, dedup=False, caches=caches)
+            return {name: values[inverse] for name, values in columns.items()}
     
-    # Center the data
-    centered = features_fixed - mean_fixed
+    features_fixed = fixed_point_convert_array(features_float, frac_bits)
     
-    # Project onto major components
-    major_proj = np.zeros(Q, dtype=np.int64)
-    for i in range(Q):
-        acc = np.int64(0)
-        for j in range(N):
-            mult_result = (centered[j] * major_comp_fixed[i][j]) >> frac_bits
-            acc += mult_result
-        major_proj[i] = np.int32(acc & 0xFFFFFFFF)  # Truncate to 32-bit
+    if caches is not None:
+        major_fixed, minor_fixed, attack = score_fixed_cached(features_fixed, model, 'golden_reference', caches[0])
+        major_float, minor_float = score_float_cached(features_float, model, caches[1])
+    else:
+        # Run floating-point version (for reference)
+        major_float, minor_float = score_float_batch(features_float, model)
+        
+        # Run fixed-point version (matches hardware)
+        major_fixed, minor_fixed, attack = pca_detection_fixed_batch(features_fixed, model, frac_bits)
     
-    # Project onto minor components
-    minor_proj = np.zeros(R, dtype=np.int64)
-    for i in range(R):
-        acc = np.int64(0)
-        for j in range(N):
-            mult_result = (centered[j] * minor_comp_fixed[i][j]) >> frac_bits
-            acc += mult_result
-        minor_proj[i] = np.int32(acc & 0xFFFFFFFF)  # Truncate to 32-bit
+    return {
+        'features': features_fixed,
+        'major_score': major_fixed,
+        'minor_score': minor_fixed,
+        'attack': attack,
+        'major_score_float': major_float,
+        'minor_score_float': minor_float
+    }
+
+
+def score_block(samples, model, dedup=True, caches=None):
+    """
+    Preprocess and score a block of raw KDD rows
+    Returns golden result columns (golden_store layout) as arrays
+    With dedup, identical rows are preprocessed and scored once
+    """
+    if dedup:
+        row_ids = {}
+        inverse = np.array([row_ids.setdefault(tuple(sample), len(row_ids)) for sample in samples], dtype=np.int64)
+        if len(row_ids) < len(samples):
+            columns = score_block(list(row_ids), model, dedup=False, caches=caches)
+            return {name: values[inverse] for name, values in columns.items()}
     
-    # Reconstruct from major components
-    major_recon = np.zeros(N, dtype=np.int64)
-    for j in range(N):
-        acc = np.int64(0)
-        for i in range(Q):
-            mult_result = (major_proj[i] * major_comp_fixed[i][j]) >> frac_bits
-            acc += mult_result
-        major_recon[j] = np.int32(acc & 0xFFFFFFFF)  # Truncate to 32-bit
-    
-    # Compute major score
-    major_score_acc = np.int64(0)
-    for i in range(N):
-        residual = np.int32(centered[i] - major_recon[i])
-        mult_result = (np.int64(residual) * np.int64(residual)) >> frac_bits
-        major_score_acc += mult_result
-    
-    # Compute minor score
-    minor_score_acc = np.int64(0)
-    for i in range(R):
-        mult_result = (minor_proj[i] * minor_proj[i]) >> frac_bits
-        minor_score_acc += mult_result
-    
-    # Truncate scores to 32-bit signed (wrap on overflow like hardware)
-    # Convert to uint32 first, then reinterpret as int32
-    major_score_u32 = np.uint32(major_score_acc & 0xFFFFFFFF)
-    minor_score_u32 = np.uint32(minor_score_acc & 0xFFFFFFFF)
-    major_score_final = major_score_u32.view(np.int32)
-    minor_score_final = minor_score_u32.view(np.int32)
-    
-    # Threshold check (threshold = 100 in fixed-point)
-    threshold = 100 << frac_bits
-    # Use truncated 32-bit values for threshold comparison (like hardware)
-    attack_detected = 1 if (int(major_score_final) > threshold or int(minor_score_final) > threshold) else 0
-    
-    return int(major_score_final), int(minor_score_final), attack_detected
-
-
-def generate_golden_reference(dataset_path, model_path, output_path, max_samples=200):
+    lookup = encoding_lookup(get_encoding(model))
+    features_float = np.array([preprocess_kdd_sample(sample, lookup) for sample in samples])
+    return score_features(features_float, model, dedup=False, caches=caches)
+
+
+def iter_scored_chunks(dataset_path, model, chunk_size=65536, max_samples=None, use_cache=True):
+    """
+    Yield golden result columns for consecutive blocks of at most chunk_size rows
+    Features come from the typed dataset cache when it already exists,
+    otherwise the CSV is parsed row by row (the cache is never built here)
+    """
+    cache = open_dataset_cache(dataset_path, use_cache, build=False)
+    if cache is None:
+        for chunk in iter_dataset_chunks(dataset_path, chunk_size, max_samples):
+            yield score_block(chunk, model)
+        return
+    stop = len(cache) if max_samples is None else min(max_samples, len(cache))
+    encoding = get_encoding(model)
+    for start in range(0, stop, chunk_size):
+        yield score_features(preprocess_kdd_columns(cache, start, min(start + chunk_size, stop), encoding), model)
+
+
+def results_from_columns(columns, start_id=0):
+    """Golden result dictionaries for a block of columns, numbered from start_id"""
+    results = []
+    for idx in range(len(columns['features'])):
+        results.append({
+            'sample_id': start_id + idx,
+            'features_fixed': columns['features'][idx].tolist(),
+            'major_score_float': float(columns['major_score_float'][idx]),
+            'minor_score_float': float(columns['minor_score_float'][idx]),
+            'major_score_fixed': int(columns['major_score'][idx]),
+            'minor_score_fixed': int(columns['minor_score'][idx]),
+            'attack_detected': int(columns['attack'][idx])
+        })
+    return results
+
+
+def score_samples(samples, model, start_id=0):
+    """
+    Preprocess and score a block of raw KDD rows
+    Returns the golden result dictionaries, numbered from start_id
+    """
+    return results_from_columns(score_block(samples, model), start_id)
+
+
+def generate_golden_reference(dataset_path, model_path, output_path, max_samples=200, store_path=None,
+                              use_cache=True, result_cache=None):
     """
     Generate golden reference file for hardware verification
+    output_path=None skips the JSON file; store_path also writes a golden_store file;
+    use_cache=False parses the CSV instead of the typed dataset cache (which
+    is only built for a whole-file run, max_samples=None);
+    result_cache is the directory of the persistent result cache (None disables it)
     """
     print(f"Loading PCA model from {model_path}...")
     model = load_pca_model(model_path)
+    caches = open_result_caches(result_cache, model)
     
     print(f"Loading dataset from {dataset_path}...")
-    samples = load_dataset(dataset_path, max_samples)
-    print(f"Loaded {len(samples)} samples")
+    cache = open_dataset_cache(dataset_path, use_cache, build=max_samples is None)
+    if cache is not None:
+        features = preprocess_kdd_columns(cache, 0, max_samples, get_encoding(model))
+        print(f"Loaded {len(features)} samples from {cache.path}")
+    else:
+        samples = load_dataset(dataset_path, max_samples)
+        print(f"Loaded {len(samples)} samples")
     
     config = model['config']
-    frac_bits = config['frac_bits']
-    
-    # Generate golden reference
-    golden_results = []
     
     print("Generating golden reference...")
-    for idx, sample in enumerate(samples):
-        # Preprocess sample
-        features_float = preprocess_kdd_sample(sample)
-        
-        # Convert to fixed-point
-        features_fixed = np.array([fixed_point_convert(f, frac_bits) for f in features_float], dtype=np.int32)
-        
-        # Run floating-point version (for reference)
-        major_float, minor_float, _, _ = pca_detection_float(features_float, model)
-        
-        # Run fixed-point version (matches hardware)
-        major_fixed, minor_fixed, attack = pca_detection_fixed(features_fixed, model, frac_bits)
-        
-        golden_results.append({
-            'sample_id': idx,
-            'features_fixed': features_fixed.tolist(),
-            'major_score_float': float(major_float),
-            'minor_score_float': float(minor_float),
-            'major_score_fixed': int(major_fixed),
-            'minor_score_fixed': int(minor_fixed),
-            'attack_detected': int(attack)
-        })
-        
-        if (idx + 1) % 50 == 0:
-            print(f"  Processed {idx + 1} samples...")
+    if cache is not None:
+        columns = score_features(features, model, caches=caches)
+    else:
+        columns = score_block(samples, model, caches=caches)
+    golden_results = results_from_columns(columns)
+    print(f"  Processed {len(golden_results)} samples")
+    save_result_caches(caches)
     
     # Save golden reference
-    print(f"\nSaving golden reference to {output_path}...")
-    with open(output_path, 'w') as f:
-        json.dump({
-            'config': config,
-            'num_samples': len(golden_results),
-            'results': golden_results
-        }, f, indent=2)
+    if output_path:
+        print(f"\nSaving golden reference to {output_path}...")
+        with open(output_path, 'w') as f:
+            json.dump({
+                'config': config,
+                'num_samples': len(golden_results),
+                'results': golden_results
+            }, f, indent=2)
+    if store_path:
+        print(f"Saving golden store to {store_path}...")
+        write_golden_store(store_path, LAYOUT_GOLDEN, config, columns)
     
     print("Done!")
     print(f"\nSummary:")
@@ -314,6 +422,253 @@ def generate_golden_reference(dataset_path, model_path, output_path, max_samples
     return golden_results
 
 
+def format_golden_results(results):
+    """
+    Serialize result dictionaries as entries of the "results" array
+    Matches json.dump(..., indent=2) layout; entries are joined with ",\n"
+    """
+    return ',\n'.join('\n'.join('    ' + line for line in json.dumps(r, indent=2).splitlines())
+                      for r in results)
+
+
+def generate_golden_reference_streaming(dataset_path, model_path, output_path,
+                                        chunk_size=65536, max_samples=None, keep_first=50, store_path=None,
+                                        use_cache=True):
+    """
+    Generate golden reference in constant memory
+    Reads the CSV in chunks, scores each chunk with the batch kernel and appends
+    it to the output as it goes. "num_samples" is written after "results" since
+    the count is only known at the end. output_path=None skips the JSON file;
+    store_path also writes a golden_store file; use_cache=False parses the
+    CSV instead of the typed dataset cache. The persistent result cache is
+    not used: its index holds every distinct vector of the run, so memory
+    would grow with the dataset.
+    
+    Returns:
+        (first keep_first results, total samples, attacks detected)
+    """
+    print(f"Loading PCA model from {model_path}...")
+    model = load_pca_model(model_path)
+    config = model['config']
+    
+    print(f"Streaming dataset from {dataset_path} in chunks of {chunk_size}...")
+    first_results = []
+    num_samples = 0
+    attacks = 0
+    f = open(output_path, 'w') if output_path else None
+    writer = GoldenStoreWriter(store_path, LAYOUT_GOLDEN, config) if store_path else None
+    if f:
+        config_json = json.dumps(config, indent=2).replace('\n', '\n  ')
+        f.write(f'{{\n  "config": {config_json},\n  "results": [\n')
+    for columns in iter_scored_chunks(dataset_path, model, chunk_size, max_samples, use_cache):
+        results = results_from_columns(columns, start_id=num_samples)
+        if f:
+            if num_samples > 0:
+                f.write(',\n')
+            f.write(format_golden_results(results))
+        if writer:
+            writer.append(columns)
+        
+        if len(first_results) < keep_first:
+            first_results.extend(results[:keep_first - len(first_results)])
+        num_samples += len(results)
+        attacks += int(columns['attack'].sum())
+        print(f"  Processed {num_samples} samples...")
+    if f:
+        f.write(f'\n  ],\n  "num_samples": {num_samples}\n}}')
+        f.close()
+    if writer:
+        writer.close()
+    
+    print("Done!")
+    print(f"\nSummary:")
+    print(f"  Total samples: {num_samples}")
+    print(f"  Attacks detected: {attacks}")
+    print(f"  Normal traffic: {num_samples - attacks}")
+    
+    return first_results, num_samples, attacks
+
+
+def _count_shard_rows(task):
+    """Worker: number of samples in a byte range"""
+    dataset_path, start, end = task
+    return sum(1 for _ in iter_range_rows(dataset_path, start, end))
+
+
+def _iter_shard_columns(dataset_path, start, end, model, chunk_size, cached):
+    """
+    Golden result columns of one shard, chunk by chunk
+    cached shards are row ranges of the dataset cache, others byte ranges of the CSV
+    """
+    if cached:
+        cache = DatasetCache(cache_path_for(dataset_path))
+        encoding = get_encoding(model)
+        for pos in range(start, end, chunk_size):
+            yield score_features(preprocess_kdd_columns(cache, pos, min(pos + chunk_size, end), encoding), model)
+        return
+    chunk = []
+    for row in itertools.chain(iter_range_rows(dataset_path, start, end), [None]):
+        if row is not None:
+            chunk.append(row)
+            if len(chunk) < chunk_size:
+                continue
+        if not chunk:
+            break
+        yield score_block(chunk, model)
+        chunk = []
+
+
+def _score_shard(task):
+    """
+    Worker: score one shard and checkpoint it
+    The serialized results go to part_path, the columns to a golden_store
+    next to it, then meta_path is written atomically to mark the shard as finished
+    """
+    dataset_path, start, end, start_id, model, part_path, meta_path, chunk_size, cached = task
+    num_samples = 0
+    attacks = 0
+    writer = GoldenStoreWriter(part_path + '.bin', LAYOUT_GOLDEN, model['config'])
+    with open(part_path, 'w') as f:
+        for columns in _iter_shard_columns(dataset_path, start, end, model, chunk_size, cached):
+            results = results_from_columns(columns, start_id=start_id + num_samples)
+            if num_samples > 0:
+                f.write(',\n')
+            f.write(format_golden_results(results))
+            writer.append(columns)
+            num_samples += len(results)
+            attacks += int(columns['attack'].sum())
+    writer.close()
+    
+    meta = {'start': start, 'end': end, 'num_samples': num_samples, 'attacks': attacks}
+    with open(meta_path + '.tmp', 'w') as f:
+        json.dump(meta, f)
+    os.replace(meta_path + '.tmp', meta_path)
+    return meta
+
+
+def generate_golden_reference_sharded(dataset_path, model_path, output_path, num_shards=None,
+                                      workers=None, chunk_size=65536, checkpoint_dir=None, keep_first=50,
+                                      store_path=None, use_cache=True):
+    """
+    Generate golden reference for the whole dataset with a process pool
+    The dataset is split into row ranges of its typed cache, if one was
+    already built (byte ranges of the CSV otherwise), every shard is scored and checkpointed
+    independently, and shards are merged in file order. The output is
+    byte-identical to generate_golden_reference_streaming. A killed run
+    resumes from the finished shards in checkpoint_dir (output_path + '.shards').
+    output_path=None skips the JSON file; store_path also writes a golden_store file.
+    
+    Returns:
+        (first keep_first results, total samples, attacks detected)
+    """
+    workers = workers or os.cpu_count() or 1
+    num_shards = num_shards or workers * 4
+    checkpoint_dir = Path(checkpoint_dir or str(output_path or store_path) + '.shards')
+    
+    print(f"Loading PCA model from {model_path}...")
+    model = load_pca_model(model_path)
+    config = model['config']
+    
+    cache = open_dataset_cache(dataset_path, use_cache, build=False)
+    cached = cache is not None
+    if cached:
+        num_rows = len(cache)
+        ranges = [(num_rows * k // num_shards, num_rows * (k + 1) // num_shards) for k in range(num_shards)]
+        ranges = [r for r in ranges if r[0] < r[1]]
+    else:
+        ranges = compute_shard_ranges(dataset_path, num_shards)
+    stat = os.stat(dataset_path)
+    manifest = {
+        'dataset': str(Path(dataset_path).resolve()),
+        'dataset_size': stat.st_size,
+        'dataset_mtime_ns': stat.st_mtime_ns,
+        'dataset_sha256': cache.source['sha256'] if cached else None,
+        'model_sha256': model_checksum(model),
+        'encoding': get_encoding(model),
+        'ranges': ranges
+    }
+    
+    # Reuse checkpoints only if they were produced from the same inputs
+    manifest_path = checkpoint_dir / 'manifest.json'
+    if manifest_path.exists():
+        with open(manifest_path, 'r') as f:
+            if json.load(f) != json.loads(json.dumps(manifest)):
+                print(f"Discarding stale checkpoints in {checkpoint_dir}")
+                shutil.rmtree(checkpoint_dir)
+    checkpoint_dir.mkdir(parents=True, exist_ok=True)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    
+    part_paths = [str(checkpoint_dir / f'shard_{k:05d}.part') for k in range(len(ranges))]
+    meta_paths = [str(checkpoint_dir / f'shard_{k:05d}.json') for k in range(len(ranges))]
+    metas = [None] * len(ranges)
+    for k, meta_path in enumerate(meta_paths):
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r') as f:
+                metas[k] = json.load(f)
+    pending = [k for k in range(len(ranges)) if metas[k] is None]
+    print(f"Scoring {len(ranges)} shards with {workers} workers "
+          f"({len(ranges) - len(pending)} already checkpointed)...")
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        if pending:
+            # Sample ids of a shard start after all rows of the preceding shards
+            if cached:
+                start_ids = [start for start, _ in ranges]
+            else:
+                counts = list(pool.map(_count_shard_rows, [(dataset_path, start, end) for start, end in ranges]))
+                start_ids = [sum(counts[:k]) for k in range(len(ranges))]
+            futures = {pool.submit(_score_shard, (dataset_path, ranges[k][0], ranges[k][1], start_ids[k], model,
+                                                  part_paths[k], meta_paths[k], chunk_size, cached)): k
+                       for k in pending}
+            for future in as_completed(futures):
+                metas[futures[future]] = future.result()
+                done = sum(m is not None for m in metas)
+                print(f"  Finished shard {futures[future]} ({done}/{len(ranges)})")
+    
+    # Merge shards in file order
+    print(f"\nMerging shards into {output_path or store_path}...")
+    num_samples = sum(meta['num_samples'] for meta in metas)
+    attacks = sum(meta['attacks'] for meta in metas)
+    if output_path:
+        with open(output_path, 'w') as f:
+            config_json = json.dumps(config, indent=2).replace('\n', '\n  ')
+            f.write(f'{{\n  "config": {config_json},\n  "results": [\n')
+            written = 0
+            for part_path, meta in zip(part_paths, metas):
+                if meta['num_samples'] == 0:
+                    continue
+                if written > 0:
+                    f.write(',\n')
+                with open(part_path, 'r') as part:
+                    shutil.copyfileobj(part, f)
+                written += meta['num_samples']
+            f.write(f'\n  ],\n  "num_samples": {num_samples}\n}}')
+    if store_path:
+        writer = GoldenStoreWriter(store_path, LAYOUT_GOLDEN, config)
+        for part_path in part_paths:
+            part = GoldenStore(part_path + '.bin')
+            if len(part) > 0:
+                writer.append({name: part.columns[name] for name in part.columns})
+            part.close()
+        writer.close()
+    
+    # First results for the SystemVerilog test data
+    first_results = []
+    for columns in iter_scored_chunks(dataset_path, model, keep_first, keep_first, use_cache):
+        first_results = results_from_columns(columns)
+    
+    shutil.rmtree(checkpoint_dir)
+    
+    print("Done!")
+    print(f"\nSummary:")
+    print(f"  Total samples: {num_samples}")
+    print(f"  Attacks detected: {attacks}")
+    print(f"  Normal traffic: {num_samples - attacks}")
+    
+    return first_results, num_samples, attacks
+
+
 def generate_systemverilog_testdata(golden_results, output_path, max_samples=50):
     """
     Generate SystemVerilog testbench data from golden reference
@@ -351,23 +706,79 @@ def generate_systemverilog_testdata(golden_results, output_path, max_samples=50)
 def main():
     # Paths
     base_dir = Path(__file__).parent.parent
-    dataset_path = base_dir / "dataset" / "kddcup.data_10_percent.csv"
-    model_path = base_dir / "model" / "pca_coeffs.json"
-    output_path = base_dir / "model" / "golden_reference.json"
-    sv_output_path = base_dir / "tb" / "test_vectors_golden.sv"
+    
+    parser = argparse.ArgumentParser(description="Generate golden reference for PCA-based NIDS")
+    parser.add_argument('--dataset', default=find_dataset(base_dir / "dataset" / "kddcup.data_10_percent.csv"))
+    parser.add_argument('--model', default=str(base_dir / "model" / "pca_coeffs.json"))
+    parser.add_argument('--output', default=str(base_dir / "model" / "golden_reference.json"))
+    parser.add_argument('--sv-output', default=str(base_dir / "tb" / "test_vectors_golden.sv"))
+    parser.add_argument('--store', default=None,
+                        help="Memory-mappable golden store (default: --output with a .bin suffix)")
+    parser.add_argument('--no-json', action='store_true', help="Only write the golden store, skip the JSON export")
+    parser.add_argument('--max-samples', type=int, default=None,
+                        help="Number of CSV rows to score (default 200, 0 = whole file)")
+    parser.add_argument('--stream', action='store_true',
+                        help="Score in chunks and write results as they are produced (constant memory)")
+    parser.add_argument('--chunk-size', type=int, default=65536)
+    parser.add_argument('--shards', type=int, default=0,
+                        help="Score the whole file in this many shards with a process pool "
+                             "(output identical to --stream; resumes from checkpoints)")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--checkpoint-dir', default=None)
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Parse the CSV instead of the typed dataset cache (see dataset_cache.py)")
+    parser.add_argument('--result-cache', default=str(default_cache_dir()),
+                        help="Persistent result cache directory (see result_cache.py; not used with --stream or --shards)")
+    parser.add_argument('--no-result-cache', action='store_true', help="Score every vector from scratch")
+    args = parser.parse_args()
+    if args.shards and args.max_samples:
+        parser.error("--shards always scores the whole file")
+    output_path = None if args.no_json else args.output
+    args.store = args.store or str(store_path_for(args.output))
+    max_samples = args.max_samples if args.max_samples is not None else 200
+    max_samples = max_samples if max_samples > 0 else None
+    result_cache = None if args.no_result_cache else args.result_cache
     
     # Generate golden reference
-    golden_results = generate_golden_reference(
-        dataset_path=str(dataset_path),
-        model_path=str(model_path),
-        output_path=str(output_path),
-        max_samples=200
-    )
+    if args.shards:
+        golden_results, _, _ = generate_golden_reference_sharded(
+            dataset_path=args.dataset,
+            model_path=args.model,
+            output_path=output_path,
+            num_shards=args.shards,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            checkpoint_dir=args.checkpoint_dir,
+            keep_first=50,
+            store_path=args.store,
+            use_cache=not args.no_cache
+        )
+    elif args.stream:
+        golden_results, _, _ = generate_golden_reference_streaming(
+            dataset_path=args.dataset,
+            model_path=args.model,
+            output_path=output_path,
+            chunk_size=args.chunk_size,
+            max_samples=max_samples,
+            keep_first=50,
+            store_path=args.store,
+            use_cache=not args.no_cache
+        )
+    else:
+        golden_results = generate_golden_reference(
+            dataset_path=args.dataset,
+            model_path=args.model,
+            output_path=output_path,
+            max_samples=max_samples,
+            store_path=args.store,
+            use_cache=not args.no_cache,
+            result_cache=result_cache
+        )
     
     # Generate SystemVerilog test data
     generate_systemverilog_testdata(
         golden_results=golden_results,
-        output_path=str(sv_output_path),
+        output_path=args.sv_output,
         max_samples=50
     )
 
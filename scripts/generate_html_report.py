@@ -4,11 +4,14 @@ Generate HTML verification report for PCA NIDS
 Converts simulation results to interactive HTML with charts
 """
 
-import json
 import subprocess
 from pathlib import Path
 from datetime import datetime
 
+from golden_store import load_golden, resolve_golden_path
+from model_artifact import load_model
+from pca_scoring import model_thresholds
+
 
 def run_simulation():
     """Run ModelSim simulation and capture results"""
@@ -45,11 +48,13 @@ def run_simulation():
     return sim_results
 
 
-def generate_html_report(golden_data, sim_results, output_path):
-    """Generate interactive HTML report"""
+def generate_html_report(golden_data, sim_results, output_path, model):
+    """Generate interactive HTML report (model supplies the MAJOR/MINOR thresholds)"""
     
     config = golden_data['config']
     test_cases = golden_data['test_cases']
+    major_threshold, minor_threshold = model_thresholds(model, config['frac_bits'])
+    threshold_source = 'calibrated' if model.get('thresholds_fixed') else 'default'
     
     # Calculate statistics
     total_tests = len(sim_results)
@@ -349,8 +354,8 @@ def generate_html_report(golden_data, sim_results, output_path):
                         {config['n_minor_components']} principal components
                     </div>
                     <div class="config-item">
-                        <strong>Threshold</strong>
-                        {100 << config['frac_bits']} (100 << {config['frac_bits']})
+                        <strong>Thresholds</strong>
+                        Major {major_threshold}, minor {minor_threshold} ({threshold_source})
                     </div>
                     <div class="config-item">
                         <strong>Attack Detection</strong>
@@ -523,7 +528,8 @@ def generate_html_report(golden_data, sim_results, output_path):
 
 def main():
     base_dir = Path(__file__).parent.parent
-    golden_path = base_dir / 'model' / 'diverse_test_golden.json'
+    golden_path = resolve_golden_path(base_dir / 'model' / 'diverse_test_golden.json')
+    model_path = base_dir / 'model' / 'pca_coeffs.json'
     output_path = base_dir / 'output' / 'verification_report.html'
     
     print("="*80)
@@ -533,9 +539,9 @@ def main():
     
     # Load golden reference
     print(f"Loading golden reference...")
-    with open(golden_path, 'r') as f:
-        golden_data = json.load(f)
+    golden_data = load_golden(golden_path)
     print(f"✓ Loaded {len(golden_data['test_cases'])} test cases")
+    model = load_model(model_path)
     print()
     
     # Run simulation
@@ -546,7 +552,7 @@ def main():
     # Generate HTML report
     print(f"Generating HTML report...")
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    generate_html_report(golden_data, sim_results, output_path)
+    generate_html_report(golden_data, sim_results, output_path, model)
     
     print()
     print("="*80)
@@ -4,9 +4,10 @@ Generate memory initialization files (.mem and .mif) for FPGA
 Loads test vectors into Block RAM for hardware testing
 """
 
-import json
 from pathlib import Path
 
+from golden_store import load_golden, resolve_golden_path
+
 
 def to_hex_string(value, width=32):
     """Convert signed integer to hex string"""
@@ -18,8 +19,7 @@ def to_hex_string(value, width=32):
 def generate_mem_file(golden_path, output_path, num_tests=10):
     """Generate .mem file (simple hex format)"""
     
-    with open(golden_path, 'r') as f:
-        golden = json.load(f)
+    golden = load_golden(golden_path)
     
     test_cases = golden['test_cases'][:num_tests]
     n_features = golden['config']['n_features']
@@ -50,8 +50,7 @@ def generate_mem_file(golden_path, output_path, num_tests=10):
 def generate_mif_file(golden_path, output_path, num_tests=10):
     """Generate .mif file (Altera/Intel format)"""
     
-    with open(golden_path, 'r') as f:
-        golden = json.load(f)
+    golden = load_golden(golden_path)
     
     test_cases = golden['test_cases'][:num_tests]
     n_features = golden['config']['n_features']
@@ -88,8 +87,7 @@ def generate_mif_file(golden_path, output_path, num_tests=10):
 def generate_test_info(golden_path, output_path, num_tests=10):
     """Generate test information CSV for reference"""
     
-    with open(golden_path, 'r') as f:
-        golden = json.load(f)
+    golden = load_golden(golden_path)
     
     test_cases = golden['test_cases'][:num_tests]
     
@@ -109,7 +107,7 @@ def generate_test_info(golden_path, output_path, num_tests=10):
 
 if __name__ == '__main__':
     base_dir = Path(__file__).parent.parent
-    golden_path = base_dir / 'model' / 'diverse_test_golden.json'
+    golden_path = resolve_golden_path(base_dir / 'model' / 'diverse_test_golden.json')
     
     mem_path = base_dir / 'quartus_project' / 'test_vectors.mem'
     mif_path = base_dir / 'quartus_project' / 'test_vectors.mif'
@@ -3,9 +3,10 @@
 Generate SystemVerilog testbench from diverse test cases
 """
 
-import json
 from pathlib import Path
 
+from golden_store import load_golden, resolve_golden_path
+
 
 def generate_testbench(test_data, output_path):
     """Generate SystemVerilog testbench"""
@@ -219,12 +220,11 @@ endmodule
 
 def main():
     base_dir = Path(__file__).parent.parent
-    input_path = base_dir / 'model' / 'diverse_test_golden.json'
+    input_path = resolve_golden_path(base_dir / 'model' / 'diverse_test_golden.json')
     output_path = base_dir / 'tb' / 'tb_diverse.sv'
     
     print(f"Loading test data from {input_path}...")
-    with open(input_path, 'r') as f:
-        test_data = json.load(f)
+    test_data = load_golden(input_path)
     
     print(f"Generating testbench with {len(test_data['test_cases'])} tests...")
     generate_testbench(test_data, output_path)
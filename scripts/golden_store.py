@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Columnar binary store for golden results and test vectors
+Holds the int32 feature matrix, score columns, attack flags and a name table
+in one memory-mappable file, so consumers read test k in O(1) without
+parsing JSON. JSON stays available as an export.
+
+File layout:
+    8 bytes   magic b'NIDSGS01'
+    8 bytes   header length (little-endian uint64)
+    header    UTF-8 JSON: layout, config, num_records, columns {name: dtype/shape/offset}
+    data      column arrays, each 64-byte aligned; offsets are relative to
+              the first aligned byte after the header
+
+Usage:
+    python golden_store.py import <golden.json> [store.bin]
+    python golden_store.py export <store.bin> [golden.json]
+"""
+
+import numpy as np
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from pathlib import Path
+
+
+MAGIC = b'NIDSGS01'
+ALIGN = 64
+
+# Layouts mirror the two JSON formats
+LAYOUT_DIVERSE = 'diverse_test'       # diverse_test_golden.json ('test_cases')
+LAYOUT_GOLDEN = 'golden_reference'    # golden_reference.json ('results')
+
+COLUMN_DTYPES = {
+    'features': np.int32,
+    'major_score': np.int32,
+    'minor_score': np.int32,
+    'attack': np.uint8,
+    'expected_attack': np.int8,
+    'major_score_float': np.float64,
+    'minor_score_float': np.float64,
+    'name_offsets': np.int64,
+    'name_bytes': np.uint8,
+}
+
+
+def _align(pos):
+    return (pos + ALIGN - 1) // ALIGN * ALIGN
+
+
+class GoldenStoreWriter:
+    """
+    Incremental store writer
+    Columns are appended chunk by chunk into temporary files and assembled
+    into the final store by close(), so memory stays bounded by one chunk.
+    """
+
+    def __init__(self, path, layout, config, meta=None):
+        self.path = str(path)
+        self.layout = layout
+        self.config = config
+        self.meta = meta or {}
+        self.num_records = 0
+        self.n_features = config['n_features']
+        self.tmp_dir = tempfile.mkdtemp(prefix='golden_store_', dir=os.path.dirname(os.path.abspath(self.path)))
+        self.files = {}
+        self.name_offset = 0
+        self._columns = None
+
+    def _write(self, name, values):
+        if name not in self.files:
+            self.files[name] = open(os.path.join(self.tmp_dir, name), 'wb')
+            if name == 'name_offsets':
+                self.files[name].write(np.zeros(1, dtype=np.int64).tobytes())
+        self.files[name].write(np.ascontiguousarray(values, dtype=COLUMN_DTYPES[name]).tobytes())
+
+    def append(self, columns, names=None):
+        """Append a chunk: columns maps column name -> array with one row per record"""
+        n = len(columns['features'])
+        if self._columns is not None and set(columns) != self._columns:
+            raise ValueError("All chunks must provide the same columns")
+        self._columns = set(columns)
+        for name, values in columns.items():
+            values = np.asarray(values)
+            if name == 'features':
+                values = values.reshape(n, self.n_features)
+            self._write(name, values)
+        if names is not None:
+            encoded = [s.encode('utf-8') for s in names]
+            lengths = np.array([len(b) for b in encoded], dtype=np.int64)
+            self._write('name_bytes', np.frombuffer(b''.join(encoded), dtype=np.uint8))
+            self._write('name_offsets', self.name_offset + np.cumsum(lengths))
+            self.name_offset += int(lengths.sum())
+        self.num_records += n
+
+    def close(self):
+        """Assemble the store file and remove the temporary column files"""
+        for f in self.files.values():
+            f.close()
+        columns = {}
+        offset = 0
+        for name in sorted(self.files):
+            nbytes = os.path.getsize(os.path.join(self.tmp_dir, name))
+            itemsize = np.dtype(COLUMN_DTYPES[name]).itemsize
+            if name == 'features':
+                shape = [self.num_records, self.n_features]
+            else:
+                shape = [nbytes // itemsize]
+            columns[name] = {'dtype': np.dtype(COLUMN_DTYPES[name]).str, 'shape': shape, 'offset': offset}
+            offset = _align(offset + nbytes)
+        header = json.dumps({
+            'version': 1,
+            'layout': self.layout,
+            'config': self.config,
+            'num_records': self.num_records,
+            'columns': columns,
+            'meta': self.meta
+        }).encode('utf-8')
+
+        data_start = _align(16 + len(header))
+        with open(self.path + '.tmp', 'wb') as out:
+            out.write(MAGIC + struct.pack('<Q', len(header)) + header)
+            for name in sorted(self.files):
+                out.write(b'\0' * (data_start + columns[name]['offset'] - out.tell()))
+                with open(os.path.join(self.tmp_dir, name), 'rb') as f:
+                    shutil.copyfileobj(f, out)
+        os.replace(self.path + '.tmp', self.path)
+        shutil.rmtree(self.tmp_dir)
+
+
+def write_golden_store(path, layout, config, columns, names=None, meta=None):
+    """Write a complete store in one call"""
+    writer = GoldenStoreWriter(path, layout, config, meta)
+    writer.append(columns, names)
+    writer.close()
+
+
+class GoldenStore:
+    """Memory-mapped read-only view of a golden store"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:8] != MAGIC:
+            raise ValueError(f"{self.path} is not a golden store")
+        header_len = struct.unpack('<Q', self._mm[8:16])[0]
+        header = json.loads(self._mm[16:16 + header_len].decode('utf-8'))
+        data_start = _align(16 + header_len)
+
+        self.layout = header['layout']
+        self.config = header['config']
+        self.meta = header['meta']
+        self.num_records = header['num_records']
+        self.columns = {}
+        for name, col in header['columns'].items():
+            dtype = np.dtype(col['dtype'])
+            count = int(np.prod(col['shape']))
+            if count == 0:
+                self.columns[name] = np.empty(col['shape'], dtype=dtype)
+            else:
+                self.columns[name] = np.frombuffer(self._mm, dtype=dtype, count=count,
+                                                   offset=data_start + col['offset']).reshape(col['shape'])
+
+    def __len__(self):
+        return self.num_records
+
+    def name(self, k):
+        """Name of record k ('' if the store has no name table)"""
+        if 'name_offsets' not in self.columns:
+            return ''
+        offsets = self.columns['name_offsets']
+        return bytes(self.columns['name_bytes'][offsets[k]:offsets[k + 1]]).decode('utf-8')
+
+    def record(self, k):
+        """Record k as a dictionary in the layout's JSON format"""
+        c = self.columns
+        if self.layout == LAYOUT_DIVERSE:
+            return {
+                'test_id': k,
+                'name': self.name(k),
+                'features_fp': c['features'][k].tolist(),
+                'expected_attack': int(c['expected_attack'][k]),
+                'actual_attack': int(c['attack'][k]),
+                'major_score': int(c['major_score'][k]),
+                'minor_score': int(c['minor_score'][k]),
+                'major_score_float': float(c['major_score_float'][k]),
+                'minor_score_float': float(c['minor_score_float'][k])
+            }
+        return {
+            'sample_id': k,
+            'features_fixed': c['features'][k].tolist(),
+            'major_score_float': float(c['major_score_float'][k]),
+            'minor_score_float': float(c['minor_score_float'][k]),
+            'major_score_fixed': int(c['major_score'][k]),
+            'minor_score_fixed': int(c['minor_score'][k]),
+            'attack_detected': int(c['attack'][k])
+        }
+
+    def records(self):
+        return GoldenRecords(self)
+
+    def to_dict(self):
+        """JSON-compatible document view; records are built lazily on access"""
+        if self.layout == LAYOUT_DIVERSE:
+            return {'config': self.config, 'test_cases': self.records()}
+        return {'config': self.config, 'num_samples': self.num_records, 'results': self.records()}
+
+    def close(self):
+        self.columns = {}
+        self._mm.close()
+
+
+class GoldenRecords:
+    """Lazy sequence of record dictionaries backed by a GoldenStore"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return [self.store.record(i) for i in range(*k.indices(len(self.store)))]
+        if k < 0:
+            k += len(self.store)
+        if not 0 <= k < len(self.store):
+            raise IndexError(k)
+        return self.store.record(k)
+
+    def __iter__(self):
+        for k in range(len(self.store)):
+            yield self.store.record(k)
+
+
+def store_path_for(json_path):
+    """Store file that sits next to a golden JSON file"""
+    return Path(json_path).with_suffix('.bin')
+
+
+def resolve_golden_path(json_path):
+    """Prefer the binary store next to json_path unless the JSON is newer"""
+    json_path = Path(json_path)
+    store_path = store_path_for(json_path)
+    if store_path.exists() and (not json_path.exists() or
+                                store_path.stat().st_mtime >= json_path.stat().st_mtime):
+        return store_path
+    return json_path
+
+
+def load_golden(path):
+    """
+    Load a golden file as a dictionary in the JSON layout
+    Stores are memory-mapped and their records materialize on access
+    """
+    with open(path, 'rb') as f:
+        is_store = f.read(8) == MAGIC
+    if is_store:
+        return GoldenStore(path).to_dict()
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def columns_from_json(golden):
+    """Convert a golden JSON document into (layout, columns, names)"""
+    if 'test_cases' in golden:
+        tests = golden['test_cases']
+        columns = {
+            'features': [t['features_fp'] for t in tests],
+            'major_score': [t['major_score'] for t in tests],
+            'minor_score': [t['minor_score'] for t in tests],
+            'attack': [t['actual_attack'] for t in tests],
+            'expected_attack': [t['expected_attack'] for t in tests],
+            'major_score_float': [t['major_score_float'] for t in tests],
+            'minor_score_float': [t['minor_score_float'] for t in tests],
+        }
+        return LAYOUT_DIVERSE, columns, [t['name'] for t in tests]
+    results = golden['results']
+    columns = {
+        'features': [r['features_fixed'] for r in results],
+        'major_score': [r['major_score_fixed'] for r in results],
+        'minor_score': [r['minor_score_fixed'] for r in results],
+        'attack': [r['attack_detected'] for r in results],
+        'major_score_float': [r['major_score_float'] for r in results],
+        'minor_score_float': [r['minor_score_float'] for r in results],
+    }
+    return LAYOUT_GOLDEN, columns, None
+
+
+def import_json(json_path, store_path):
+    """Convert a golden JSON file into a store"""
+    with open(json_path, 'r') as f:
+        golden = json.load(f)
+    layout, columns, names = columns_from_json(golden)
+    write_golden_store(store_path, layout, golden['config'], columns, names)
+    return len(columns['features'])
+
+
+def export_json(store_path, json_path):
+    """Export a store back to its original JSON format"""
+    store = GoldenStore(store_path)
+    doc = store.to_dict()
+    key = 'test_cases' if store.layout == LAYOUT_DIVERSE else 'results'
+    doc[key] = list(doc[key])
+    with open(json_path, 'w') as f:
+        json.dump(doc, f, indent=2)
+    n = len(store)
+    store.close()
+    return n
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ('import', 'export'):
+        print("Usage: python golden_store.py import <golden.json> [store.bin]")
+        print("       python golden_store.py export <store.bin> [golden.json]")
+        return 1
+
+    src = Path(sys.argv[2])
+    if sys.argv[1] == 'import':
+        dst = Path(sys.argv[3]) if len(sys.argv) > 3 else store_path_for(src)
+        n = import_json(src, dst)
+    else:
+        dst = Path(sys.argv[3]) if len(sys.argv) > 3 else src.with_suffix('.json')
+        n = export_json(src, dst)
+    print(f"✓ Wrote {n} records to {dst}")
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
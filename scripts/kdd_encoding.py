@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Versioned vocabulary encoding of the KDD Cup categorical features
+protocol_type, service and flag map to their index in a fixed vocabulary.
+The tables are stored with the model (the 'encoding' key of
+pca_coeffs.json and the compiled artifact), so a feature vector means the
+same thing in every process and on every run. Values outside the
+vocabulary map to the code of the column's default value.
+"""
+
+import numpy as np
+
+
+ENCODING_VERSION = 1
+
+CATEGORICAL_COLUMNS = ('protocol_type', 'service', 'flag')
+
+VOCABULARY = {
+    'protocol_type': ['tcp', 'udp', 'icmp'],
+    'service': [
+        'aol', 'auth', 'bgp', 'courier', 'csnet_ns', 'ctf', 'daytime', 'discard', 'domain', 'domain_u',
+        'echo', 'eco_i', 'ecr_i', 'efs', 'exec', 'finger', 'ftp', 'ftp_data', 'gopher', 'harvest',
+        'hostnames', 'http', 'http_2784', 'http_443', 'http_8001', 'imap4', 'IRC', 'iso_tsap', 'klogin', 'kshell',
+        'ldap', 'link', 'login', 'mtp', 'name', 'netbios_dgm', 'netbios_ns', 'netbios_ssn', 'netstat', 'nnsp',
+        'nntp', 'ntp_u', 'other', 'pm_dump', 'pop_2', 'pop_3', 'printer', 'private', 'red_i', 'remote_job',
+        'rje', 'shell', 'smtp', 'sql_net', 'ssh', 'sunrpc', 'supdup', 'systat', 'telnet', 'tftp_u',
+        'tim_i', 'time', 'urh_i', 'urp_i', 'uucp', 'uucp_path', 'vmnet', 'whois', 'X11', 'Z39_50'
+    ],
+    'flag': ['OTH', 'REJ', 'RSTO', 'RSTOS0', 'RSTR', 'S0', 'S1', 'S2', 'S3', 'SF', 'SH'],
+}
+
+# Value whose code is used for anything outside the vocabulary
+DEFAULTS = {
+    'protocol_type': 'tcp',
+    'service': 'other',
+    'flag': 'OTH',
+}
+
+
+def default_encoding():
+    """Current encoding tables, in the layout stored with the model"""
+    return {
+        'version': ENCODING_VERSION,
+        'vocabulary': {name: list(values) for name, values in VOCABULARY.items()},
+        'default': dict(DEFAULTS),
+    }
+
+
+def get_encoding(model=None):
+    """Encoding stored with a model (the current default if the model has none)"""
+    encoding = model.get('encoding') if model is not None else None
+    if encoding is None:
+        return default_encoding()
+    if encoding.get('version') != ENCODING_VERSION:
+        raise ValueError(f"Unsupported categorical encoding version {encoding.get('version')}")
+    return encoding
+
+
+def encoding_lookup(encoding):
+    """Per-column (value -> code dictionary, default code) for row-at-a-time encoding"""
+    lookup = {}
+    for name in CATEGORICAL_COLUMNS:
+        codes = {value: code for code, value in enumerate(encoding['vocabulary'][name])}
+        lookup[name] = (codes, codes[encoding['default'][name]])
+    return lookup
+
+
+def encode_vocabulary(values, name, encoding):
+    """Codes of a list of distinct values, as a float64 lookup table"""
+    codes, default = encoding_lookup(encoding)[name]
+    return np.array([codes.get(value, default) for value in values], dtype=np.float64)
+
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Persistent label -> byte offset index of a dataset CSV
+Built in one streaming pass, it stores for every label the byte offsets of
+its rows, so loaders can seek straight to the rows of the classes they
+want: drawing K rows of a rare attack type reads K lines instead of the
+whole file. Like the typed dataset cache, the index sits next to the CSV
+and is rebuilt when the file changes (size, then mtime or SHA-256).
+
+File layout (.index, a NumPy .npz archive):
+    header    UTF-8 JSON: version, source {path, size, mtime_ns, sha256},
+              label_field, labels (stripped label text, sorted)
+    offsets   uint64 row offsets grouped by label, in file order within a label
+    starts    int64, offsets[starts[i]:starts[i + 1]] are the rows of labels[i]
+
+Usage:
+    python label_index.py <dataset.csv> [--sample K --output rows.csv --seed S]
+"""
+
+import numpy as np
+import argparse
+import csv
+import json
+import os
+from pathlib import Path
+
+from dataset_io import iter_range_blocks, read_header, open_dataset
+from dataset_cache import detect_kind, file_sha256, KIND_KDD, LABEL_COLUMNS
+from sampling import stratum_quotas
+
+
+INDEX_VERSION = 1
+
+# Labels longer than this are still indexed, just via the per-line fallback
+_MAX_LABEL_BYTES = 32
+
+
+def index_path_for(csv_path):
+    """Index file that sits next to a dataset CSV (name.csv -> name.csv.index, see cache_path_for)"""
+    return Path(str(csv_path) + '.index')
+
+
+def _label_field(csv_path):
+    """(index of the label field, -1 for the last one; byte offset of the first data line)"""
+    if detect_kind(csv_path) == KIND_KDD:
+        return -1, 0
+    names, start = read_header(csv_path)
+    for name in LABEL_COLUMNS:
+        if name in names:
+            field = names.index(name)
+            return (-1 if field == len(names) - 1 else field), start
+    raise ValueError(f"{csv_path} has no label column ({', '.join(LABEL_COLUMNS)})")
+
+
+def _block_labels(block, label_field):
+    """(line start positions, label bytes of each line) of a block of whole lines"""
+    data = np.frombuffer(block, dtype=np.uint8)
+    ends = np.flatnonzero(data == ord('\n'))
+    if len(data) and data[-1] != ord('\n'):
+        ends = np.append(ends, len(data))
+    starts = np.r_[0, ends[:-1] + 1]
+    if label_field != -1:
+        lines = [block[s:e] for s, e in zip(starts, ends)]
+        labels = [line.split(b',')[label_field].strip() if line.strip() else b'' for line in lines]
+        return starts, labels
+
+    # Last field: everything after the line's last comma, located with one searchsorted
+    commas = np.flatnonzero(data == ord(','))
+    last_comma = np.searchsorted(commas, ends) - 1
+    begin = np.where(last_comma >= 0, commas[np.maximum(last_comma, 0)] + 1, starts)
+    begin = np.maximum(begin, starts)
+    width = np.minimum(ends - begin, _MAX_LABEL_BYTES)
+    # Fixed-width matrix of label bytes, zero-padded, so labels can be deduplicated as rows
+    cols = np.arange(_MAX_LABEL_BYTES)
+    padded = np.zeros((len(ends), _MAX_LABEL_BYTES), dtype=np.uint8)
+    mask = cols < width[:, np.newaxis]
+    padded[mask] = data[(begin[:, np.newaxis] + cols)[mask]]
+    keys = padded.view(np.dtype((np.void, _MAX_LABEL_BYTES))).ravel()
+    distinct, inverse = np.unique(keys, return_inverse=True)
+    names = [bytes(key).rstrip(b'\0').strip() for key in distinct]
+    labels = [names[k] for k in inverse.ravel()]
+    long_rows = np.flatnonzero(ends - begin > _MAX_LABEL_BYTES)
+    for k in long_rows:
+        labels[k] = block[begin[k]:ends[k]].strip()
+    return starts, labels
+
+
+def scan_labels(csv_path, block_bytes=64 << 20):
+    """
+    One pass over csv_path: (row offsets in file order, label code of each
+    row, label names by code). Rows with an empty label are skipped.
+    """
+    label_field, start = _label_field(csv_path)
+    all_offsets = []
+    all_codes = []
+    codes = {}
+    position = start
+    for block in iter_range_blocks(csv_path, start, None, block_bytes):
+        line_starts, labels = _block_labels(block, label_field)
+        keep = np.array([len(label) > 0 for label in labels], dtype=bool)
+        block_codes = np.array([codes.setdefault(label, len(codes)) for label in labels], dtype=np.int64)
+        all_offsets.append((position + line_starts)[keep].astype(np.uint64))
+        all_codes.append(block_codes[keep])
+        position += len(block)
+    offsets = np.concatenate(all_offsets) if all_offsets else np.empty(0, dtype=np.uint64)
+    row_codes = np.concatenate(all_codes) if all_codes else np.empty(0, dtype=np.int64)
+    return offsets, row_codes, [label.decode() for label in codes]
+
+
+def build_index(csv_path, index_path=None, block_bytes=64 << 20):
+    """Index the rows of csv_path by label in one pass and write the index (atomically)"""
+    csv_path = Path(csv_path)
+    index_path = Path(index_path or index_path_for(csv_path))
+    stat = os.stat(csv_path)
+    label_field, _ = _label_field(csv_path)
+
+    offsets, row_codes, names = scan_labels(csv_path, block_bytes)
+    order = np.argsort(names)
+    rank = np.empty(len(names), dtype=np.int64)
+    rank[order] = np.arange(len(names))
+    row_codes = rank[row_codes]
+    grouped = np.argsort(row_codes, kind='stable')
+    starts = np.r_[0, np.cumsum(np.bincount(row_codes, minlength=len(names)))].astype(np.int64)
+
+    header = json.dumps({
+        'version': INDEX_VERSION,
+        'source': {
+            'path': str(csv_path.resolve()),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': file_sha256(csv_path)
+        },
+        'label_field': label_field,
+        'labels': [names[k] for k in order],
+    })
+    tmp_path = index_path.with_suffix('.tmp.npz')
+    np.savez(tmp_path, header=np.frombuffer(header.encode('utf-8'), dtype=np.uint8),
+             offsets=offsets[grouped], starts=starts)
+    os.replace(tmp_path, index_path)
+    return index_path
+
+
+def _read_header(index_path):
+    with np.load(index_path) as data:
+        return json.loads(data['header'].tobytes().decode('utf-8'))
+
+
+def is_current(index_path, csv_path):
+    """True if the index at index_path was built from the current csv_path (see dataset_cache.is_current)"""
+    try:
+        header = _read_header(index_path)
+    except (OSError, ValueError, KeyError):
+        return False
+    if header.get('version') != INDEX_VERSION:
+        return False
+    source = header['source']
+    stat = os.stat(csv_path)
+    if stat.st_size != source['size']:
+        return False
+    return stat.st_mtime_ns == source['mtime_ns'] or file_sha256(csv_path) == source['sha256']
+
+
+class LabelIndex:
+    """Byte offsets of the rows of each label of one CSV file"""
+
+    def __init__(self, index_path, csv_path):
+        self.csv_path = Path(csv_path)
+        with np.load(index_path) as data:
+            header = json.loads(data['header'].tobytes().decode('utf-8'))
+            self.offsets = data['offsets']
+            self.starts = data['starts']
+        self.labels = header['labels']
+
+    def counts(self):
+        """{label: number of rows}"""
+        return dict(zip(self.labels, np.diff(self.starts).tolist()))
+
+    def _label_position(self, label):
+        """Position of a label in self.labels; KDD's trailing '.' is optional"""
+        for k, name in enumerate(self.labels):
+            if name == label or name.rstrip('.') == label.rstrip('.'):
+                return k
+        raise KeyError(f"Label '{label}' not in the index of {self.csv_path}")
+
+    def label_offsets(self, label):
+        """Byte offsets of every row of a label, in file order"""
+        k = self._label_position(label)
+        return self.offsets[self.starts[k]:self.starts[k + 1]]
+
+    def sample(self, label, n_samples, seed=0):
+        """Sorted byte offsets of a seeded random sample of up to n_samples rows of a label"""
+        offsets = self.label_offsets(label)
+        if n_samples >= len(offsets):
+            return offsets
+        return np.sort(np.random.default_rng(seed).choice(offsets, n_samples, replace=False))
+
+    def sample_stratified(self, n_samples, seed=0, labels=None, allocation='proportional'):
+        """Sorted byte offsets of n_samples rows over several labels (all by default, see stratum_quotas)"""
+        labels = self.labels if labels is None else labels
+        counts = [len(self.label_offsets(label)) for label in labels]
+        quotas = stratum_quotas(counts, n_samples, allocation)
+        picked = [self.sample(label, int(quota), seed + k) for k, (label, quota) in enumerate(zip(labels, quotas))]
+        return np.sort(np.concatenate(picked)) if picked else np.empty(0, dtype=np.uint64)
+
+    def per_label(self, k, seed=0, labels=None):
+        """{label: sorted offsets of up to k random rows} for every label (or the given ones)"""
+        labels = self.labels if labels is None else labels
+        return {label: self.sample(label, k, seed + j) for j, label in enumerate(labels)}
+
+    def file_order(self):
+        """(row offsets in file order, label of each row), as scan_labels sees the file"""
+        row_labels = np.repeat(np.array(self.labels, dtype=object), np.diff(self.starts))
+        order = np.argsort(self.offsets, kind='stable')
+        return self.offsets[order], row_labels[order]
+
+    def read_lines(self, offsets):
+        """The lines at the given byte offsets (decoded, in the order given)"""
+        return read_lines_at(self.csv_path, offsets)
+
+    def read_rows(self, offsets):
+        """read_lines parsed into CSV rows"""
+        return list(csv.reader(self.read_lines(offsets)))
+
+
+def read_lines_at(csv_path, offsets):
+    """The lines of csv_path at the given byte offsets (decoded, in the order given)"""
+    lines = []
+    # Compressed files seek by decompressing forward: pass sorted offsets
+    with open_dataset(csv_path, 'rb') as f:
+        for offset in offsets:
+            f.seek(int(offset))
+            lines.append(f.readline().decode())
+    return lines
+
+
+def labeled_rows(csv_path, build=True):
+    """
+    (row offsets in file order, label of each row) of csv_path
+    Read from its label index, or from a scan of the file when no index can be built
+    """
+    index = open_index(csv_path, build)
+    if index is not None:
+        return index.file_order()
+    offsets, row_codes, names = scan_labels(csv_path)
+    return offsets, np.array(names, dtype=object)[row_codes]
+
+
+def open_index(csv_path, build=True):
+    """
+    Load the label index of csv_path, (re)building it when missing or stale
+    Returns None when no index can be built, so callers can fall back to scanning
+    """
+    index_path = index_path_for(csv_path)
+    if not is_current(index_path, csv_path):
+        if not build:
+            return None
+        print(f"Building label index {index_path}...")
+        try:
+            build_index(csv_path, index_path)
+        except (OSError, ValueError) as e:
+            print(f"Warning: cannot index {csv_path} ({e})")
+            return None
+    return LabelIndex(index_path, csv_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the label -> byte offset index of a dataset CSV")
+    parser.add_argument('dataset')
+    parser.add_argument('--sample', type=int, default=None, metavar='K', help="Draw K random rows of every label")
+    parser.add_argument('--labels', default=None, help="Comma-separated labels to sample (default: all)")
+    parser.add_argument('--output', default=None, help="CSV file for the sampled rows (default: stdout)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    index_path = build_index(args.dataset)
+    index = LabelIndex(index_path, args.dataset)
+    counts = index.counts()
+    print(f"✓ Indexed {sum(counts.values())} rows of {args.dataset} -> {index_path}")
+    for label, count in sorted(counts.items(), key=lambda item: -item[1]):
+        print(f"  {label:20s} {count}")
+
+    if args.sample:
+        labels = args.labels.split(',') if args.labels else None
+        offsets = np.sort(np.concatenate(list(index.per_label(args.sample, args.seed, labels).values())))
+        lines = index.read_lines(offsets)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.writelines(lines)
+            print(f"✓ Wrote {len(lines)} rows to {args.output}")
+        else:
+            print(''.join(lines), end='')
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
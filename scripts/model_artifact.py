@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Compiled binary PCA model artifact
+Stores the model as contiguous, stacked coefficient matrices (major rows
+first, then minor) in int64 fixed-point and float64, plus config, format
+version and a content checksum. Loading is a zero-copy memory map, so no
+script has to re-parse or re-convert pca_coeffs.json.
+
+File layout:
+    8 bytes   magic b'NIDSMD01'
+    8 bytes   header length (little-endian uint64)
+    header    UTF-8 JSON: version, checksum, config, extra keys, arrays {name: dtype/shape/offset}
+    data      arrays, each 64-byte aligned; offsets are relative to the
+              first aligned byte after the header
+
+Usage:
+    python model_artifact.py <pca_coeffs.json> [pca_coeffs.bin]
+"""
+
+import numpy as np
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from pathlib import Path
+
+
+MAGIC = b'NIDSMD01'
+ARTIFACT_VERSION = 1
+ALIGN = 64
+
+# Array entries of the artifact, in checksum order
+ARRAY_DTYPES = {
+    'mean': np.float64,
+    'mean_fixed': np.int64,
+    'components': np.float64,
+    'components_fixed': np.int64,
+    'scale': np.float64,
+    'explained_variance_ratio': np.float64,
+}
+
+# JSON keys folded into the stacked arrays
+_STACKED_KEYS = ('major_components', 'minor_components', 'major_components_fixed', 'minor_components_fixed')
+
+
+def _align(pos):
+    return (pos + ALIGN - 1) // ALIGN * ALIGN
+
+
+def compile_model(model):
+    """
+    Convert a pca_coeffs.json dictionary into (config, arrays, extra)
+    arrays holds contiguous numpy arrays; extra keeps any other JSON keys
+    """
+    config = model['config']
+    n_features = config['n_features']
+    arrays = {
+        'mean': np.asarray(model['mean'], dtype=np.float64),
+        'mean_fixed': np.asarray(model['mean_fixed'], dtype=np.int64),
+        'components': np.vstack([np.asarray(model['major_components'], dtype=np.float64).reshape(-1, n_features),
+                                 np.asarray(model['minor_components'], dtype=np.float64).reshape(-1, n_features)]),
+        'components_fixed': np.vstack([np.asarray(model['major_components_fixed'], dtype=np.int64).reshape(-1, n_features),
+                                       np.asarray(model['minor_components_fixed'], dtype=np.int64).reshape(-1, n_features)]),
+    }
+    for name in ('scale', 'explained_variance_ratio'):
+        if name in model:
+            arrays[name] = np.asarray(model[name], dtype=np.float64)
+    arrays = {name: np.ascontiguousarray(a, dtype=ARRAY_DTYPES[name]) for name, a in arrays.items()}
+
+    skip = set(ARRAY_DTYPES) | set(_STACKED_KEYS) | {'config', 'version', 'checksum'}
+    extra = {k: v for k, v in model.items() if k not in skip}
+    return config, arrays, extra
+
+
+def _checksum(config, arrays, extra):
+    """SHA-256 over config, extra keys and every array's dtype, shape and bytes"""
+    h = hashlib.sha256()
+    h.update(json.dumps(config, sort_keys=True).encode('utf-8'))
+    h.update(json.dumps(extra, sort_keys=True).encode('utf-8'))
+    for name in ARRAY_DTYPES:
+        if name in arrays:
+            a = np.ascontiguousarray(arrays[name], dtype=np.dtype(ARRAY_DTYPES[name]).newbyteorder('<'))
+            h.update(f"{name}:{a.dtype.str}:{a.shape}".encode('utf-8'))
+            h.update(a.tobytes())
+    return h.hexdigest()
+
+
+def model_checksum(model):
+    """Content checksum of a model dictionary (JSON-loaded or compiled)"""
+    if 'checksum' in model:
+        return model['checksum']
+    return _checksum(*compile_model(model))
+
+
+def write_model_artifact(model, path):
+    """Compile a model dictionary and write it as a binary artifact"""
+    config, arrays, extra = compile_model(model)
+    entries = {}
+    offset = 0
+    for name, a in arrays.items():
+        entries[name] = {'dtype': a.dtype.str, 'shape': list(a.shape), 'offset': offset}
+        offset = _align(offset + a.nbytes)
+    checksum = _checksum(config, arrays, extra)
+    header = json.dumps({
+        'version': ARTIFACT_VERSION,
+        'checksum': checksum,
+        'config': config,
+        'extra': extra,
+        'arrays': entries
+    }).encode('utf-8')
+
+    # Written next to the target and renamed, so a memory-mapped old artifact stays valid
+    data_start = _align(16 + len(header))
+    tmp_path = str(path) + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<Q', len(header)) + header)
+        for name, a in arrays.items():
+            f.write(b'\0' * (data_start + entries[name]['offset'] - f.tell()))
+            f.write(a.tobytes())
+    os.replace(tmp_path, path)
+    return checksum
+
+
+def load_model_artifact(path, verify=False):
+    """
+    Memory-map a model artifact
+    Returns a dictionary with the pca_coeffs.json keys (as read-only array
+    views), the stacked 'components'/'components_fixed' matrices, 'version'
+    and 'checksum'. verify=True recomputes the checksum.
+    """
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mm[:8] != MAGIC:
+        raise ValueError(f"{path} is not a PCA model artifact")
+    header_len = struct.unpack('<Q', mm[8:16])[0]
+    header = json.loads(mm[16:16 + header_len].decode('utf-8'))
+    if header['version'] != ARTIFACT_VERSION:
+        raise ValueError(f"{path}: unsupported artifact version {header['version']}")
+    data_start = _align(16 + header_len)
+
+    arrays = {}
+    for name, entry in header['arrays'].items():
+        count = int(np.prod(entry['shape']))
+        arrays[name] = np.frombuffer(mm, dtype=np.dtype(entry['dtype']), count=count,
+                                     offset=data_start + entry['offset']).reshape(entry['shape'])
+    if verify and _checksum(header['config'], arrays, header['extra']) != header['checksum']:
+        raise ValueError(f"{path}: checksum mismatch")
+
+    q = header['config']['n_major_components']
+    model = dict(header['extra'])
+    model.update(arrays)
+    model.update({
+        'config': header['config'],
+        'version': header['version'],
+        'checksum': header['checksum'],
+        'major_components': arrays['components'][:q],
+        'minor_components': arrays['components'][q:],
+        'major_components_fixed': arrays['components_fixed'][:q],
+        'minor_components_fixed': arrays['components_fixed'][q:],
+    })
+    return model
+
+
+def artifact_path_for(json_path):
+    """Artifact file that sits next to a model JSON file"""
+    return Path(json_path).with_suffix('.bin')
+
+
+def load_model(path):
+    """
+    Load a PCA model from an artifact or JSON file
+    For JSON paths the compiled artifact next to it is used unless the JSON is newer
+    """
+    path = Path(path)
+    with open(path, 'rb') as f:
+        if f.read(8) == MAGIC:
+            return load_model_artifact(path)
+    artifact = artifact_path_for(path)
+    if artifact.exists() and artifact.stat().st_mtime >= path.stat().st_mtime:
+        return load_model_artifact(artifact)
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python model_artifact.py <pca_coeffs.json> [pca_coeffs.bin]")
+        return 1
+
+    json_path = Path(sys.argv[1])
+    output_path = Path(sys.argv[2]) if len(sys.argv) > 2 else artifact_path_for(json_path)
+    with open(json_path, 'r') as f:
+        model = json.load(f)
+    checksum = write_model_artifact(model, output_path)
+    print(f"✓ Compiled {json_path} -> {output_path}")
+    print(f"  Checksum: {checksum}")
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,685 @@
+#!/usr/bin/env python3
+"""
+Shared vectorized scoring engine for PCA-based NIDS
+Every golden/testbench generator scores through score_fixed_batch, and the
+arithmetic of each pca_detector.sv revision is described by a named profile
+"""
+
+import numpy as np
+
+from model_artifact import load_model
+from fixed_point import to_fixed, wrap, multiply_accumulate, sum_of_squares
+
+
+# Hardware semantics profiles
+#
+# *_shift:  'product'    - shift every product by FRAC_BITS before accumulating
+#           'accumulate' - accumulate full-precision products, shift once
+# wrap_*:   wrap that intermediate to 32-bit signed (two's complement)
+# compare:  'signed'     - score > threshold on the signed 32-bit score
+#           'abs'        - |score| > threshold with a true absolute value
+#           'abs_wrap'   - |score| > threshold with a 32-bit negate, compared unsigned like
+#                          pca_detector.sv's logic [31:0] thresholds (abs(-2^31) reads as 2^31)
+PROFILES = {
+    'golden_reference': {
+        'description': 'Signed-threshold pca_detector.sv revision modelled by generate_golden_reference.py',
+        'projection_shift': 'product',
+        'reconstruction_shift': 'product',
+        'score_shift': 'product',
+        'wrap_centered': False,
+        'wrap_product': False,
+        'wrap_projection': True,
+        'wrap_reconstruction': True,
+        'wrap_residual': True,
+        'compare': 'signed',
+    },
+    'diverse_testbench': {
+        'description': 'Absolute-threshold revision modelled by generate_diverse_testbench.py',
+        'projection_shift': 'accumulate',
+        'reconstruction_shift': 'product',
+        'score_shift': 'accumulate',
+        'wrap_centered': False,
+        'wrap_product': False,
+        'wrap_projection': True,
+        'wrap_reconstruction': False,
+        'wrap_residual': False,
+        'compare': 'abs',
+    },
+    'pca_detector': {
+        'description': 'Current src/pca_detector.sv: 32-bit registers and 32-bit shifted products',
+        'projection_shift': 'product',
+        'reconstruction_shift': 'product',
+        'score_shift': 'product',
+        'wrap_centered': True,
+        'wrap_product': True,
+        'wrap_projection': True,
+        'wrap_reconstruction': True,
+        'wrap_residual': True,
+        'compare': 'abs_wrap',
+    },
+}
+
+DEFAULT_THRESHOLD = 100  # In real units, compared as (DEFAULT_THRESHOLD << frac_bits)
+
+
+def get_profile(profile):
+    """Return a profile dictionary from its name (dictionaries pass through)"""
+    if isinstance(profile, dict):
+        return profile
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown scoring profile '{profile}' (available: {', '.join(PROFILES)})")
+    return PROFILES[profile]
+
+
+def model_thresholds(model, frac_bits=None):
+    """
+    Fixed-point (major, minor) attack thresholds of a model
+    Calibrated thresholds are stored under 'thresholds_fixed' (see calibrate_threshold.py);
+    uncalibrated models use DEFAULT_THRESHOLD << frac_bits for both scores. The
+    legacy 'thresholds' entry (real-unit values of older models) is not used.
+    """
+    if model.get('thresholds_fixed'):
+        thresholds = model['thresholds_fixed']
+        major, minor = thresholds['major'], thresholds['minor']
+        if major != int(major) or minor != int(minor):
+            raise ValueError(f"thresholds_fixed must be fixed-point integers, got major {major}, minor {minor}")
+        return int(major), int(minor)
+    if frac_bits is None:
+        frac_bits = model['config']['frac_bits']
+    return DEFAULT_THRESHOLD << frac_bits, DEFAULT_THRESHOLD << frac_bits
+
+
+def load_pca_model(path):
+    """Load PCA model from a compiled artifact or JSON (see model_artifact.load_model)"""
+    return load_model(path)
+
+
+def fixed_point_convert_array(values, frac_bits=8, saturate=False):
+    """
+    Convert an array of floats to fixed-point int32
+    Rounds half to even like round(); saturate=True clamps to the 32-bit range
+    instead of wrapping
+    """
+    return to_fixed(values, frac_bits, overflow='saturate' if saturate else 'wrap').raw.astype(np.int32)
+
+
+def wrap32(values):
+    """Wrap int64 values to 32-bit signed, keeping int64 dtype"""
+    return wrap(values, 32)
+
+
+def _multiply_accumulate(a, b, shift, frac_bits, wrap_product):
+    """
+    Compute a @ b.T in fixed point: (n, K) x (M, K) -> (n, M) int64
+    'product' shifts (and optionally wraps) each product, 'accumulate' shifts the sum
+    """
+    return multiply_accumulate(a, b, frac_bits, shift, 32 if wrap_product else None)
+
+
+def _sum_of_squares(a, shift, frac_bits, wrap_product):
+    """Fixed-point row-wise sum of squares of an (n, K) int64 array"""
+    return sum_of_squares(a, frac_bits, shift, 32 if wrap_product else None)
+
+
+def _model_arrays(model, fixed=True):
+    """
+    Model coefficients as (mean, stacked components, Q)
+    Compiled artifacts already hold the stacked matrix; JSON models are stacked here
+    """
+    q = model['config']['n_major_components']
+    suffix = '_fixed' if fixed else ''
+    dtype = np.int64 if fixed else np.float64
+    mean = np.asarray(model['mean' + suffix], dtype=dtype)
+    if 'components' + suffix in model:
+        return mean, np.asarray(model['components' + suffix], dtype=dtype), q
+    components = np.vstack([np.asarray(model['major_components' + suffix], dtype=dtype).reshape(-1, len(mean)),
+                            np.asarray(model['minor_components' + suffix], dtype=dtype).reshape(-1, len(mean))])
+    return mean, components, q
+
+
+def sparse_coefficients(model):
+    """
+    Sparse form of a model's fixed-point coefficients
+    Pruned models carry it under 'sparse' (see prune_pca.py); for other
+    models every nonzero coefficient is kept and every feature is active.
+
+    Returns:
+        (features, rows, cols, values): indices of the active features (the
+        only ones centered and scored), and one (stacked component row,
+        position in features, coefficient) entry per kept coefficient
+    """
+    if model.get('sparse'):
+        sparse = model['sparse']
+        return (np.asarray(sparse['features'], dtype=np.int64), np.asarray(sparse['rows'], dtype=np.int64),
+                np.asarray(sparse['cols'], dtype=np.int64), np.asarray(sparse['values'], dtype=np.int64))
+    _, components, _ = _model_arrays(model)
+    rows, cols = np.nonzero(components)
+    return np.arange(components.shape[1], dtype=np.int64), rows.astype(np.int64), cols.astype(np.int64), \
+        components[rows, cols]
+
+
+def unique_rows(values):
+    """
+    Collapse duplicate rows of a 2-D array
+    Each row is keyed by its raw bytes, so only bit-identical vectors merge.
+    Returns (unique, inverse, counts) with unique[inverse] equal to values
+    and counts holding the multiplicity of each unique row
+    """
+    values = np.ascontiguousarray(np.atleast_2d(values))
+    keys = values.view(np.dtype((np.void, values.dtype.itemsize * values.shape[1]))).ravel()
+    _, index, inverse, counts = np.unique(keys, return_index=True, return_inverse=True, return_counts=True)
+    return values[index], inverse.ravel(), counts
+
+
+def score_fixed_batch(features_fixed, model, profile='golden_reference', frac_bits=None, threshold=None,
+                      dedup=False):
+    """
+    Bit-exact fixed-point PCA detection over an (n_samples, N_FEATURES) block
+
+    Args:
+        features_fixed: fixed-point feature vectors (one row per sample)
+        model: PCA model dictionary (pca_coeffs.json layout or compiled artifact)
+        profile: name of a PROFILES entry (or a profile dictionary)
+        frac_bits: fractional bits (defaults to model config)
+        threshold: fixed-point threshold, or a (major, minor) pair (defaults to model_thresholds)
+        dedup: score each distinct vector once and fan the scores back out
+
+    Returns:
+        (major_scores, minor_scores, attack_detected) as int32/int32/uint8 arrays
+    """
+    if dedup:
+        unique, inverse, _ = unique_rows(np.asarray(features_fixed, dtype=np.int64))
+        major, minor, attack = score_fixed_batch(unique, model, profile, frac_bits, threshold)
+        return major[inverse], minor[inverse], attack[inverse]
+
+    if model.get('sparse'):
+        return score_sparse_batch(features_fixed, model, profile, frac_bits, threshold)
+
+    p = get_profile(profile)
+    if frac_bits is None:
+        frac_bits = model['config']['frac_bits']
+    if threshold is None:
+        threshold = model_thresholds(model, frac_bits)
+    mean_fixed, components, q = _model_arrays(model)
+
+    features_fixed = np.atleast_2d(np.asarray(features_fixed, dtype=np.int64))
+
+    # Center the data
+    centered = features_fixed - mean_fixed
+    if p['wrap_centered']:
+        centered = wrap32(centered)
+
+    # Project onto the stacked major and minor components in one pass
+    proj = _multiply_accumulate(centered, components, p['projection_shift'], frac_bits, p['wrap_product'])
+    if p['wrap_projection']:
+        proj = wrap32(proj)
+    major_proj = proj[:, :q]
+    minor_proj = proj[:, q:]
+
+    # Reconstruct from major components
+    major_recon = _multiply_accumulate(major_proj, components[:q].T, p['reconstruction_shift'], frac_bits, p['wrap_product'])
+    if p['wrap_reconstruction']:
+        major_recon = wrap32(major_recon)
+
+    # Major score: SPE of the residual; minor score: energy in minor subspace
+    residual = centered - major_recon
+    if p['wrap_residual']:
+        residual = wrap32(residual)
+    major_scores = _sum_of_squares(residual, p['score_shift'], frac_bits, p['wrap_product']).astype(np.int32)
+    minor_scores = _sum_of_squares(minor_proj, p['score_shift'], frac_bits, p['wrap_product']).astype(np.int32)
+
+    attack_detected = compare_threshold(major_scores, minor_scores, threshold, p['compare'])
+    return major_scores, minor_scores, attack_detected
+
+
+def score_sparse_batch(features_fixed, model, profile='golden_reference', frac_bits=None, threshold=None,
+                       dedup=False):
+    """
+    score_fixed_batch over the sparse coefficients of a model
+    Only the active features are centered and scored and only the kept
+    coefficients are multiplied. Bit-identical to score_fixed_batch for
+    models without a 'sparse' entry; for pruned models this is the
+    arithmetic of pca_detector_sparse.sv. Arguments and results as for
+    score_fixed_batch.
+    """
+    if dedup:
+        unique, inverse, _ = unique_rows(np.asarray(features_fixed, dtype=np.int64))
+        major, minor, attack = score_sparse_batch(unique, model, profile, frac_bits, threshold)
+        return major[inverse], minor[inverse], attack[inverse]
+
+    p = get_profile(profile)
+    if frac_bits is None:
+        frac_bits = model['config']['frac_bits']
+    if threshold is None:
+        threshold = model_thresholds(model, frac_bits)
+    mean_fixed, components, q = _model_arrays(model)
+    features, rows, cols, values = sparse_coefficients(model)
+    n_components = components.shape[0]
+
+    features_fixed = np.atleast_2d(np.asarray(features_fixed, dtype=np.int64))
+    n = features_fixed.shape[0]
+
+    centered = features_fixed[:, features] - mean_fixed[features]
+    if p['wrap_centered']:
+        centered = wrap32(centered)
+
+    # Projection: one pass over the active features that have kept coefficients
+    if p['projection_shift'] == 'accumulate':
+        weights = np.zeros((n_components, len(features)), dtype=np.int64)
+        weights[rows, cols] = values
+        proj = (centered @ weights.T) >> frac_bits
+    else:
+        proj = np.zeros((n, n_components), dtype=np.int64)
+        for col in np.unique(cols):
+            sel = cols == col
+            prod = (centered[:, col:col + 1] * values[sel]) >> frac_bits
+            proj[:, rows[sel]] += wrap32(prod) if p['wrap_product'] else prod
+    if p['wrap_projection']:
+        proj = wrap32(proj)
+    major_proj = proj[:, :q]
+    minor_proj = proj[:, q:]
+
+    # Reconstruction from the kept major coefficients
+    major = rows < q
+    if p['reconstruction_shift'] == 'accumulate':
+        weights = np.zeros((q, len(features)), dtype=np.int64)
+        weights[rows[major], cols[major]] = values[major]
+        major_recon = (major_proj @ weights) >> frac_bits
+    else:
+        major_recon = np.zeros((n, len(features)), dtype=np.int64)
+        for row in range(q):
+            sel = rows == row
+            prod = (major_proj[:, row:row + 1] * values[sel]) >> frac_bits
+            major_recon[:, cols[sel]] += wrap32(prod) if p['wrap_product'] else prod
+    if p['wrap_reconstruction']:
+        major_recon = wrap32(major_recon)
+
+    residual = centered - major_recon
+    if p['wrap_residual']:
+        residual = wrap32(residual)
+    major_scores = _sum_of_squares(residual, p['score_shift'], frac_bits, p['wrap_product']).astype(np.int32)
+    minor_scores = _sum_of_squares(minor_proj, p['score_shift'], frac_bits, p['wrap_product']).astype(np.int32)
+
+    attack_detected = compare_threshold(major_scores, minor_scores, threshold, p['compare'])
+    return major_scores, minor_scores, attack_detected
+
+
+def _stacked_weights(model):
+    """(active features, major weights (Q, N_active), minor weights (R, N_active)) of the sparse coefficients"""
+    _, components, q = _model_arrays(model)
+    features, rows, cols, values = sparse_coefficients(model)
+    weights = np.zeros((components.shape[0], len(features)), dtype=np.int64)
+    weights[rows, cols] = values
+    return features, weights[:q], weights[q:]
+
+
+def detect_early_exit(features_fixed, model, profile='golden_reference', frac_bits=None, threshold=None,
+                      decision_only=True, dedup=False):
+    """
+    Attack detection that computes the cheap minor score first
+
+    The minor score needs only the R minor projections; samples already
+    over the minor threshold are attacks whatever their major score, so
+    only the others go through the major projection, reconstruction and
+    SPE stage, reusing the centered features of the first stage. Flags are
+    bit-identical to score_fixed_batch.
+
+    Args:
+        features_fixed, model, profile, frac_bits, threshold, dedup: as for score_fixed_batch
+        decision_only: True for flags only; False returns the exact
+            (major_scores, minor_scores, attack_detected) of score_fixed_batch
+
+    Returns:
+        (attack_detected, early_exit) as uint8 flags and a boolean mask of
+        the samples decided by the minor score alone
+    """
+    if not decision_only:
+        return score_fixed_batch(features_fixed, model, profile, frac_bits, threshold, dedup)
+    if dedup:
+        unique, inverse, _ = unique_rows(np.asarray(features_fixed, dtype=np.int64))
+        attack, early_exit = detect_early_exit(unique, model, profile, frac_bits, threshold)
+        return attack[inverse], early_exit[inverse]
+
+    p = get_profile(profile)
+    if frac_bits is None:
+        frac_bits = model['config']['frac_bits']
+    if threshold is None:
+        threshold = model_thresholds(model, frac_bits)
+    mean_fixed, _, _ = _model_arrays(model)
+    features, major_weights, minor_weights = _stacked_weights(model)
+
+    # Stage 1: centering and the R minor projections
+    features_fixed = np.atleast_2d(np.asarray(features_fixed, dtype=np.int64))
+    centered = features_fixed[:, features] - mean_fixed[features]
+    if p['wrap_centered']:
+        centered = wrap32(centered)
+    minor_proj = _multiply_accumulate(centered, minor_weights, p['projection_shift'], frac_bits, p['wrap_product'])
+    if p['wrap_projection']:
+        minor_proj = wrap32(minor_proj)
+    minor_scores = _sum_of_squares(minor_proj, p['score_shift'], frac_bits, p['wrap_product']).astype(np.int32)
+    minor_threshold = threshold[1] if np.ndim(threshold) else threshold
+    early_exit = comparison_scores(minor_scores, p['compare']) > minor_threshold
+
+    attack_detected = early_exit.astype(np.uint8)
+    remaining = np.flatnonzero(~early_exit)
+    if len(remaining):
+        # Stage 2, remaining samples only: major projection, reconstruction and SPE
+        if len(remaining) < len(centered):
+            centered = centered[remaining]
+        major_proj = _multiply_accumulate(centered, major_weights, p['projection_shift'], frac_bits,
+                                          p['wrap_product'])
+        if p['wrap_projection']:
+            major_proj = wrap32(major_proj)
+        major_recon = _multiply_accumulate(major_proj, major_weights.T, p['reconstruction_shift'], frac_bits,
+                                           p['wrap_product'])
+        if p['wrap_reconstruction']:
+            major_recon = wrap32(major_recon)
+        residual = centered - major_recon
+        if p['wrap_residual']:
+            residual = wrap32(residual)
+        major_scores = _sum_of_squares(residual, p['score_shift'], frac_bits, p['wrap_product']).astype(np.int32)
+        attack_detected[remaining] = compare_threshold(major_scores, minor_scores[remaining], threshold,
+                                                       p['compare'])
+    return attack_detected, early_exit
+
+
+def detect_two_tier(features_fixed, model, profile='golden_reference', frac_bits=None, threshold=None, margin=0.0,
+                    dedup=False):
+    """
+    Attack flags of score_fixed_batch from a float prescreen plus exact rescoring near the boundary
+
+    The prescreen evaluates the fixed-point coefficients in float64 with one
+    GEMM against a fused [I - Vq^T Vq | V^T] projector (residual and all
+    projections at once). The truncation error of every shifted product is
+    bounded per sample, so a sample whose float scores are clear of both
+    thresholds by that bound (plus margin * threshold) and whose
+    intermediates cannot reach the 32-bit range has the same flag as the
+    exact path. All other samples are rescored with detect_early_exit.
+
+    Args:
+        features_fixed, model, profile, frac_bits, threshold: as for score_fixed_batch
+        margin: extra guard band, as a fraction of each threshold
+        dedup: passed on to the exact rescoring
+
+    Returns:
+        (attack_detected, rescored) as uint8 flags and a boolean mask of
+        the samples scored by the exact path
+    """
+    p = get_profile(profile)
+    if frac_bits is None:
+        frac_bits = model['config']['frac_bits']
+    if threshold is None:
+        threshold = model_thresholds(model, frac_bits)
+    major_threshold, minor_threshold = threshold if np.ndim(threshold) else (threshold, threshold)
+    mean_fixed, components, q = _model_arrays(model)
+    features, rows, cols, values = sparse_coefficients(model)
+    n_components = components.shape[0]
+    scale = float(1 << frac_bits)
+    limit = float(2**31 - 1)
+
+    weights = np.zeros((n_components, len(features)), dtype=np.float64)
+    weights[rows, cols] = values
+    abs_weights = np.abs(weights)
+    # Truncation error bounds (in LSB) of projection, reconstruction and score sums
+    per_row = np.bincount(rows, minlength=n_components).astype(np.float64)
+    d_proj = per_row if p['projection_shift'] == 'product' else np.ones(n_components)
+    major = rows < q
+    per_col = np.bincount(cols[major], minlength=len(features)).astype(np.float64)
+    e_recon = per_col if p['reconstruction_shift'] == 'product' else np.ones(len(features))
+    b_residual = d_proj[:q] @ abs_weights[:q] / scale + e_recon
+    f_major = len(features) if p['score_shift'] == 'product' else 1
+    f_minor = n_components - q if p['score_shift'] == 'product' else 1
+
+    features_fixed = np.atleast_2d(np.asarray(features_fixed, dtype=np.int64))
+    centered = features_fixed[:, features] - mean_fixed[features]
+    c = centered.astype(np.float64)
+
+    # One GEMM: residual (N_active columns) and every projection (Q + R columns)
+    gram = np.eye(len(features)) - weights[:q].T @ weights[:q] / (scale * scale)
+    fused = c @ np.hstack([gram, weights.T / scale])
+    residual = fused[:, :len(features)]
+    proj = fused[:, len(features):]
+    abs_residual = np.abs(residual)
+    abs_minor = np.abs(proj[:, q:])
+
+    major_f = np.sum(residual * residual, axis=1) / scale
+    minor_f = np.sum(abs_minor * abs_minor, axis=1) / scale
+    major_bound = (abs_residual @ (2 * b_residual) + np.sum(b_residual * b_residual)) / scale + f_major
+    minor_bound = (abs_minor @ (2 * d_proj[q:]) + np.sum(d_proj[q:] * d_proj[q:])) / scale + f_minor
+    # float64 rounding of the prescreen itself, plus the configured guard band
+    major_bound += 1e-6 * major_f + 1e-3 + margin * major_threshold
+    minor_bound += 1e-6 * minor_f + 1e-3 + margin * minor_threshold
+
+    # Any intermediate that may reach the 32-bit range may wrap in the exact path
+    max_weight = float(abs_weights.max()) if abs_weights.size else 0.0
+    max_centered = np.abs(c).max(axis=1) if c.shape[1] else np.zeros(len(c))
+    max_proj = (np.abs(proj) + d_proj).max(axis=1) if n_components else np.zeros(len(c))
+    may_wrap = ((max_centered >= limit) |
+                (max_centered * max_weight / scale >= limit) |
+                (max_proj >= limit) |
+                (max_proj * max_weight / scale >= limit) |
+                (np.abs(c - residual) + b_residual >= limit).any(axis=1) |
+                (abs_residual + b_residual >= limit).any(axis=1) |
+                (major_f + major_bound >= limit) |
+                (minor_f + minor_bound >= limit))
+
+    attack_certain = (major_f - major_bound > major_threshold) | (minor_f - minor_bound > minor_threshold)
+    normal_certain = (major_f + major_bound <= major_threshold) & (minor_f + minor_bound <= minor_threshold)
+    rescored = may_wrap | ~(attack_certain | normal_certain)
+
+    attack_detected = attack_certain.astype(np.uint8)
+    if rescored.any():
+        attack_detected[rescored], _ = detect_early_exit(features_fixed[rescored], model, profile, frac_bits,
+                                                         threshold, dedup=dedup)
+    return attack_detected, rescored
+
+
+COMBINE_MODES = ('any', 'all', 'majority')
+
+
+def ensemble_layout(models):
+    """
+    Shared coefficient layout of an ensemble of models
+
+    Models with the same fixed-point mean share one centering; their
+    components are stacked in one matrix, grouped by mean, with each model's
+    major then minor rows contiguous. Pruned coefficients of sparse models
+    are zero and their inactive features are masked out of the major score,
+    so every model scores exactly as score_fixed_batch would.
+
+    Returns:
+        dictionary with 'means' (D, K), 'mean_index' (M,) into means,
+        'components' (C, K), 'offsets' (M,) first stacked row of each model,
+        'q' and 'r' (M,), 'active' (M, K) bool, 'thresholds' (2, M) and
+        'frac_bits'
+    """
+    if not models:
+        raise ValueError("An ensemble needs at least one model")
+    frac_bits = models[0]['config']['frac_bits']
+    n_features = models[0]['config']['n_features']
+    for model in models:
+        if model['config']['frac_bits'] != frac_bits or model['config']['n_features'] != n_features:
+            raise ValueError("Ensemble models must share n_features and frac_bits")
+
+    means = []
+    mean_index = []
+    dense = []
+    for model in models:
+        mean, components, q = _model_arrays(model)
+        features, rows, cols, values = sparse_coefficients(model)
+        stacked = np.zeros_like(components)
+        stacked[rows, features[cols]] = values
+        active = np.zeros(n_features, dtype=bool)
+        active[features] = True
+        for d, other in enumerate(means):
+            if np.array_equal(mean, other):
+                break
+        else:
+            d = len(means)
+            means.append(mean)
+        mean_index.append(d)
+        dense.append((stacked, q, active))
+
+    order = np.argsort(mean_index, kind='stable')
+    offsets = np.zeros(len(models), dtype=np.int64)
+    row = 0
+    for j in order:
+        offsets[j] = row
+        row += len(dense[j][0])
+    return {
+        'means': np.array(means, dtype=np.int64),
+        'mean_index': np.array(mean_index, dtype=np.int64),
+        'components': np.vstack([dense[j][0] for j in order]),
+        'offsets': offsets,
+        'q': np.array([q for _, q, _ in dense], dtype=np.int64),
+        'r': np.array([len(c) - q for c, q, _ in dense], dtype=np.int64),
+        'active': np.array([active for _, _, active in dense]),
+        'thresholds': np.array([model_thresholds(model, frac_bits) for model in models], dtype=np.int64).T,
+        'frac_bits': frac_bits,
+    }
+
+
+def votes_needed(n_models, combine='any'):
+    """
+    Attack votes that flag the combined ensemble decision
+    combine: 'any', 'all', 'majority' (more than half) or a minimum vote count
+    """
+    if combine == 'any':
+        return 1
+    if combine == 'all':
+        return n_models
+    if combine == 'majority':
+        return n_models // 2 + 1
+    if isinstance(combine, (int, np.integer)) or str(combine).isdigit():
+        return int(combine)
+    raise ValueError(f"Unknown combine mode '{combine}' (use {', '.join(COMBINE_MODES)} or a vote count)")
+
+
+def combine_votes(attack, combine='any'):
+    """Combined ensemble decision from (n_samples, n_models) attack flags (see votes_needed)"""
+    needed = votes_needed(attack.shape[1], combine)
+    return (attack.astype(np.int64).sum(axis=1) >= needed).astype(np.uint8)
+
+
+def score_ensemble_batch(features_fixed, models, profile='golden_reference', combine='any', layout=None,
+                         dedup=False):
+    """
+    Fixed-point detection with several models in one pass
+
+    Each distinct mean is subtracted once and the projections onto every
+    model's components come from one multiply-accumulate per distinct mean.
+    Each model reconstructs from its own major projections, and the scores
+    of all models come from one sum of squares.
+
+    Args:
+        features_fixed: (n_samples, N_FEATURES) fixed-point feature vectors
+        models: list of PCA model dictionaries (same n_features and frac_bits)
+        profile: name of a PROFILES entry (or a profile dictionary)
+        combine: combined decision (see votes_needed)
+        layout: precomputed ensemble_layout(models)
+        dedup: score each distinct vector once and fan the scores back out
+
+    Returns:
+        (major_scores, minor_scores, attack_detected, combined): per-model
+        (n_samples, n_models) int32/int32/uint8 arrays, each column equal to
+        score_fixed_batch with that model, and the combined uint8 decision
+    """
+    if dedup:
+        unique, inverse, _ = unique_rows(np.asarray(features_fixed, dtype=np.int64))
+        results = score_ensemble_batch(unique, models, profile, combine, layout)
+        return tuple(values[inverse] for values in results)
+
+    p = get_profile(profile)
+    if layout is None:
+        layout = ensemble_layout(models)
+    frac_bits = layout['frac_bits']
+    components = layout['components']
+    n_models = len(layout['q'])
+    features_fixed = np.atleast_2d(np.asarray(features_fixed, dtype=np.int64))
+    n = len(features_fixed)
+
+    # Center once per distinct mean and project onto that mean's stacked components
+    centered = features_fixed[:, np.newaxis, :] - layout['means'][np.newaxis]
+    if p['wrap_centered']:
+        centered = wrap32(centered)
+    # Wrapping each product is redundant when the sum is wrapped to 32 bits anyway
+    # (two's complement addition commutes with the wrap), so it is skipped there
+    proj = np.empty((n, len(components)), dtype=np.int64)
+    for d in range(len(layout['means'])):
+        members = np.flatnonzero(layout['mean_index'] == d)
+        start = layout['offsets'][members].min()
+        stop = max(layout['offsets'][j] + layout['q'][j] + layout['r'][j] for j in members)
+        proj[:, start:stop] = _multiply_accumulate(centered[:, d], components[start:stop], p['projection_shift'],
+                                                   frac_bits, p['wrap_product'] and not p['wrap_projection'])
+    if p['wrap_projection']:
+        proj = wrap32(proj)
+
+    # Reconstruct every model from its own major components
+    wrap_each = p['wrap_product'] and not p['wrap_reconstruction']
+    max_r = int(layout['r'].max())
+    residual = np.empty((n, n_models, components.shape[1]), dtype=np.int64)
+    minor_proj = np.zeros((n, n_models, max_r), dtype=np.int64)
+    for j, (offset, q, r) in enumerate(zip(layout['offsets'], layout['q'], layout['r'])):
+        major_recon = _multiply_accumulate(proj[:, offset:offset + q], components[offset:offset + q].T,
+                                           p['reconstruction_shift'], frac_bits, wrap_each)
+        if p['wrap_reconstruction']:
+            major_recon = wrap32(major_recon)
+        residual[:, j] = centered[:, layout['mean_index'][j]] - major_recon
+        # Minor projections zero-padded to the largest R (zeros add nothing to the score)
+        minor_proj[:, j, :r] = proj[:, offset + q:offset + q + r]
+    if p['wrap_residual']:
+        residual = wrap32(residual)
+    if not layout['active'].all():
+        residual *= layout['active'][np.newaxis]
+
+    k = components.shape[1]
+    # Scores are 32-bit, so their per-product wraps are skipped as well
+    major_scores = _sum_of_squares(residual.reshape(n * n_models, k), p['score_shift'], frac_bits,
+                                   False).astype(np.int32).reshape(n, n_models)
+    minor_scores = _sum_of_squares(minor_proj.reshape(n * n_models, max_r), p['score_shift'], frac_bits,
+                                   False).astype(np.int32).reshape(n, n_models)
+    attack_detected = compare_threshold(major_scores, minor_scores, layout['thresholds'], p['compare'])
+    return major_scores, minor_scores, attack_detected, combine_votes(attack_detected, combine)
+
+
+def comparison_scores(scores, compare='signed'):
+    """32-bit scores as the int64 values the profile's comparison sees"""
+    if compare == 'signed':
+        return scores.astype(np.int64)
+    if compare == 'abs':
+        return np.abs(scores.astype(np.int64))
+    if compare == 'abs_wrap':
+        return np.abs(scores.astype(np.int32)).view(np.uint32).astype(np.int64)
+    raise ValueError(f"Unknown threshold comparison '{compare}'")
+
+
+def compare_threshold(major_scores, minor_scores, threshold, compare='signed'):
+    """
+    Apply the profile's threshold comparison to 32-bit scores, returns uint8 flags
+    threshold is one value for both scores or a (major, minor) pair
+    """
+    major_threshold, minor_threshold = threshold if np.ndim(threshold) else (threshold, threshold)
+    major_cmp = comparison_scores(major_scores, compare)
+    minor_cmp = comparison_scores(minor_scores, compare)
+    return ((major_cmp > major_threshold) | (minor_cmp > minor_threshold)).astype(np.uint8)
+
+
+def score_float_batch(features, model, dedup=False):
+    """
+    Floating point PCA detection over an (n_samples, N_FEATURES) block
+    Returns (major_scores, minor_scores) as float64 arrays
+    """
+    if dedup:
+        unique, inverse, _ = unique_rows(np.asarray(features, dtype=np.float64))
+        major, minor = score_float_batch(unique, model)
+        return major[inverse], minor[inverse]
+
+    mean, components, q = _model_arrays(model, fixed=False)
+
+    centered = np.atleast_2d(np.asarray(features, dtype=np.float64)) - mean
+    proj = centered @ components.T
+    major_proj = proj[:, :q]
+    minor_proj = proj[:, q:]
+    residual = centered - major_proj @ components[:q]
+
+    return np.sum(residual ** 2, axis=1), np.sum(minor_proj ** 2, axis=1)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Coefficient sparsity pruning of the fixed-point PCA model
+Drops the zero coefficients, the features that never leave the model mean
+on the dataset (dead features) and as many of the smallest remaining
+coefficients as an error budget allows. The budget is checked on a
+dataset against the unpruned model: the rate of changed attack decisions
+and the relative score error. The result is stored as the model's
+'sparse' entry, which the sparse scoring kernel
+(pca_scoring.score_sparse_batch) and export_pca_to_verilog.py
+(pca_detector_sparse.sv) both use.
+"""
+
+import numpy as np
+import argparse
+import json
+from pathlib import Path
+
+from pca_scoring import score_fixed_batch, score_sparse_batch, fixed_point_convert_array, unique_rows, _model_arrays
+from model_artifact import load_model, write_model_artifact, artifact_path_for
+from calibrate_threshold import load_labeled_features
+from export_pca_to_verilog import export_to_verilog_params
+from dataset_io import find_dataset
+
+
+SPARSE_VERSION = 1
+
+
+def dead_features(features_fixed, model):
+    """Features whose fixed-point value equals the model mean on every row (centered value always 0)"""
+    mean_fixed, _, _ = _model_arrays(model)
+    return np.flatnonzero(np.all(features_fixed == mean_fixed, axis=0))
+
+
+def make_sparse(components, keep, features):
+    """
+    'sparse' model entry for the kept coefficients of the stacked components
+    keep is a boolean mask over components; coefficients of inactive
+    features are dropped with them
+    """
+    position = np.full(components.shape[1], -1, dtype=np.int64)
+    position[features] = np.arange(len(features))
+    rows, cols = np.nonzero(keep & (components != 0) & (position >= 0))
+    return {
+        'version': SPARSE_VERSION,
+        'features': [int(f) for f in features],
+        'rows': rows.tolist(),
+        'cols': position[cols].tolist(),
+        'values': components[rows, cols].tolist(),
+    }
+
+
+def operation_counts(model, sparse=None):
+    """Multiplications per sample (projection, reconstruction, squares) of the dense or sparse datapath"""
+    _, components, q = _model_arrays(model)
+    n_components, n_features = components.shape
+    if sparse is None:
+        return {'projection': n_components * n_features, 'reconstruction': q * n_features,
+                'squares': n_features + n_components - q}
+    rows = np.asarray(sparse['rows'], dtype=np.int64)
+    return {'projection': len(rows), 'reconstruction': int(np.sum(rows < q)),
+            'squares': len(sparse['features']) + n_components - q}
+
+
+def pruning_error(reference, candidate, counts):
+    """(decision flip rate, relative score error) of candidate scores against reference scores"""
+    total = counts.sum()
+    flips = counts[reference[2] != candidate[2]].sum() / total
+    error = 0.0
+    scale = 0.0
+    for ref, cand in zip(reference[:2], candidate[:2]):
+        error += np.sum(counts * np.abs(cand.astype(np.int64) - ref.astype(np.int64)))
+        scale += np.sum(counts * np.abs(ref.astype(np.int64)))
+    return float(flips), float(error / max(scale, 1.0))
+
+
+def prune(features_fixed, counts, model, profile='pca_detector', max_flip_rate=0.0, max_score_error=0.01,
+          drop_dead=True):
+    """
+    Prune the model's coefficients within the error budget
+
+    The k smallest-magnitude nonzero coefficients are dropped, with the
+    largest k that stays within budget found by binary search. Pruning
+    starts from the dense fixed-point coefficients.
+
+    Returns:
+        (sparse model entry, pruning report dictionary)
+    """
+    dense = {k: v for k, v in model.items() if k != 'sparse'}
+    _, components, _ = _model_arrays(dense)
+    reference = score_fixed_batch(features_fixed, dense, profile)
+
+    dead = dead_features(features_fixed, dense) if drop_dead else np.array([], dtype=np.int64)
+    features = np.setdiff1d(np.arange(components.shape[1]), dead)
+
+    nonzero = components != 0
+    nonzero[:, dead] = False
+    candidates = np.flatnonzero(nonzero)
+    candidates = candidates[np.argsort(np.abs(components.ravel()[candidates]), kind='stable')]
+
+    def attempt(k):
+        keep = np.ones(components.shape, dtype=bool)
+        keep.ravel()[candidates[:k]] = False
+        sparse = make_sparse(components, keep, features)
+        scores = score_sparse_batch(features_fixed, dict(dense, sparse=sparse), profile)
+        return sparse, pruning_error(reference, scores, counts)
+
+    sparse, (flip_rate, score_error) = attempt(0)
+    if flip_rate > max_flip_rate or score_error > max_score_error:
+        raise ValueError(f"Dropping dead features alone exceeds the error budget "
+                         f"(flip rate {flip_rate:.4%}, score error {score_error:.4%})")
+    lo, hi = 0, len(candidates)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        s, (f, e) = attempt(mid)
+        if f <= max_flip_rate and e <= max_score_error:
+            lo, sparse, flip_rate, score_error = mid, s, f, e
+        else:
+            hi = mid - 1
+
+    report = {
+        'profile': profile if isinstance(profile, str) else 'custom',
+        'max_flip_rate': max_flip_rate,
+        'max_score_error': max_score_error,
+        'flip_rate': flip_rate,
+        'score_error': score_error,
+        'dead_features': [int(f) for f in dead],
+        'pruned_nonzero': int(lo),
+        'num_samples': int(counts.sum()),
+        'dense_operations': operation_counts(dense),
+        'sparse_operations': operation_counts(dense, sparse),
+    }
+    sparse['pruning'] = report
+    return sparse, report
+
+
+def apply_sparse(model_json, sparse):
+    """Store the sparse entry in a pca_coeffs.json dictionary and zero the pruned dense coefficients"""
+    n_features = model_json['config']['n_features']
+    q = model_json['config']['n_major_components']
+    kept = np.zeros((q + model_json['config']['n_minor_components'], n_features), dtype=bool)
+    features = np.asarray(sparse['features'], dtype=np.int64)
+    kept[np.asarray(sparse['rows'], dtype=np.int64), features[np.asarray(sparse['cols'], dtype=np.int64)]] = True
+    for name, rows in (('major_components_fixed', kept[:q]), ('minor_components_fixed', kept[q:])):
+        values = np.asarray(model_json[name], dtype=np.int64).reshape(-1, n_features)
+        model_json[name] = np.where(rows, values, 0).tolist()
+    model_json['sparse'] = sparse
+    return model_json
+
+
+def main():
+    base_dir = Path(__file__).parent.parent
+
+    parser = argparse.ArgumentParser(description="Prune the fixed-point PCA coefficients within an error budget")
+    parser.add_argument('--dataset', default=find_dataset(base_dir / "dataset" / "kddcup.data_10_percent.csv"))
+    parser.add_argument('--model', default=str(base_dir / "model" / "pca_coeffs.json"))
+    parser.add_argument('--sv-output', default=str(base_dir / "src" / "pca_coeffs_pkg.sv"))
+    parser.add_argument('--profile', default='pca_detector', help="Scoring profile (see pca_scoring.PROFILES)")
+    parser.add_argument('--max-flip-rate', type=float, default=0.0,
+                        help="Largest allowed fraction of samples whose attack decision changes")
+    parser.add_argument('--max-score-error', type=float, default=0.01,
+                        help="Largest allowed relative score error (sum |delta| / sum |score|)")
+    parser.add_argument('--keep-dead-features', action='store_true')
+    parser.add_argument('--max-samples', type=int, default=None)
+    parser.add_argument('--dry-run', action='store_true', help="Report only, do not update the model or SV package")
+    parser.add_argument('--no-cache', action='store_true')
+    args = parser.parse_args()
+
+    print(f"Loading PCA model from {args.model}...")
+    model = load_model(args.model)
+
+    print(f"Loading dataset from {args.dataset}...")
+    features, _ = load_labeled_features(args.dataset, model, args.max_samples, not args.no_cache)
+    features_fixed = fixed_point_convert_array(features, model['config']['frac_bits'])
+    features_fixed, _, counts = unique_rows(features_fixed.astype(np.int64))
+    print(f"Samples: {int(counts.sum())} ({len(counts)} distinct)")
+
+    print(f"Pruning with profile '{args.profile}' (flip rate <= {args.max_flip_rate}, "
+          f"score error <= {args.max_score_error})...")
+    sparse, report = prune(features_fixed, counts, model, args.profile, args.max_flip_rate, args.max_score_error,
+                           not args.keep_dead_features)
+
+    dense_ops, sparse_ops = report['dense_operations'], report['sparse_operations']
+    print(f"\nDead features: {report['dead_features'] or 'none'}")
+    print(f"Active features: {len(sparse['features'])}, kept coefficients: {len(sparse['values'])}")
+    print(f"Smallest nonzero coefficients pruned: {report['pruned_nonzero']}")
+    print(f"Flip rate {report['flip_rate']:.4%}, score error {report['score_error']:.4%}")
+    for stage in dense_ops:
+        print(f"  {stage}: {dense_ops[stage]} -> {sparse_ops[stage]} multiplications per sample")
+
+    if args.dry_run:
+        return
+
+    model_path = Path(args.model)
+    if model_path.suffix == '.json':
+        with open(model_path, 'r') as f:
+            model_json = json.load(f)
+        apply_sparse(model_json, sparse)
+        with open(model_path, 'w') as f:
+            json.dump(model_json, f, indent=2)
+        artifact_path = artifact_path_for(model_path)
+        write_model_artifact(model_json, artifact_path)
+        print(f"Updated {model_path} and {artifact_path}")
+    else:
+        model_json = {k: v for k, v in model.items() if k not in ('version', 'checksum')}
+        apply_sparse(model_json, sparse)
+        write_model_artifact(model_json, model_path)
+        print(f"Updated {model_path}")
+    export_to_verilog_params(str(model_path), args.sv_output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Persistent cache of golden scoring results
+Results are keyed by (model artifact checksum, semantics profile,
+feature-vector hash), so golden generation scores only the vectors it has
+not seen with the same model and profile and reuses everything else.
+Float reference scores use the profile name 'float' and are keyed by the
+float feature vector; fixed-point results by the fixed-point vector.
+
+Each (model, profile) pair is one .npz file under the cache directory:
+    <cache_dir>/<model checksum[:16]>/<profile>.npz
+holding the sorted 128-bit vector hashes and one array per result column.
+
+Usage:
+    python result_cache.py info [cache_dir]
+    python result_cache.py clear [cache_dir]
+"""
+
+import numpy as np
+import os
+import shutil
+import sys
+from pathlib import Path
+
+from model_artifact import model_checksum
+from pca_scoring import score_fixed_batch, score_float_batch
+
+
+KEY_DTYPE = np.dtype([('hi', '<u8'), ('lo', '<u8')])
+
+# Independent seeds of the two 64-bit hash lanes
+_SEEDS = (np.uint64(0x9E3779B97F4A7C15), np.uint64(0xC2B2AE3D27D4EB4F))
+_MULTIPLIER = np.uint64(0x100000001B3)
+
+
+def default_cache_dir():
+    """Result cache shared by the golden generators"""
+    return Path(__file__).parent.parent / 'model' / 'result_cache'
+
+
+def _mix64(z):
+    """splitmix64 finalizer on a uint64 array"""
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def vector_keys(vectors):
+    """
+    128-bit hash of every row of a 2-D array, as a KEY_DTYPE array
+    Integer rows are hashed as int64 values and float rows by their float64
+    bits, so only bit-identical vectors share a key
+    """
+    vectors = np.atleast_2d(np.asarray(vectors))
+    if np.issubdtype(vectors.dtype, np.floating):
+        words = np.ascontiguousarray(vectors, dtype=np.float64).view(np.uint64)
+    else:
+        words = np.ascontiguousarray(vectors, dtype=np.int64).view(np.uint64)
+    keys = np.empty(len(words), dtype=KEY_DTYPE)
+    with np.errstate(over='ignore'):
+        for lane, seed in zip(('hi', 'lo'), _SEEDS):
+            h = np.full(len(words), seed ^ np.uint64(words.shape[1]), dtype=np.uint64)
+            for j in range(words.shape[1]):
+                h = _mix64(h * _MULTIPLIER + words[:, j] + seed)
+            keys[lane] = h
+    return keys
+
+
+class ResultCache:
+    """Result columns of one (model, profile) pair, looked up by vector hash"""
+
+    def __init__(self, cache_dir, model, profile):
+        if not isinstance(profile, str):
+            raise ValueError("Only named profiles can be cached")
+        self.path = Path(cache_dir) / model_checksum(model)[:16] / f'{profile}.npz'
+        self.keys = np.empty(0, dtype=KEY_DTYPE)
+        self.columns = {}
+        if self.path.exists():
+            with np.load(self.path) as data:
+                self.keys = data['keys'].view(KEY_DTYPE).ravel()
+                self.columns = {name: data[name] for name in data.files if name != 'keys'}
+        self._pending = []
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, keys):
+        """(found mask, {column: values of the found keys})"""
+        if len(self.keys) == 0:
+            self.misses += len(keys)
+            return np.zeros(len(keys), dtype=bool), {}
+        index = np.searchsorted(self.keys, keys)
+        clipped = np.minimum(index, len(self.keys) - 1)
+        found = self.keys[clipped] == keys
+        self.hits += int(found.sum())
+        self.misses += int(len(keys) - found.sum())
+        return found, {name: values[clipped[found]] for name, values in self.columns.items()}
+
+    def add(self, keys, columns):
+        """Queue new entries; they are written by save()"""
+        self._pending.append((keys, columns))
+
+    def save(self):
+        """Merge the queued entries into the cache file (written atomically)"""
+        if not self._pending:
+            return
+        keys = np.concatenate([self.keys] + [k for k, _ in self._pending])
+        names = list(self._pending[0][1])
+        columns = {name: np.concatenate(([self.columns[name]] if name in self.columns else []) +
+                                        [c[name] for _, c in self._pending]) for name in names}
+        keys, first = np.unique(keys, return_index=True)
+        self.keys = keys
+        self.columns = {name: values[first] for name, values in columns.items()}
+        self._pending = []
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp.npz')
+        np.savez(tmp_path, keys=self.keys, **self.columns)
+        os.replace(tmp_path, self.path)
+
+
+def score_fixed_cached(features_fixed, model, profile, cache):
+    """
+    score_fixed_batch through a ResultCache: only vectors missing from the
+    cache are scored (once per distinct vector) and queued for cache.save()
+    """
+    features_fixed = np.atleast_2d(np.asarray(features_fixed, dtype=np.int64))
+    keys = vector_keys(features_fixed)
+    found, hit = cache.lookup(keys)
+    major = np.empty(len(keys), dtype=np.int32)
+    minor = np.empty(len(keys), dtype=np.int32)
+    attack = np.empty(len(keys), dtype=np.uint8)
+    if found.any():
+        major[found], minor[found], attack[found] = hit['major'], hit['minor'], hit['attack']
+    missing = ~found
+    if missing.any():
+        major[missing], minor[missing], attack[missing] = score_fixed_batch(features_fixed[missing], model, profile,
+                                                                            dedup=True)
+        cache.add(keys[missing], {'major': major[missing], 'minor': minor[missing], 'attack': attack[missing]})
+    return major, minor, attack
+
+
+def score_float_cached(features, model, cache):
+    """score_float_batch through a ResultCache (see score_fixed_cached)"""
+    features = np.atleast_2d(np.asarray(features, dtype=np.float64))
+    keys = vector_keys(features)
+    found, hit = cache.lookup(keys)
+    major = np.empty(len(keys), dtype=np.float64)
+    minor = np.empty(len(keys), dtype=np.float64)
+    if found.any():
+        major[found], minor[found] = hit['major'], hit['minor']
+    missing = ~found
+    if missing.any():
+        major[missing], minor[missing] = score_float_batch(features[missing], model, dedup=True)
+        cache.add(keys[missing], {'major': major[missing], 'minor': minor[missing]})
+    return major, minor
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ('info', 'clear'):
+        print("Usage: python result_cache.py info|clear [cache_dir]")
+        return 1
+
+    cache_dir = Path(sys.argv[2]) if len(sys.argv) > 2 else default_cache_dir()
+    if sys.argv[1] == 'clear':
+        if cache_dir.exists():
+            shutil.rmtree(cache_dir)
+        print(f"✓ Cleared {cache_dir}")
+        return 0
+
+    if not cache_dir.exists():
+        print(f"No result cache at {cache_dir}")
+        return 0
+    for path in sorted(cache_dir.glob('*/*.npz')):
+        with np.load(path) as data:
+            print(f"  model {path.parent.name}  profile {path.stem:20s} {len(data['keys'])} entries "
+                  f"({path.stat().st_size / 1e6:.1f} MB)")
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Seeded random sampling of dataset rows
+Training and test selection draw their rows from the whole file instead of
+its first N lines (KDD Cup files are clustered by attack type).
+
+    sample_rows   - indices into rows that are already indexed (dataset
+                    caches, loaded arrays)
+    sample_by_label - sample_rows over the label of every row, with label
+                    filters and per-label quotas; loaders that read the rows
+                    from a cache, a label index or the CSV itself draw the
+                    same rows for the same seed through it
+    sample_lines  - one streaming pass over a CSV file with a reservoir per
+                    label, so multi-GB files are never loaded
+
+Both can stratify by label:
+    'proportional' - every label keeps its share of the rows (largest remainder)
+    'balanced'     - labels get equal quotas, capped by their row counts
+"""
+
+import numpy as np
+import csv
+import io
+
+from dataset_io import iter_range_blocks, read_header
+from dataset_cache import detect_kind, KIND_KDD
+
+
+ALLOCATIONS = ('proportional', 'balanced')
+
+
+def stratum_quotas(counts, n_samples, allocation='proportional'):
+    """Rows to draw from each stratum, given its row count (sums to min(n_samples, total))"""
+    counts = np.asarray(counts, dtype=np.int64)
+    n_samples = min(int(n_samples), int(counts.sum()))
+    if allocation == 'proportional':
+        exact = counts * n_samples / max(counts.sum(), 1)
+        quotas = np.floor(exact).astype(np.int64)
+        # Largest remainders get the leftover rows
+        order = np.argsort(-(exact - quotas), kind='stable')
+        quotas[order[:n_samples - quotas.sum()]] += 1
+        return quotas
+    if allocation == 'balanced':
+        quotas = np.zeros(len(counts), dtype=np.int64)
+        remaining = n_samples
+        # Fill the smallest strata first and share what they leave among the rest
+        for k, stratum in enumerate(np.argsort(counts, kind='stable')):
+            quotas[stratum] = min(counts[stratum], remaining // (len(counts) - k))
+            remaining -= quotas[stratum]
+        return quotas
+    raise ValueError(f"Unknown allocation '{allocation}' (available: {', '.join(ALLOCATIONS)})")
+
+
+def sample_rows(n_rows, n_samples, seed=0, labels=None, allocation='proportional'):
+    """
+    Sorted indices of a uniform random sample of n_samples rows out of n_rows
+    n_rows may also be an array of candidate row indices. With labels (one
+    per candidate), the sample is stratified by label.
+    """
+    rng = np.random.default_rng(seed)
+    rows = np.arange(n_rows) if np.ndim(n_rows) == 0 else np.asarray(n_rows, dtype=np.int64)
+    if n_samples is None or n_samples >= len(rows):
+        return rows
+    if labels is None:
+        return np.sort(rng.choice(rows, n_samples, replace=False))
+    _, strata = np.unique(np.asarray(labels), return_inverse=True)
+    strata = strata.ravel()
+    quotas = stratum_quotas(np.bincount(strata), n_samples, allocation)
+    picked = [rng.choice(rows[strata == s], quota, replace=False) for s, quota in enumerate(quotas) if quota > 0]
+    return np.sort(np.concatenate(picked))
+
+
+def sample_by_label(labels, n_samples, seed=0, keep_labels=None, per_label=None):
+    """
+    Sorted row ordinals of a seeded sample, given the label of every row in file order
+
+    Args:
+        labels: label of every row (normalized by the caller)
+        n_samples: rows to draw, stratified proportionally by label
+        keep_labels: only rows with one of these labels are drawn (unstratified)
+        per_label: draw up to this many rows of every label instead (label k
+            of the sorted labels with seed + k)
+    """
+    labels = np.asarray(labels).astype(str)
+    rows = np.arange(len(labels))
+    if keep_labels is not None:
+        rows = rows[np.isin(labels, list(keep_labels))]
+    if per_label:
+        picked = [sample_rows(rows[labels[rows] == label], per_label, seed + k)
+                  for k, label in enumerate(np.unique(labels[rows]))]
+        return np.sort(np.concatenate(picked)) if picked else rows
+    return sample_rows(rows, n_samples, seed, labels=None if keep_labels is not None else labels[rows])
+
+
+class _Reservoir:
+    """Uniform sample of up to capacity items from a stream (algorithm R, vectorized per block)"""
+
+    def __init__(self, capacity, rng):
+        self.capacity = capacity
+        self.rng = rng
+        self.seen = 0
+        self.items = []
+        self.positions = []
+
+    def add(self, items, positions):
+        """Offer a block of items with their stream positions"""
+        fill = min(self.capacity - len(self.items), len(items))
+        self.items.extend(items[:fill])
+        self.positions.extend(positions[:fill])
+        rest = len(items) - fill
+        if rest > 0:
+            # Item number i (0-based) replaces a random slot with probability capacity / (i + 1)
+            slots = self.rng.integers(0, self.seen + fill + np.arange(1, rest + 1))
+            accepted = np.flatnonzero(slots < self.capacity)
+            # A slot hit twice in one block keeps the later item
+            _, last = np.unique(slots[accepted][::-1], return_index=True)
+            for k in accepted[::-1][last]:
+                self.items[slots[k]] = items[fill + k]
+                self.positions[slots[k]] = positions[fill + k]
+        self.seen += len(items)
+
+
+def _line_label(line, label_field):
+    return line.rsplit(b',', 1)[-1].strip() if label_field == -1 else line.split(b',')[label_field].strip()
+
+
+def sample_lines(dataset_path, n_samples, seed=0, stratify=False, label_field=-1, keep_labels=None,
+                 allocation='proportional', block_bytes=64 << 20):
+    """
+    Uniform random sample of a CSV file's data lines in one streaming pass
+
+    Args:
+        dataset_path: CSV file (a header line, if any, is skipped)
+        n_samples: lines to draw
+        seed: random seed (same seed and file, same sample)
+        stratify: keep one reservoir per label and allocate n_samples across labels
+        label_field: index of the label field (default: last)
+        keep_labels: only lines with one of these labels (e.g. {'normal.'}) are sampled
+        allocation: 'proportional' or 'balanced' (see stratum_quotas)
+
+    Returns:
+        sampled lines (decoded, newline-terminated) in file order
+    """
+    rng = np.random.default_rng(seed)
+    start = 0 if detect_kind(dataset_path) == KIND_KDD else read_header(dataset_path)[1]
+    keep = None if keep_labels is None else {label.encode() for label in keep_labels}
+
+    reservoirs = {}
+    position = 0
+    for block in iter_range_blocks(dataset_path, start, None, block_bytes):
+        lines = [line for line in block.split(b'\n') if line.strip()]
+        positions = range(position, position + len(lines))
+        position += len(lines)
+        if not stratify and keep is None:
+            reservoirs.setdefault(None, _Reservoir(n_samples, rng)).add(lines, positions)
+            continue
+        groups = {}
+        for line, pos in zip(lines, positions):
+            label = _line_label(line, label_field)
+            if keep is not None and label not in keep:
+                continue
+            group = groups.setdefault(label if stratify else None, ([], []))
+            group[0].append(line)
+            group[1].append(pos)
+        for label, (group_lines, group_positions) in groups.items():
+            reservoirs.setdefault(label, _Reservoir(n_samples, rng)).add(group_lines, group_positions)
+
+    labels = sorted(reservoirs, key=lambda label: (label is not None, label))
+    quotas = stratum_quotas([reservoirs[label].seen for label in labels], n_samples, allocation)
+    picked = []
+    for label, quota in zip(labels, quotas):
+        reservoir = reservoirs[label]
+        # A uniform subsample of a uniform reservoir is a uniform sample of the stratum
+        for k in rng.choice(len(reservoir.items), quota, replace=False):
+            picked.append((reservoir.positions[k], reservoir.items[k]))
+    picked.sort()
+    return [line.decode() + '\n' for _, line in picked]
+
+
+def read_sampled_rows(dataset_path, n_samples, seed=0, **kwargs):
+    """sample_lines parsed into CSV rows (lists of strings)"""
+    return [row for row in csv.reader(io.StringIO(''.join(sample_lines(dataset_path, n_samples, seed, **kwargs))))
+            if row]
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Cross-validated sweep over n_major / n_minor / frac_bits
+Sufficient statistics are accumulated once per fold; the training
+statistics of each split are merged from the other folds and decomposed
+once, and every (Q, R) model is sliced from that eigendecomposition.
+Fixed-point detection quality of every (fold, Q, R, frac_bits) model is
+evaluated in a process pool: thresholds are calibrated on the training
+folds and applied to the held-out fold, and the configurations are ranked
+by their mean held-out detection rate at the target false-positive rate.
+"""
+
+import numpy as np
+import pandas as pd
+import argparse
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from train_pca_streaming import (chunk_stats, merge_stats, empty_stats, pca_from_stats, build_model,
+                                 select_feature_columns, cache_block)
+from dataset_cache import open_cache
+from pca_scoring import score_fixed_batch, fixed_point_convert_array, comparison_scores, get_profile
+from calibrate_threshold import best_threshold_pair, score_curve
+from dataset_io import find_dataset
+
+
+def _parse_list(text):
+    return [int(v) for v in text.split(',') if v.strip()]
+
+
+def load_training_data(data_path, feature_columns, max_samples=None, label_column='class'):
+    """
+    (X, y) of the training CSV, read from its typed cache when possible
+    NaN becomes 0 and y is 1 for every label that does not contain 'normal'
+    """
+    cache = open_cache(data_path)
+    if cache is not None and all(cache.column_kinds.get(name) == 'numeric' for name in feature_columns):
+        return cache_block(cache, feature_columns, 0, max_samples, label_column)
+    df = pd.read_csv(data_path, nrows=max_samples)
+    X = df[feature_columns].apply(pd.to_numeric, errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+    if label_column in df.columns:
+        y = (~df[label_column].astype(str).str.lower().str.contains('normal')).to_numpy(dtype=np.int64)
+    else:
+        y = np.zeros(len(df), dtype=np.int64)
+    return X, y
+
+
+def assign_folds(n_samples, n_folds, seed=0):
+    """Fold index of every sample (shuffled, as even as possible)"""
+    folds = np.arange(n_samples) % n_folds
+    np.random.default_rng(seed).shuffle(folds)
+    return folds.astype(np.int8)
+
+
+# Worker state, set once per process by _init_worker
+_DATA = {}
+
+
+def _init_worker(data_path, feature_columns, max_samples, folds):
+    X, y = load_training_data(data_path, feature_columns, max_samples)
+    _DATA.update({'X': X, 'y': y, 'folds': folds})
+
+
+def _fold_scores(X, model, frac_bits, profile):
+    """(major, minor, overflow rate) of X as the profile's comparison sees the scores"""
+    compare = get_profile(profile)['compare']
+    major, minor, _ = score_fixed_batch(fixed_point_convert_array(X, frac_bits), model, profile, dedup=True)
+    # Scores are sums of squares, a negative 32-bit score means the datapath wrapped
+    overflow = float(np.mean((major < 0) | (minor < 0))) if len(major) else 0.0
+    return comparison_scores(major, compare), comparison_scores(minor, compare), overflow
+
+
+def _evaluate(task):
+    """Worker: calibrate one fixed-point model on the training folds and score the held-out fold"""
+    fold, n_major, n_minor, frac_bits, mean, components, variance_ratio, feature_max, profile, target_fpr = task
+    held_out = _DATA['folds'] == fold
+    model = build_model(mean, components[:n_major + n_minor], variance_ratio[:n_major + n_minor], feature_max,
+                        n_major, n_minor, frac_bits)
+
+    # Thresholds come from the folds the model was trained on, never from the fold they are judged on
+    train_major, train_minor, _ = _fold_scores(_DATA['X'][~held_out], model, frac_bits, profile)
+    tm, tn, _ = best_threshold_pair(train_major, train_minor, _DATA['y'][~held_out], target_fpr)
+
+    y = _DATA['y'][held_out]
+    major, minor, overflow = _fold_scores(_DATA['X'][held_out], model, frac_bits, profile)
+    attack = (major > tm) | (minor > tn)
+    n_attack = max(int(y.sum()), 1)
+    n_normal = max(len(y) - int(y.sum()), 1)
+    return {
+        'fold': fold,
+        'n_major': n_major,
+        'n_minor': n_minor,
+        'frac_bits': frac_bits,
+        'tpr': float(np.sum(attack & (y == 1)) / n_attack),
+        'fpr': float(np.sum(attack & (y == 0)) / n_normal),
+        'auc_major': score_curve(major, y)['auc'],
+        'auc_minor': score_curve(minor, y)['auc'],
+        'overflow': overflow,
+        'explained_variance': float(np.sum(variance_ratio[:n_major + n_minor])),
+    }
+
+
+def fold_stats(X, y, folds, n_folds, block_rows=1 << 18):
+    """Sufficient statistics of every fold"""
+    stats = []
+    for k in range(n_folds):
+        rows = np.flatnonzero(folds == k)
+        s = empty_stats(X.shape[1])
+        for start in range(0, len(rows), block_rows):
+            block = rows[start:start + block_rows]
+            s = merge_stats(s, chunk_stats(X[block], y[block]))
+        stats.append(s)
+    return stats
+
+
+def rank_results(results):
+    """
+    Average the per-fold results of every configuration and rank them
+    Higher mean TPR at the target FPR first, then higher mean AUC, then the
+    smaller model (fewer components, fewer fractional bits)
+    """
+    groups = {}
+    for r in results:
+        groups.setdefault((r['n_major'], r['n_minor'], r['frac_bits']), []).append(r)
+    table = []
+    for (n_major, n_minor, frac_bits), rows in groups.items():
+        tpr = np.array([r['tpr'] for r in rows])
+        table.append({
+            'n_major': n_major,
+            'n_minor': n_minor,
+            'frac_bits': frac_bits,
+            'tpr_mean': float(tpr.mean()),
+            'tpr_std': float(tpr.std()),
+            'fpr_mean': float(np.mean([r['fpr'] for r in rows])),
+            'auc_major': float(np.mean([r['auc_major'] for r in rows])),
+            'auc_minor': float(np.mean([r['auc_minor'] for r in rows])),
+            'overflow': float(np.mean([r['overflow'] for r in rows])),
+            'explained_variance': float(np.mean([r['explained_variance'] for r in rows])),
+            'folds': len(rows),
+        })
+    table.sort(key=lambda t: (-t['tpr_mean'], -max(t['auc_major'], t['auc_minor']),
+                              t['n_major'] + t['n_minor'], t['frac_bits']))
+    for rank, t in enumerate(table, start=1):
+        t['rank'] = rank
+    return table
+
+
+def sweep(data_path, n_major_values, n_minor_values, frac_bits_values, n_folds=5, profile='pca_detector',
+          target_fpr=0.01, max_samples=None, workers=None, seed=0):
+    """Run the sweep and return the ranked table"""
+    workers = workers or os.cpu_count() or 1
+    feature_columns = select_feature_columns(data_path)
+    X, y = load_training_data(data_path, feature_columns, max_samples)
+    folds = assign_folds(len(X), n_folds, seed)
+    print(f"Samples: {len(X)}, features: {len(feature_columns)}, folds: {n_folds}")
+
+    print("Accumulating per-fold statistics...")
+    stats = fold_stats(X, y, folds, n_folds)
+    n_components = max(n_major_values) + max(n_minor_values)
+
+    tasks = []
+    for k in range(n_folds):
+        # Training statistics of split k: every fold but k
+        train = empty_stats(len(feature_columns))
+        for j in range(n_folds):
+            if j != k:
+                train = merge_stats(train, stats[j])
+        mean, components, variance_ratio = pca_from_stats(train, n_components=n_components)
+        for n_major in n_major_values:
+            for n_minor in n_minor_values:
+                for frac_bits in frac_bits_values:
+                    tasks.append((k, n_major, n_minor, frac_bits, mean, components, variance_ratio,
+                                  train['max_abs'], profile, target_fpr))
+    del X, y
+
+    print(f"Evaluating {len(tasks)} fold/model combinations with {workers} workers...")
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(str(data_path), feature_columns, max_samples, folds)) as pool:
+        for k, result in enumerate(pool.map(_evaluate, tasks, chunksize=max(len(tasks) // (workers * 4), 1))):
+            results.append(result)
+            if (k + 1) % max(len(tasks) // 10, 1) == 0:
+                print(f"  {k + 1}/{len(tasks)}")
+    return rank_results(results)
+
+
+def save_table(table, path):
+    columns = ['rank', 'n_major', 'n_minor', 'frac_bits', 'tpr_mean', 'tpr_std', 'fpr_mean',
+               'auc_major', 'auc_minor', 'overflow', 'explained_variance', 'folds']
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        for row in table:
+            writer.writerow({name: row[name] for name in columns})
+
+
+def print_table(table, top=20):
+    print(f"\n{'Rank':>4}  {'Q':>2} {'R':>2} {'Frac':>4}  {'TPR':>14}  {'FPR':>7}  "
+          f"{'AUC maj':>7} {'AUC min':>7}  {'Ovf':>6}  {'ExpVar':>6}")
+    for t in table[:top]:
+        print(f"{t['rank']:>4}  {t['n_major']:>2} {t['n_minor']:>2} {t['frac_bits']:>4}  "
+              f"{t['tpr_mean']:.4f}±{t['tpr_std']:.4f}  {t['fpr_mean']:.4f}  "
+              f"{t['auc_major']:.4f} {t['auc_minor']:.4f}  {t['overflow']:6.2%}  {t['explained_variance']:.4f}")
+
+
+def main():
+    base_dir = Path(__file__).parent.parent
+
+    parser = argparse.ArgumentParser(description="Cross-validated sweep over n_major, n_minor and frac_bits")
+    parser.add_argument('--data', default=find_dataset(base_dir / "dataset" / "data_after_smote.csv"))
+    parser.add_argument('--output', default=str(base_dir / "model" / "pca_sweep.csv"))
+    parser.add_argument('--n-major', default='2,3,4,5,6', help="Comma-separated values")
+    parser.add_argument('--n-minor', default='1,2,3')
+    parser.add_argument('--frac-bits', default='6,8,10,12')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--profile', default='pca_detector', help="Scoring profile (see pca_scoring.PROFILES)")
+    parser.add_argument('--target-fpr', type=float, default=0.01)
+    parser.add_argument('--max-samples', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    table = sweep(args.data, _parse_list(args.n_major), _parse_list(args.n_minor), _parse_list(args.frac_bits),
+                  args.folds, args.profile, args.target_fpr, args.max_samples, args.workers, args.seed)
+    print_table(table)
+    save_table(table, args.output)
+    print(f"\nRanked table saved to {args.output}")
+
+    best = table[0]
+    print(f"Best: python scripts/train_pca_streaming.py --n-major {best['n_major']} "
+          f"--n-minor {best['n_minor']} --frac-bits {best['frac_bits']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,36 +6,28 @@ Generates PCA coefficients for hardware implementation
 
 import numpy as np
 import pandas as pd
+import io
 import json
 from pathlib import Path
 from sklearn.decomposition import PCA
 from sklearn.preprocessing import StandardScaler
 
+from model_artifact import write_model_artifact, artifact_path_for
+from kdd_encoding import default_encoding
+from dataset_io import find_dataset
+from dataset_cache import KDD_COLUMNS, KIND_KDD, open_cache
+from sampling import sample_by_label
+from label_index import labeled_rows, read_lines_at
+from fixed_point import to_fixed
 
-def load_kdd_data(csv_path, max_samples=10000):
-    """Load and preprocess KDD Cup dataset"""
+
+def load_kdd_data(csv_path, max_samples=10000, use_cache=True, seed=0):
+    """
+    Load and preprocess a label-stratified random sample of the KDD Cup dataset
+    (from its typed cache when available, otherwise in one streaming pass)
+    """
     print(f"Loading dataset from {csv_path}...")
     
-    # KDD Cup column names
-    columns = [
-        'duration', 'protocol_type', 'service', 'flag',
-        'src_bytes', 'dst_bytes', 'land', 'wrong_fragment', 'urgent',
-        'hot', 'num_failed_logins', 'logged_in', 'num_compromised',
-        'root_shell', 'su_attempted', 'num_root', 'num_file_creations',
-        'num_shells', 'num_access_files', 'num_outbound_cmds',
-        'is_host_login', 'is_guest_login', 'count', 'srv_count',
-        'serror_rate', 'srv_serror_rate', 'rerror_rate', 'srv_rerror_rate',
-        'same_srv_rate', 'diff_srv_rate', 'srv_diff_host_rate',
-        'dst_host_count', 'dst_host_srv_count', 'dst_host_same_srv_rate',
-        'dst_host_diff_srv_rate', 'dst_host_same_src_port_rate',
-        'dst_host_srv_diff_host_rate', 'dst_host_serror_rate',
-        'dst_host_srv_serror_rate', 'dst_host_rerror_rate',
-        'dst_host_srv_rerror_rate', 'label'
-    ]
-    
-    # Read CSV
-    df = pd.read_csv(csv_path, names=columns, nrows=max_samples)
-    
     # Select 28 numeric features (matching hardware)
     numeric_features = [
         'duration', 'src_bytes', 'dst_bytes', 'land', 'wrong_fragment',
@@ -47,9 +39,23 @@ def load_kdd_data(csv_path, max_samples=10000):
         'same_srv_rate', 'diff_srv_rate', 'srv_diff_host_rate'
     ]
     
-    # Extract features and labels
-    X = df[numeric_features].values
-    y = df['label'].apply(lambda x: 0 if x.strip() == 'normal.' else 1).values
+    cache = open_cache(csv_path, build=False) if use_cache else None
+    if cache is not None and cache.kind == KIND_KDD:
+        labels = np.array([label.strip() for label in cache.vocabularies['label']], dtype=object)
+        rows = sample_by_label(labels[cache.columns['label']], max_samples, seed)
+        X = np.column_stack([cache.columns[name][rows].astype(np.float64) for name in numeric_features])
+        normal = [code for code, label in enumerate(cache.vocabularies['label']) if label.strip() == 'normal.']
+        y = (~np.isin(cache.columns['label'][rows], normal)).astype(np.int64)
+    else:
+        # Same rows as from the cache: sample by label, then seek to the sampled lines
+        offsets, labels = labeled_rows(csv_path, build=use_cache)
+        rows = sample_by_label([label.strip() for label in labels], max_samples, seed)
+        lines = read_lines_at(csv_path, offsets[rows])
+        df = pd.read_csv(io.StringIO(''.join(lines)), names=KDD_COLUMNS)
+        
+        # Extract features and labels
+        X = df[numeric_features].values
+        y = df['label'].apply(lambda x: 0 if x.strip() == 'normal.' else 1).values
     
     print(f"Loaded {len(X)} samples with {X.shape[1]} features")
     print(f"Normal: {np.sum(y==0)}, Attack: {np.sum(y==1)}")
@@ -77,11 +83,6 @@ def train_pca_model(X, n_major=4, n_minor=2):
     return scaler, pca
 
 
-def fixed_point_convert(value, frac_bits=8):
-    """Convert floating point to fixed-point integer"""
-    return int(round(value * (1 << frac_bits)))
-
-
 def export_pca_model(scaler, pca, output_path, n_major=4, n_minor=2, frac_bits=8, total_bits=32):
     """Export PCA model to JSON for hardware"""
     print(f"\nExporting PCA model to {output_path}...")
@@ -90,7 +91,7 @@ def export_pca_model(scaler, pca, output_path, n_major=4, n_minor=2, frac_bits=8
     
     # Convert mean to fixed-point
     mean_float = scaler.mean_.tolist()
-    mean_fixed = [fixed_point_convert(m, frac_bits) for m in mean_float]
+    mean_fixed = to_fixed(mean_float, frac_bits, total_bits, overflow='saturate').tolist()
     
     # Convert PCA components to fixed-point
     # Note: components are already in scaled space, multiply by scaler.scale_
@@ -98,7 +99,7 @@ def export_pca_model(scaler, pca, output_path, n_major=4, n_minor=2, frac_bits=8
     major_components_fixed = []
     for i in range(n_major):
         comp_float = (pca.components_[i] / scaler.scale_).tolist()
-        comp_fixed = [fixed_point_convert(c, frac_bits) for c in comp_float]
+        comp_fixed = to_fixed(comp_float, frac_bits, total_bits, overflow='saturate').tolist()
         major_components_float.append(comp_float)
         major_components_fixed.append(comp_fixed)
     
@@ -106,7 +107,7 @@ def export_pca_model(scaler, pca, output_path, n_major=4, n_minor=2, frac_bits=8
     minor_components_fixed = []
     for i in range(n_major, n_major + n_minor):
         comp_float = (pca.components_[i] / scaler.scale_).tolist()
-        comp_fixed = [fixed_point_convert(c, frac_bits) for c in comp_float]
+        comp_fixed = to_fixed(comp_float, frac_bits, total_bits, overflow='saturate').tolist()
         minor_components_float.append(comp_float)
         minor_components_fixed.append(comp_fixed)
     
@@ -126,12 +127,14 @@ def export_pca_model(scaler, pca, output_path, n_major=4, n_minor=2, frac_bits=8
         'minor_components': minor_components_float,
         'minor_components_fixed': minor_components_fixed,
         'explained_variance_ratio': pca.explained_variance_ratio_.tolist(),
-        'scale': scaler.scale_.tolist()
+        'scale': scaler.scale_.tolist(),
+        'encoding': default_encoding()
     }
     
     # Save to JSON
     with open(output_path, 'w') as f:
         json.dump(model, f, indent=2)
+    write_model_artifact(model, artifact_path_for(output_path))
     
     print(f"Model exported successfully!")
     print(f"  Features: {n_features}")
@@ -143,7 +146,7 @@ def export_pca_model(scaler, pca, output_path, n_major=4, n_minor=2, frac_bits=8
 def main():
     # Paths
     base_dir = Path(__file__).parent.parent
-    dataset_path = base_dir / "dataset" / "kddcup.data_10_percent.csv"
+    dataset_path = find_dataset(base_dir / "dataset" / "kddcup.data_10_percent.csv")
     output_path = base_dir / "model" / "pca_coeffs.json"
     
     # Load data (use smaller sample for faster training)
@@ -9,6 +9,13 @@ import pandas as pd
 import json
 from pathlib import Path
 
+from model_artifact import write_model_artifact, artifact_path_for
+from kdd_encoding import default_encoding
+from dataset_io import find_dataset
+from dataset_cache import open_cache
+from sampling import sample_rows
+from fixed_point import to_fixed
+
 
 def compute_pca_manual(X, n_components=6):
     """Compute PCA manually using SVD"""
@@ -32,31 +39,38 @@ def compute_pca_manual(X, n_components=6):
     return mean, components, explained_variance_ratio
 
 
-def fixed_point_convert(value, frac_bits=8):
-    """Convert floating point to fixed-point integer"""
-    return int(round(value * (1 << frac_bits)))
-
-
 def main():
     base_dir = Path(__file__).parent.parent
-    data_path = base_dir / "dataset" / "data_after_smote.csv"
+    data_path = find_dataset(base_dir / "dataset" / "data_after_smote.csv")
     output_path = base_dir / "model" / "pca_coeffs.json"
     
     print(f"Loading data from {data_path}...")
-    df = pd.read_csv(data_path)
-    
-    print(f"NaN values: {df.isnull().sum().sum()}")
-    
-    # Fill NaN with 0
-    df = df.fillna(0)
-    
-    # Remove class column and select only numeric columns
-    if 'class' in df.columns:
-        y = df['class'].apply(lambda x: 0 if 'normal' in str(x).lower() else 1).values
-        X = df.drop('class', axis=1).select_dtypes(include=[np.number]).values
+    cache = open_cache(data_path)
+    if cache is not None:
+        # Typed cache: numeric columns are already parsed, labels are codes
+        X = cache.numeric(cache.numeric_columns())
+        print(f"NaN values: {int(np.isnan(X).sum()) + sum(int(np.sum(cache.columns[name] < 0)) for name in cache.vocabularies)}")
+        X = np.nan_to_num(X, nan=0.0)
+        if 'class' in cache.columns:
+            is_normal = np.array(['normal' in label.lower() for label in cache.vocabularies['class']] + [False])
+            y = np.where(is_normal[cache.columns['class']], 0, 1)
+        else:
+            y = np.zeros(len(X))
     else:
-        y = np.zeros(len(df))
-        X = df.select_dtypes(include=[np.number]).values
+        df = pd.read_csv(data_path)
+        
+        print(f"NaN values: {df.isnull().sum().sum()}")
+        
+        # Fill NaN with 0
+        df = df.fillna(0)
+        
+        # Remove class column and select only numeric columns
+        if 'class' in df.columns:
+            y = df['class'].apply(lambda x: 0 if 'normal' in str(x).lower() else 1).values
+            X = df.drop('class', axis=1).select_dtypes(include=[np.number]).values
+        else:
+            y = np.zeros(len(df))
+            X = df.select_dtypes(include=[np.number]).values
     
     # Limit to 28 features to match hardware
     if X.shape[1] > 28:
@@ -68,9 +82,9 @@ def main():
     print(f"Samples: {X.shape[0]}")
     print(f"Normal: {np.sum(y==0)}, Attack: {np.sum(y==1)}")
     
-    # Use subset for faster computation
+    # Use a label-stratified random subset for faster computation
     max_samples = min(10000, X.shape[0])
-    X_subset = X[:max_samples]
+    X_subset = X[sample_rows(len(X), max_samples, seed=0, labels=y)]
     
     print(f"\nUsing {max_samples} samples for PCA training...")
     
@@ -101,15 +115,13 @@ def main():
     components_scaled = components * scale[:, np.newaxis].T
     
     # Convert to fixed-point
-    mean_fixed = [fixed_point_convert(m, frac_bits) for m in mean_scaled]
+    mean_fixed = to_fixed(mean_scaled, frac_bits, total_bits, overflow='saturate').tolist()
     
     major_components_float = components_scaled[:n_major].tolist()
-    major_components_fixed = [[fixed_point_convert(c, frac_bits) for c in comp] 
-                              for comp in components_scaled[:n_major]]
+    major_components_fixed = to_fixed(components_scaled[:n_major], frac_bits, total_bits, overflow='saturate').tolist()
     
     minor_components_float = components_scaled[n_major:].tolist()
-    minor_components_fixed = [[fixed_point_convert(c, frac_bits) for c in comp] 
-                              for comp in components_scaled[n_major:]]
+    minor_components_fixed = to_fixed(components_scaled[n_major:], frac_bits, total_bits, overflow='saturate').tolist()
     
     # Create model dictionary
     model = {
@@ -127,7 +139,8 @@ def main():
         'minor_components': minor_components_float,
         'minor_components_fixed': minor_components_fixed,
         'explained_variance_ratio': variance_ratio.tolist(),
-        'scale': scale.tolist()
+        'scale': scale.tolist(),
+        'encoding': default_encoding()
     }
     
     # Save to JSON
@@ -135,6 +148,10 @@ def main():
     with open(output_path, 'w') as f:
         json.dump(model, f, indent=2)
     
+    artifact_path = artifact_path_for(output_path)
+    checksum = write_model_artifact(model, artifact_path)
+    print(f"Compiled model artifact: {artifact_path} (sha256 {checksum[:16]}...)")
+    
     print(f"\n{'='*50}")
     print("PCA model trained successfully!")
     print(f"  Features: {n_features}")
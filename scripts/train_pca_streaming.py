@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Out-of-core PCA training over the entire SMOTE dataset
+Reads data_after_smote.csv in line-aligned byte-range shards, reduces each
+shard to mergeable sufficient statistics in a process pool and finishes
+with one eigendecomposition of the 28x28 covariance. Memory is bounded by
+the block size and run time scales with the number of cores. The benign
+rows are also reduced on their own in the same pass; update_pca_online.py
+folds new benign traffic into those statistics, not into the full ones.
+"""
+
+import numpy as np
+import pandas as pd
+import argparse
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from dataset_io import compute_shard_ranges, iter_range_blocks, read_header, find_dataset
+from dataset_cache import DatasetCache, open_cache
+from model_artifact import write_model_artifact, artifact_path_for
+from kdd_encoding import default_encoding
+from pca_scoring import unique_rows
+from fixed_point import to_fixed
+
+
+N_FEATURES = 28
+
+
+def empty_stats(n_features=N_FEATURES):
+    """
+    Sufficient statistics of an empty sample set
+    count, sum, scatter (co-moment about the running mean, sum of
+    (x - mean)(x - mean)^T), per-column max |x| and label counts
+    """
+    return {
+        'count': 0.0,
+        'sum': np.zeros(n_features),
+        'scatter': np.zeros((n_features, n_features)),
+        'max_abs': np.zeros(n_features),
+        'n_normal': 0,
+        'n_attack': 0,
+    }
+
+
+def chunk_stats(X, y=None, weights=None):
+    """
+    Sufficient statistics of one (n_samples, n_features) block
+    weights gives each row a multiplicity (see dedup_block)
+    """
+    stats = empty_stats(X.shape[1])
+    if len(X) == 0:
+        return stats
+    weights = np.ones(len(X)) if weights is None else np.asarray(weights, dtype=np.float64)
+    count = weights.sum()
+    total = weights @ X
+    centered = X - total / count
+    stats['count'] = float(count)
+    stats['sum'] = total
+    stats['scatter'] = (centered * weights[:, np.newaxis]).T @ centered
+    stats['max_abs'] = np.abs(X).max(axis=0)
+    if y is not None:
+        stats['n_attack'] = int(weights @ y)
+        stats['n_normal'] = int(count - stats['n_attack'])
+    return stats
+
+
+def dedup_block(X, y):
+    """
+    Collapse repeated (features, label) rows of a block
+    Returns (X_unique, y_unique, counts) for weighted chunk_stats
+    """
+    unique, _, counts = unique_rows(np.column_stack([X, y.astype(np.float64)]))
+    return unique[:, :-1], unique[:, -1].astype(np.int64), counts
+
+
+def merge_stats(a, b):
+    """
+    Merge two sets of sufficient statistics (Chan et al. pairwise update)
+    The scatter is kept about the mean, so large raw feature values such as
+    src_bytes do not cancel catastrophically
+    """
+    if a['count'] == 0:
+        return dict(b)
+    if b['count'] == 0:
+        return dict(a)
+    n = a['count'] + b['count']
+    delta = b['sum'] / b['count'] - a['sum'] / a['count']
+    return {
+        'count': n,
+        'sum': a['sum'] + b['sum'],
+        'scatter': a['scatter'] + b['scatter'] + np.outer(delta, delta) * (a['count'] * b['count'] / n),
+        'max_abs': np.maximum(a['max_abs'], b['max_abs']),
+        'n_normal': a['n_normal'] + b['n_normal'],
+        'n_attack': a['n_attack'] + b['n_attack'],
+    }
+
+
+def save_stats(stats, path, feature_columns=None):
+    """Persist sufficient statistics (npz) so later runs can extend them"""
+    np.savez(path, count=stats['count'], sum=stats['sum'], scatter=stats['scatter'],
+             max_abs=stats['max_abs'], n_normal=stats['n_normal'], n_attack=stats['n_attack'],
+             feature_columns=np.array(feature_columns or [], dtype=str))
+
+
+def load_stats(path):
+    """Load sufficient statistics written by save_stats"""
+    with np.load(path) as data:
+        stats = {
+            'count': float(data['count']),
+            'sum': data['sum'].copy(),
+            'scatter': data['scatter'].copy(),
+            'max_abs': data['max_abs'].copy(),
+            'n_normal': int(data['n_normal']),
+            'n_attack': int(data['n_attack']),
+        }
+        feature_columns = data['feature_columns'].tolist()
+    return stats, feature_columns
+
+
+def pca_from_stats(stats, n_components=6):
+    """
+    Eigendecomposition of the covariance described by stats
+    Returns (mean, components, explained_variance_ratio) like compute_pca_manual
+    """
+    mean = stats['sum'] / stats['count']
+    cov = stats['scatter'] / max(stats['count'] - 1, 1)
+    eigvals, eigvecs = np.linalg.eigh(cov)
+    order = np.argsort(eigvals)[::-1]
+    eigvals = np.clip(eigvals[order], 0, None)
+    components = eigvecs[:, order].T[:n_components]
+
+    # Deterministic signs: largest-magnitude loading of each component is positive
+    signs = np.sign(components[np.arange(len(components)), np.argmax(np.abs(components), axis=1)])
+    components = components * signs[:, np.newaxis]
+
+    total_variance = np.sum(eigvals)
+    explained_variance_ratio = eigvals[:n_components] / total_variance if total_variance > 0 else np.zeros(n_components)
+    return mean, components, explained_variance_ratio
+
+
+def build_model(mean, components, variance_ratio, feature_max, n_major=4, n_minor=2,
+                frac_bits=8, total_bits=32):
+    """
+    Scale and convert a float PCA to the pca_coeffs.json layout
+    Same scaling as train_pca_simple.py: features are divided by their max |x|
+    """
+    feature_max = np.array(feature_max, dtype=np.float64)
+    feature_max[feature_max == 0] = 1  # Avoid division by zero
+    scale = 1.0 / feature_max
+
+    mean_scaled = mean * scale
+    components_scaled = components * scale[np.newaxis, :]
+
+    return {
+        'config': {
+            'n_features': len(mean),
+            'n_major_components': n_major,
+            'n_minor_components': n_minor,
+            'total_bits': total_bits,
+            'frac_bits': frac_bits
+        },
+        'mean': mean_scaled.tolist(),
+        'mean_fixed': to_fixed(mean_scaled, frac_bits, total_bits, overflow='saturate').tolist(),
+        'major_components': components_scaled[:n_major].tolist(),
+        'major_components_fixed': to_fixed(components_scaled[:n_major], frac_bits, total_bits,
+                                           overflow='saturate').tolist(),
+        'minor_components': components_scaled[n_major:n_major + n_minor].tolist(),
+        'minor_components_fixed': to_fixed(components_scaled[n_major:n_major + n_minor], frac_bits, total_bits,
+                                           overflow='saturate').tolist(),
+        'explained_variance_ratio': np.asarray(variance_ratio).tolist(),
+        'scale': scale.tolist(),
+        'encoding': default_encoding()
+    }
+
+
+def select_feature_columns(data_path, n_features=N_FEATURES, label_column='class'):
+    """
+    Pick the training columns the way train_pca_simple.py does: numeric
+    columns other than the label, limited to the first n_features
+    """
+    sample = pd.read_csv(data_path, nrows=10000)
+    numeric = sample.drop(columns=[label_column], errors='ignore').select_dtypes(include=[np.number])
+    return list(numeric.columns[:n_features])
+
+
+def parse_block(block, columns, feature_columns, label_column='class'):
+    """Parse a headerless CSV block into (X, y); NaN and non-numeric values become 0"""
+    usecols = feature_columns + ([label_column] if label_column in columns else [])
+    df = pd.read_csv(io.BytesIO(block), header=None, names=columns, usecols=usecols)
+    X = df[feature_columns].apply(pd.to_numeric, errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+    if label_column in columns:
+        y = (~df[label_column].astype(str).str.lower().str.contains('normal')).to_numpy(dtype=np.int64)
+    else:
+        y = np.zeros(len(df), dtype=np.int64)
+    return X, y
+
+
+def cache_block(cache, feature_columns, start, stop, label_column='class'):
+    """Rows [start, stop) of a dataset cache as (X, y), with the same rules as parse_block"""
+    X = np.nan_to_num(cache.numeric(feature_columns, start, stop), nan=0.0)
+    if label_column in cache.vocabularies:
+        is_normal = np.array(['normal' in label.lower() for label in cache.vocabularies[label_column]] + [False])
+        y = (~is_normal[cache.columns[label_column][start:stop]]).astype(np.int64)
+    else:
+        y = np.zeros(len(X), dtype=np.int64)
+    return X, y
+
+
+def _block_stats(X, y, dedup):
+    """(all rows, benign rows) statistics of one block"""
+    weights = None
+    if dedup:
+        X, y, weights = dedup_block(X, y)
+    benign = y == 0
+    return (chunk_stats(X, y, weights),
+            chunk_stats(X[benign], y[benign], None if weights is None else weights[benign]))
+
+
+def _merge_pair(a, b):
+    return merge_stats(a[0], b[0]), merge_stats(a[1], b[1])
+
+
+def _shard_stats(task):
+    """Worker: reduce one byte range of the CSV to (all rows, benign rows) statistics"""
+    data_path, start, end, columns, feature_columns, block_bytes, dedup = task
+    stats = empty_stats(len(feature_columns)), empty_stats(len(feature_columns))
+    for block in iter_range_blocks(data_path, start, end, block_bytes):
+        X, y = parse_block(block, columns, feature_columns)
+        stats = _merge_pair(stats, _block_stats(X, y, dedup))
+    return stats
+
+
+def _cache_shard_stats(task):
+    """Worker: reduce one row range of the dataset cache to (all rows, benign rows) statistics"""
+    cache_path, start, end, feature_columns, block_rows, dedup = task
+    cache = DatasetCache(cache_path)
+    stats = empty_stats(len(feature_columns)), empty_stats(len(feature_columns))
+    for pos in range(start, end, block_rows):
+        X, y = cache_block(cache, feature_columns, pos, min(pos + block_rows, end))
+        stats = _merge_pair(stats, _block_stats(X, y, dedup))
+    cache.close()
+    return stats
+
+
+def accumulate_stats(data_path, feature_columns, workers=None, num_shards=None, block_bytes=32 << 20,
+                     dedup=False):
+    """
+    Sufficient statistics of the whole CSV, reduced shard by shard in a process pool
+    Returns (all rows, benign rows only) statistics.
+    dedup=True accumulates each distinct row of a block once, weighted by its count.
+    An up-to-date dataset cache (dataset_cache.py) is read in row ranges
+    instead of parsing the CSV; it is never built here, since building
+    loads the whole file.
+    """
+    workers = workers or os.cpu_count() or 1
+    num_shards = num_shards or workers * 4
+    cache = open_cache(data_path, build=False)
+    if cache is not None and all(cache.column_kinds.get(name) == 'numeric' for name in feature_columns):
+        print(f"Reading typed cache {cache.path}")
+        n = len(cache)
+        ranges = [(n * k // num_shards, n * (k + 1) // num_shards) for k in range(num_shards)]
+        block_rows = max(block_bytes // (8 * len(feature_columns)), 1)
+        worker = _cache_shard_stats
+        tasks = [(cache.path, start, end, feature_columns, block_rows, dedup) for start, end in ranges if start < end]
+    else:
+        columns, data_start = read_header(data_path)
+        ranges = compute_shard_ranges(data_path, num_shards, start=data_start)
+        worker = _shard_stats
+        tasks = [(str(data_path), start, end, columns, feature_columns, block_bytes, dedup) for start, end in ranges]
+
+    stats = empty_stats(len(feature_columns)), empty_stats(len(feature_columns))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Merge in shard order so the result does not depend on scheduling
+        for k, shard in enumerate(pool.map(worker, tasks)):
+            stats = _merge_pair(stats, shard)
+            print(f"  Shard {k + 1}/{len(tasks)}: {int(stats[0]['count'])} samples")
+    return stats
+
+
+def main():
+    base_dir = Path(__file__).parent.parent
+
+    parser = argparse.ArgumentParser(description="Streaming PCA training over the full SMOTE dataset")
+    parser.add_argument('--data', default=find_dataset(base_dir / "dataset" / "data_after_smote.csv"))
+    parser.add_argument('--output', default=str(base_dir / "model" / "pca_coeffs.json"))
+    parser.add_argument('--stats-output', default=str(base_dir / "model" / "pca_stats.npz"),
+                        help="Where to keep the merged sufficient statistics")
+    parser.add_argument('--benign-stats-output', default=str(base_dir / "model" / "pca_benign_stats.npz"),
+                        help="Where to keep the statistics of the benign rows (read by update_pca_online.py)")
+    parser.add_argument('--n-major', type=int, default=4)
+    parser.add_argument('--n-minor', type=int, default=2)
+    parser.add_argument('--frac-bits', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--shards', type=int, default=None)
+    parser.add_argument('--block-mb', type=int, default=32)
+    parser.add_argument('--dedup', action='store_true',
+                        help="Collapse duplicate rows and accumulate them with multiplicity weights")
+    args = parser.parse_args()
+
+    print(f"Selecting feature columns from {args.data}...")
+    feature_columns = select_feature_columns(args.data)
+    print(f"Features: {len(feature_columns)}")
+
+    print("Accumulating sufficient statistics...")
+    stats, benign_stats = accumulate_stats(args.data, feature_columns, args.workers, args.shards,
+                                           args.block_mb << 20, args.dedup)
+    print(f"Samples: {int(stats['count'])}")
+    print(f"Normal: {stats['n_normal']}, Attack: {stats['n_attack']}")
+    save_stats(stats, args.stats_output, feature_columns)
+    save_stats(benign_stats, args.benign_stats_output, feature_columns)
+
+    n_total = args.n_major + args.n_minor
+    mean, components, variance_ratio = pca_from_stats(stats, n_components=n_total)
+    print(f"\nPCA Results:")
+    print(f"Explained variance ratio: {variance_ratio}")
+    print(f"Total variance explained: {np.sum(variance_ratio):.4f}")
+
+    model = build_model(mean, components, variance_ratio, stats['max_abs'],
+                        args.n_major, args.n_minor, args.frac_bits)
+    if benign_stats['count'] > 1:
+        # Reference subspace for update_pca_online.py, which only folds in benign rows
+        _, benign_components, _ = pca_from_stats(benign_stats, n_components=n_total)
+        model['benign_components'] = (benign_components * np.asarray(model['scale'])).tolist()
+
+    print(f"\nSaving model to {args.output}...")
+    with open(args.output, 'w') as f:
+        json.dump(model, f, indent=2)
+    artifact_path = artifact_path_for(args.output)
+    checksum = write_model_artifact(model, artifact_path)
+    print(f"Compiled model artifact: {artifact_path} (sha256 {checksum[:16]}...)")
+
+    print(f"\n{'='*50}")
+    print("PCA model trained successfully!")
+    print(f"  Samples: {int(stats['count'])}")
+    print(f"  Major components: {args.n_major}")
+    print(f"  Minor components: {args.n_minor}")
+    print(f"  Fixed-point: Q{32 - args.frac_bits}.{args.frac_bits}")
+    print(f"{'='*50}")
+
+
+if __name__ == "__main__":
+    main()
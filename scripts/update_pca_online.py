@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Online PCA model updates with drift detection
+Folds new batches of benign traffic into the benign-row sufficient statistics
+kept by train_pca_streaming.py (model/pca_benign_stats.npz). Statistics that
+include attack rows are refused unless explicitly allowed: folding benign
+batches into them shifts the mean and covariance towards benign traffic and
+reads as drift that is not there. Before each batch the stored
+statistics are decayed by a forgetting factor, so a batch seen n updates
+ago weighs forgetting**n. The components of the updated covariance are then
+compared with the deployed model's by their principal (subspace) angles, and
+the fixed-point model is re-exported only when the largest angle passes the
+drift threshold. The cost is one pass over the new batches plus a 28x28
+eigendecomposition, independent of how much traffic was folded in before.
+
+Usage:
+    python update_pca_online.py <batch.csv>... [--forgetting 0.9] [--drift-threshold 5.0]
+                                [--stats model/pca_benign_stats.npz] [--model model/pca_coeffs.json] [--force]
+                                [--allow-attack-stats]
+"""
+
+import numpy as np
+import argparse
+import json
+from pathlib import Path
+
+from dataset_io import iter_range_blocks, read_header
+from dataset_cache import detect_kind, KDD_COLUMNS, KIND_KDD
+from train_pca_streaming import (empty_stats, chunk_stats, merge_stats, save_stats, load_stats, pca_from_stats,
+                                 build_model, parse_block)
+from model_artifact import load_model, write_model_artifact, artifact_path_for
+from pca_scoring import _model_arrays
+from export_pca_to_verilog import export_to_verilog_params
+
+
+def decay_stats(stats, forgetting):
+    """Statistics with every folded sample's weight multiplied by forgetting (0 < forgetting <= 1)"""
+    if not 0 < forgetting <= 1:
+        raise ValueError(f"Forgetting factor must be in (0, 1], got {forgetting}")
+    decayed = dict(stats)
+    decayed['count'] = stats['count'] * forgetting
+    decayed['sum'] = stats['sum'] * forgetting
+    decayed['scatter'] = stats['scatter'] * forgetting
+    return decayed
+
+
+def batch_stats(batch_path, feature_columns, block_bytes=32 << 20):
+    """Sufficient statistics of the benign rows of one batch file (KDD rows or a CSV with a header)"""
+    if detect_kind(batch_path) == KIND_KDD:
+        columns, start, label_column = KDD_COLUMNS, 0, 'label'
+    else:
+        (columns, start), label_column = read_header(batch_path), 'class'
+    missing = [name for name in feature_columns if name not in columns]
+    if missing:
+        raise ValueError(f"{batch_path} lacks feature columns {', '.join(missing)}")
+    stats = empty_stats(len(feature_columns))
+    n_attack = 0
+    for block in iter_range_blocks(batch_path, start, None, block_bytes):
+        X, y = parse_block(block, columns, feature_columns, label_column)
+        n_attack += int(y.sum())
+        stats = merge_stats(stats, chunk_stats(X[y == 0], y[y == 0]))
+    if n_attack:
+        print(f"  Skipped {n_attack} attack rows of {batch_path}")
+    return stats
+
+
+def subspace_angles(a, b):
+    """Principal angles (degrees, descending) between the row spaces of a and b"""
+    qa, _ = np.linalg.qr(np.atleast_2d(a).T)
+    qb, _ = np.linalg.qr(np.atleast_2d(b).T)
+    cosines = np.clip(np.linalg.svd(qa.T @ qb, compute_uv=False), -1.0, 1.0)
+    return np.degrees(np.arccos(cosines))[::-1]
+
+
+def component_drift(model, components, benign=True):
+    """
+    {'major': deg, 'minor': deg}: largest principal angle between the deployed
+    major (minor) subspace and the same components of a new PCA
+    New components are compared in the deployed model's feature scaling.
+    benign=True compares them with the benign-row subspace recorded by
+    train_pca_streaming.py ('benign_components') when the model was trained
+    on attacks as well.
+    """
+    _, deployed, q = _model_arrays(model, fixed=False)
+    if benign and 'benign_components' in model:
+        deployed = np.asarray(model['benign_components'], dtype=np.float64)
+    r = model['config']['n_minor_components']
+    scale = np.asarray(model.get('scale', np.ones(deployed.shape[1])), dtype=np.float64)
+    scaled = components * scale[np.newaxis, :]
+    drift = {'major': float(subspace_angles(deployed[:q], scaled[:q])[0])}
+    if r:
+        drift['minor'] = float(subspace_angles(deployed[q:q + r], scaled[q:q + r])[0])
+    return drift
+
+
+def update_model(stats_path, model_path, batch_paths, forgetting=0.9, drift_threshold=5.0, force=False,
+                 sv_output=None, allow_attack_stats=False):
+    """
+    Fold batch_paths into the statistics at stats_path and refresh the model on drift
+
+    Args:
+        forgetting: weight kept by the stored statistics at every batch
+        drift_threshold: largest principal angle (degrees) tolerated before re-export
+        force: re-export even without drift
+        sv_output: also regenerate this SystemVerilog coefficients package on re-export
+        allow_attack_stats: fold into statistics that include attack rows
+
+    Returns:
+        (drift dictionary, True if the model was re-exported)
+    """
+    stats, feature_columns = load_stats(stats_path)
+    if not feature_columns:
+        raise ValueError(f"{stats_path} does not record its feature columns (re-run train_pca_streaming.py)")
+    if stats['n_attack'] and not allow_attack_stats:
+        raise ValueError(f"{stats_path} includes {stats['n_attack']} attack rows; update the benign-row statistics "
+                         f"(pca_benign_stats.npz from train_pca_streaming.py) or pass allow_attack_stats")
+    for batch_path in batch_paths:
+        print(f"Folding {batch_path} into the statistics (forgetting {forgetting})...")
+        new = batch_stats(batch_path, feature_columns)
+        stats = merge_stats(decay_stats(stats, forgetting), new)
+        print(f"  +{int(new['count'])} benign rows, effective sample size {stats['count']:.0f}")
+    save_stats(stats, stats_path, feature_columns)
+
+    model = load_model(model_path)
+    config = model['config']
+    q, r = config['n_major_components'], config['n_minor_components']
+    mean, components, variance_ratio = pca_from_stats(stats, n_components=q + r)
+    drift = component_drift(model, components, benign=not stats['n_attack'])
+    print("Subspace drift: " + ", ".join(f"{name} {angle:.2f} deg" for name, angle in drift.items()))
+    if max(drift.values()) <= drift_threshold and not force:
+        print(f"Below the drift threshold ({drift_threshold} deg), keeping the deployed model")
+        return drift, False
+
+    refreshed = build_model(mean, components, variance_ratio, stats['max_abs'], q, r,
+                            config['frac_bits'], config['total_bits'])
+    refreshed['encoding'] = model.get('encoding', refreshed['encoding'])
+    if model.get('thresholds_fixed'):
+        # Scores move with the model: the calibrated thresholds are kept until recalibrated
+        refreshed['thresholds_fixed'] = model['thresholds_fixed']
+        print("Kept the calibrated thresholds; re-run calibrate_threshold.py on recent traffic")
+    refreshed['drift'] = {'major_deg': drift['major'], 'minor_deg': drift.get('minor', 0.0),
+                          'forgetting': forgetting, 'effective_samples': stats['count']}
+    with open(model_path, 'w') as f:
+        json.dump(refreshed, f, indent=2)
+    artifact_path = artifact_path_for(model_path)
+    checksum = write_model_artifact(refreshed, artifact_path)
+    print(f"Re-exported {model_path} and {artifact_path} (sha256 {checksum[:16]}...)")
+    if sv_output:
+        export_to_verilog_params(str(model_path), sv_output)
+    return drift, True
+
+
+def main():
+    base_dir = Path(__file__).parent.parent
+
+    parser = argparse.ArgumentParser(description="Fold new benign traffic into the PCA model and re-export on drift")
+    parser.add_argument('batches', nargs='+', help="New traffic batches (CSV, .gz or .xz), oldest first")
+    parser.add_argument('--stats', default=str(base_dir / "model" / "pca_benign_stats.npz"),
+                        help="Benign-row statistics written by train_pca_streaming.py (updated in place)")
+    parser.add_argument('--model', default=str(base_dir / "model" / "pca_coeffs.json"))
+    parser.add_argument('--sv-output', default=None, help="Also regenerate this SV package on re-export")
+    parser.add_argument('--forgetting', type=float, default=0.9,
+                        help="Weight the stored statistics keep at every batch (1 = no forgetting)")
+    parser.add_argument('--drift-threshold', type=float, default=5.0,
+                        help="Largest principal angle (degrees) before the model is re-exported")
+    parser.add_argument('--force', action='store_true', help="Re-export even below the drift threshold")
+    parser.add_argument('--allow-attack-stats', action='store_true',
+                        help="Fold into statistics that include attack rows (the drift is then biased)")
+    args = parser.parse_args()
+
+    drift, exported = update_model(args.stats, args.model, args.batches, args.forgetting, args.drift_threshold,
+                                   args.force, args.sv_output, args.allow_attack_stats)
+    print(f"{'✓ Model refreshed' if exported else '✓ Statistics updated'} "
+          f"(largest angle {max(drift.values()):.2f} deg)")
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -232,6 +232,24 @@ package pca_coeffs_pkg;
         }  // Minor component 1
     };
 
+    // Attack thresholds (fixed-point): a score above either one flags an attack
+    parameter logic [DATA_WIDTH-1:0] MAJOR_THRESHOLD = 32'd25600;
+    parameter logic [DATA_WIDTH-1:0] MINOR_THRESHOLD = 32'd25600;
+
+    // Sparse datapath (pca_detector_sparse.sv): active features and kept coefficients
+    // PRUNED selects pca_detector_sparse in top_pipeline (the golden models score pruned models sparsely)
+    parameter bit PRUNED = 1'b0;
+    // COEFF_ROW: stacked component (major 0..Q-1, minor Q..Q+R-1), COEFF_COL: active feature position
+    parameter N_ACTIVE = 28;
+    parameter ACTIVE_TABLE_SIZE = 28;
+    parameter NNZ = 3;
+    parameter COEFF_TABLE_SIZE = 3;
+    parameter int ACTIVE_FEATURES [0:ACTIVE_TABLE_SIZE-1] = '{0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26, 27};
+    parameter logic signed [DATA_WIDTH-1:0] ACTIVE_MEAN [0:ACTIVE_TABLE_SIZE-1] = '{32'sd0, 32'sd0, 32'sd0, 32'sd0, 32'sd7, 32'sd3, 32'sd0, 32'sd0, 32'sd0, 32'sd0, 32'sd0, 32'sd194, 32'sd0, 32'sd0, 32'sd0, 32'sd0, 32'sd0, 32'sd0, 32'sd0, 32'sd0, 32'sd0, 32'sd1, 32'sd59, 32'sd60, 32'sd0, 32'sd0, 32'sd0, 32'sd0};
+    parameter int COEFF_ROW [0:COEFF_TABLE_SIZE-1] = '{4, 5, 5};
+    parameter int COEFF_COL [0:COEFF_TABLE_SIZE-1] = '{11, 9, 21};
+    parameter logic signed [DATA_WIDTH-1:0] COEFF_VALUE [0:COEFF_TABLE_SIZE-1] = '{32'sd1, 32'sd9, 32'sd13};
+
 endpackage
 
 `endif // PCA_COEFFS_PKG_SV
@@ -51,7 +51,6 @@ module pca_detector #(
     logic signed [31:0] major_recon [N_FEATURES-1:0];
     logic signed [31:0] major_score_acc;
     logic signed [31:0] minor_score_acc;
-    logic [31:0] threshold;
     logic signed [31:0] major_abs, minor_abs;  // For absolute value check
     
     integer i, j;
@@ -171,16 +170,15 @@ module pca_detector #(
                     major_score <= major_score_acc;
                     minor_score <= minor_score_acc;
                     
-                    // Simple threshold-based detection
-                    // Threshold = 100 in fixed-point (100 << FRAC_BITS)
+                    // Threshold-based detection
+                    // MAJOR_THRESHOLD/MINOR_THRESHOLD come from pca_coeffs_pkg
+                    // (calibrated by calibrate_threshold.py, default 100 << FRAC_BITS)
                     // Use absolute value to handle overflow cases with negative scores
-                    threshold = 100 << FRAC_BITS;
-                    
                     // Check absolute value for both major and minor scores
                     major_abs = (major_score_acc < 0) ? -major_score_acc : major_score_acc;
                     minor_abs = (minor_score_acc < 0) ? -minor_score_acc : minor_score_acc;
                     
-                    if (major_abs > threshold || minor_abs > threshold) begin
+                    if (major_abs > MAJOR_THRESHOLD || minor_abs > MINOR_THRESHOLD) begin
                         attack_detected <= 1'b1;
                     end else begin
                         attack_detected <= 1'b0;
@@ -0,0 +1,185 @@
+// Sparse PCA-based Anomaly Detector
+// Same interface and Q24.8 arithmetic as pca_detector.sv, but only the
+// active features are centered and scored and only the kept coefficients
+// (COEFF_* tables of pca_coeffs_pkg, pruned by scripts/prune_pca.py) are
+// multiplied, so one multiplier is built per table entry
+// Bit-exact model: pca_scoring.score_sparse_batch with the 'pca_detector' profile
+
+import pca_coeffs_pkg::*;
+
+module pca_detector_sparse #(
+    parameter DATA_WIDTH = 32,
+    parameter FRAC_BITS = 8,
+    parameter N_FEATURES = 28,
+    parameter Q = 4,  // Major components
+    parameter R = 2   // Minor components
+) (
+    input  logic clk,
+    input  logic rst_n,
+
+    // Input features (already aggregated by FEM)
+    input  logic [DATA_WIDTH-1:0] features [N_FEATURES-1:0],
+    input  logic valid_in,
+
+    // Output detection results
+    output logic [31:0] major_score,  // SPE in major subspace
+    output logic [31:0] minor_score,  // Score in minor subspace
+    output logic attack_detected,
+    output logic valid_out
+);
+
+    // Pipeline stages
+    typedef enum logic [2:0] {
+        IDLE,
+        CENTER,
+        PROJECT,
+        RECONSTRUCT,
+        COMPUTE_SCORES,
+        DONE
+    } state_t;
+
+    state_t state, next_state;
+
+    // Registers (active features only)
+    logic signed [DATA_WIDTH-1:0] centered [0:ACTIVE_TABLE_SIZE-1];
+    logic signed [31:0] major_proj [Q-1:0];
+    logic signed [31:0] minor_proj [R-1:0];
+    logic signed [31:0] major_recon [0:ACTIVE_TABLE_SIZE-1];
+    logic signed [31:0] major_score_acc;
+    logic signed [31:0] minor_score_acc;
+    logic signed [31:0] major_abs, minor_abs;  // For absolute value check
+
+    integer i, k;
+    logic signed [63:0] mult_result_64;
+    logic signed [31:0] mult_result;
+    logic signed [63:0] proj_acc [0:Q+R-1];
+    logic signed [63:0] recon_acc [0:ACTIVE_TABLE_SIZE-1];
+
+    // State machine
+    always_ff @(posedge clk or negedge rst_n) begin
+        if (!rst_n) begin
+            state <= IDLE;
+        end else begin
+            state <= next_state;
+        end
+    end
+
+    always_comb begin
+        next_state = state;
+        case (state)
+            IDLE: if (valid_in) next_state = CENTER;
+            CENTER: next_state = PROJECT;
+            PROJECT: next_state = RECONSTRUCT;
+            RECONSTRUCT: next_state = COMPUTE_SCORES;
+            COMPUTE_SCORES: next_state = DONE;
+            DONE: next_state = IDLE;
+        endcase
+    end
+
+    // Datapath
+    always_ff @(posedge clk or negedge rst_n) begin
+        if (!rst_n) begin
+            for (i = 0; i < ACTIVE_TABLE_SIZE; i++) begin
+                centered[i] <= '0;
+                major_recon[i] <= '0;
+            end
+            for (i = 0; i < Q; i++) begin
+                major_proj[i] <= '0;
+            end
+            for (i = 0; i < R; i++) begin
+                minor_proj[i] <= '0;
+            end
+            major_score_acc <= '0;
+            minor_score_acc <= '0;
+            valid_out <= 1'b0;
+            attack_detected <= 1'b0;
+        end else begin
+            case (state)
+                CENTER: begin
+                    // Center the active features: x - mean
+                    for (i = 0; i < N_ACTIVE; i++) begin
+                        centered[i] <= signed'(features[ACTIVE_FEATURES[i]]) - ACTIVE_MEAN[i];
+                    end
+                    valid_out <= 1'b0;
+                end
+
+                PROJECT: begin
+                    // Project onto the major and minor components, one term per kept coefficient
+                    for (i = 0; i < Q + R; i++) begin
+                        proj_acc[i] = 0;
+                    end
+                    for (k = 0; k < NNZ; k++) begin
+                        mult_result_64 = centered[COEFF_COL[k]] * COEFF_VALUE[k];
+                        mult_result = mult_result_64 >>> FRAC_BITS;
+                        proj_acc[COEFF_ROW[k]] = proj_acc[COEFF_ROW[k]] + mult_result;
+                    end
+                    for (i = 0; i < Q; i++) begin
+                        major_proj[i] <= proj_acc[i][31:0];
+                    end
+                    for (i = 0; i < R; i++) begin
+                        minor_proj[i] <= proj_acc[Q + i][31:0];
+                    end
+                end
+
+                RECONSTRUCT: begin
+                    // Reconstruct from the kept major coefficients
+                    for (i = 0; i < N_ACTIVE; i++) begin
+                        recon_acc[i] = 0;
+                    end
+                    for (k = 0; k < NNZ; k++) begin
+                        if (COEFF_ROW[k] < Q) begin
+                            mult_result_64 = major_proj[COEFF_ROW[k]] * COEFF_VALUE[k];
+                            mult_result = mult_result_64 >>> FRAC_BITS;
+                            recon_acc[COEFF_COL[k]] = recon_acc[COEFF_COL[k]] + mult_result;
+                        end
+                    end
+                    for (i = 0; i < N_ACTIVE; i++) begin
+                        major_recon[i] <= recon_acc[i][31:0];
+                    end
+                end
+
+                COMPUTE_SCORES: begin
+                    // Major score: sum of squared residuals of the active features
+                    major_score_acc = 0;
+                    for (i = 0; i < N_ACTIVE; i++) begin
+                        logic signed [31:0] residual;
+                        residual = centered[i] - major_recon[i];
+                        mult_result_64 = residual * residual;
+                        mult_result = mult_result_64 >>> FRAC_BITS;
+                        major_score_acc = major_score_acc + mult_result;
+                    end
+
+                    // Minor score: sum of squared projections
+                    minor_score_acc = 0;
+                    for (i = 0; i < R; i++) begin
+                        mult_result_64 = minor_proj[i] * minor_proj[i];
+                        mult_result = mult_result_64 >>> FRAC_BITS;
+                        minor_score_acc = minor_score_acc + mult_result;
+                    end
+                end
+
+                DONE: begin
+                    major_score <= major_score_acc;
+                    minor_score <= minor_score_acc;
+
+                    // Threshold-based detection, as in pca_detector.sv
+                    major_abs = (major_score_acc < 0) ? -major_score_acc : major_score_acc;
+                    minor_abs = (minor_score_acc < 0) ? -minor_score_acc : minor_score_acc;
+
+                    if (major_abs > MAJOR_THRESHOLD || minor_abs > MINOR_THRESHOLD) begin
+                        attack_detected <= 1'b1;
+                    end else begin
+                        attack_detected <= 1'b0;
+                    end
+
+                    valid_out <= 1'b1;
+                end
+
+                default: begin
+                    valid_out <= 1'b0;
+                end
+            endcase
+        end
+    end
+
+endmodule
@@ -1,5 +1,7 @@
 // Top-level NIDS Pipeline
 // Connects FEM -> PCA Detector
+// Pruned models (pca_coeffs_pkg::PRUNED, see scripts/prune_pca.py) use the
+// sparse detector, which is what the Python golden models score them with
 // Optimized for DE10-Standard (Cyclone V SoC)
 
 module top_pipeline #(
@@ -38,18 +40,36 @@ module top_pipeline #(
     );
     
     // PCA Detector
-    pca_detector #(
-        .DATA_WIDTH(DATA_WIDTH),
-        .N_FEATURES(N_FEATURES)
-    ) u_pca (
-        .clk(clk),
-        .rst_n(rst_n),
-        .features(agg_features),
-        .valid_in(agg_valid),
-        .major_score(major_score),
-        .minor_score(minor_score),
-        .attack_detected(attack_detected),
-        .valid_out(valid_out)
-    );
+    generate
+        if (pca_coeffs_pkg::PRUNED) begin : g_sparse
+            pca_detector_sparse #(
+                .DATA_WIDTH(DATA_WIDTH),
+                .N_FEATURES(N_FEATURES)
+            ) u_pca (
+                .clk(clk),
+                .rst_n(rst_n),
+                .features(agg_features),
+                .valid_in(agg_valid),
+                .major_score(major_score),
+                .minor_score(minor_score),
+                .attack_detected(attack_detected),
+                .valid_out(valid_out)
+            );
+        end else begin : g_dense
+            pca_detector #(
+                .DATA_WIDTH(DATA_WIDTH),
+                .N_FEATURES(N_FEATURES)
+            ) u_pca (
+                .clk(clk),
+                .rst_n(rst_n),
+                .features(agg_features),
+                .valid_in(agg_valid),
+                .major_score(major_score),
+                .minor_score(minor_score),
+                .attack_detected(attack_detected),
+                .valid_out(valid_out)
+            );
+        end
+    endgenerate
 
 endmodule